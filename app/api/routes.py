@@ -1,10 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header
-from pydantic import BaseModel
-from typing import Dict, Any
-from app.core.security import get_api_key
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+    Header,
+)
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.types import Receive, Scope, Send
+from pydantic import BaseModel, Field, HttpUrl
+from typing import Dict, Any, List, Literal, Optional
+from app.core.profiler import ProfilerBusyError, format_folded, sample_stacks
+from app.core.security import Principal, get_principal
 from app.services.moderation import ModerationService
 from app.services.cache import CacheService
+from app.services.executor import OverloadedError
+from app.services.jobs import Job, WebhookURLError, check_webhook_url, get_job_queue
+from app.services.pipeline import HeadName, HeadUnavailableError
+from app.services.rate_limit import get_rate_limiter
+from app.services.registry import get_model_registry
+from app.services.streaming import analyze_ndjson_stream
 from app.core.config import get_settings
+import asyncio
+import hmac
 import logging
 
 router = APIRouter()
@@ -14,50 +34,338 @@ logger = logging.getLogger(__name__)
 
 class TextAnalysisRequest(BaseModel):
     text: str
+    # Heads to run; DEFAULT_HEADS when not given
+    heads: Optional[List[HeadName]] = Field(None, min_length=1)
+
+
+class HeadResult(BaseModel):
+    label: str
+    score: float
+    scores: Dict[str, float]
+    # Labels over HEAD_FLAG_THRESHOLD, for multi-label heads
+    flagged: Optional[List[str]] = None
 
 
 class TextAnalysisResponse(BaseModel):
-    sentiment_score: float
-    sentiment: str
-    confidence: float
-    dominant_emotion: str
-    raw_scores: Dict[str, float]
+    # Sentiment fields are left out when the sentiment head isn't run
+    sentiment_score: Optional[float] = None
+    sentiment: Optional[str] = None
+    confidence: Optional[float] = None
+    dominant_emotion: Optional[str] = None
+    raw_scores: Optional[Dict[str, float]] = None
+    tier: Optional[str] = None
+    heads: Optional[Dict[str, HeadResult]] = None
+
+
+class BatchAnalysisRequest(BaseModel):
+    texts: List[str] = Field(..., min_length=1, max_length=settings.MAX_BATCH_TEXTS)
+    heads: Optional[List[HeadName]] = Field(None, min_length=1)
+
+
+class BatchAnalysisResponse(BaseModel):
+    results: List[TextAnalysisResponse]
+
+
+class JobRequest(BaseModel):
+    texts: List[str] = Field(..., min_length=1, max_length=settings.JOB_MAX_TEXTS)
+    heads: Optional[List[HeadName]] = Field(None, min_length=1)
+    # Queue lane: "high" jobs are taken before "normal" ones, then "low"
+    priority: Literal["high", "normal", "low"] = "normal"
+    # Receives the finished job as a JSON POST
+    webhook_url: Optional[HttpUrl] = None
+
 
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    priority: str
+    texts: int
+    created_at: float
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    # In input order, once the job is done
+    results: Optional[List[TextAnalysisResponse]] = None
 
-async def get_moderation_service() -> ModerationService:
+
+class BodyStreamingResponse(StreamingResponse):
+    """
+    Streaming response whose content is produced while the request body is
+    still being read. The body reader already receives the client's
+    disconnect, so don't start a second listener competing for messages.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def get_moderation_service(
+    _: Principal = Depends(get_principal),
+) -> ModerationService:
+    # Depends on the principal so that requests without a valid key never
+    # load the models: FastAPI still resolves a route's other dependencies
+    # when one has a validation error such as a missing header. Routes list
+    # the rate limit before this dependency for the same reason
     cache_service = CacheService()
-    return ModerationService(cache_service)
+    registry = get_model_registry()
+    if not registry.ready:
+        # Lazy loading (MODEL_PRELOAD=false) takes seconds; keep it off the
+        # event loop so other requests, /health included, are still served
+        await asyncio.to_thread(registry.load)
+    return ModerationService(
+        cache_service,
+        registry.get_sentiment_analyzer(),
+        registry.get_batch_scheduler(),
+    )
+
 
+def head_unavailable(e: HeadUnavailableError) -> HTTPException:
+    """400 for requests asking for heads this deployment doesn't run."""
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-async def verify_api_key(x_api_key: str = Header(...)) -> None:
-    if x_api_key != settings.API_KEY:
-        logger.warning("Invalid API key attempt")
-        raise HTTPException(status_code=401, detail="Invalid API key")
 
+def overloaded(e: OverloadedError) -> HTTPException:
+    """503 telling the client when to retry, for work shed under overload."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": str(settings.OVERLOAD_RETRY_AFTER_SECONDS)},
+    )
 
-@router.post("/analyze", response_model=TextAnalysisResponse)
+
+async def take_rate_limit_tokens(
+    response: Response, principal: Principal, tokens: int
+) -> Dict[str, str]:
+    """
+    Take ``tokens`` from the tenant's bucket, rejecting the request with 429
+    when there are too few. Returns the quota headers, which are also set on
+    the route's response.
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return {}
+    result = await get_rate_limiter().hit(principal.tenant_id, tokens)
+    headers = result.headers()
+    if not result.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers=headers,
+        )
+    response.headers.update(headers)
+    return headers
+
+
+async def enforce_rate_limit(
+    response: Response, principal: Principal = Depends(get_principal)
+) -> Dict[str, str]:
+    """Charge the request one token."""
+    return await take_rate_limit_tokens(response, principal, 1)
+
+
+async def enforce_batch_rate_limit(
+    request: BatchAnalysisRequest,
+    response: Response,
+    principal: Principal = Depends(get_principal),
+) -> Dict[str, str]:
+    """Charge a batch one token per text, like the requests it replaces."""
+    return await take_rate_limit_tokens(response, principal, len(request.texts))
+
+
+async def verify_admin_key(x_admin_key: str = Header(...)) -> None:
+    if not settings.ADMIN_API_KEY or not hmac.compare_digest(
+        x_admin_key.encode(), settings.ADMIN_API_KEY.encode()
+    ):
+        logger.warning("Invalid admin key attempt")
+        raise HTTPException(status_code=403, detail="Invalid admin key")
+
+
+@router.post(
+    "/analyze", response_model=TextAnalysisResponse, response_model_exclude_none=True
+)
 async def analyze_text(
     request: TextAnalysisRequest,
+    _: Principal = Depends(get_principal),
+    __: Dict[str, str] = Depends(enforce_rate_limit),
     moderation_service: ModerationService = Depends(get_moderation_service),
-    _: None = Depends(verify_api_key),
 ) -> Dict[str, Any]:
     """
-    Analyze text for sentiment and emotions using BERT.
+    Analyze text for sentiment and emotions using BERT, and with the
+    toxicity and emotion heads when asked for and configured.
     """
     try:
-        result = await moderation_service.analyze_text(request.text)
+        result = await moderation_service.analyze_text(request.text, request.heads)
         # Ensure sentiment field is present
-        if "sentiment" not in result:
+        if "sentiment" not in result and "heads" not in result:
             result["sentiment"] = "neutral"  # Default sentiment if not provided
         return result
+    except HeadUnavailableError as e:
+        raise head_unavailable(e)
+    except OverloadedError as e:
+        raise overloaded(e)
+    except Exception as e:
+        logger.error("Error in analyze_text endpoint: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post(
+    "/analyze/batch",
+    response_model=BatchAnalysisResponse,
+    response_model_exclude_none=True,
+)
+async def analyze_batch(
+    request: BatchAnalysisRequest,
+    _: Principal = Depends(get_principal),
+    __: Dict[str, str] = Depends(enforce_batch_rate_limit),
+    moderation_service: ModerationService = Depends(get_moderation_service),
+) -> Dict[str, Any]:
+    """
+    Analyze a list of texts in one call. Results are returned in input order.
+    The batch takes one rate limit token per text.
+    """
+    try:
+        results = await moderation_service.analyze_batch(request.texts, request.heads)
+        return {"results": results}
+    except HeadUnavailableError as e:
+        raise head_unavailable(e)
+    except OverloadedError as e:
+        raise overloaded(e)
+    except Exception as e:
+        logger.error("Error in analyze_batch endpoint: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/analyze/stream")
+async def analyze_stream(
+    request: Request,
+    principal: Principal = Depends(get_principal),
+    rate_limit_headers: Dict[str, str] = Depends(enforce_rate_limit),
+    moderation_service: ModerationService = Depends(get_moderation_service),
+) -> BodyStreamingResponse:
+    """
+    Analyze newline-delimited JSON texts from the request body, one
+    `{"text": ..., "id": ...}` object or JSON string per line, and stream one
+    NDJSON result per line back as batches finish.
+
+    Besides the request's token, each batch of lines read takes one rate
+    limit token per line. Once the tenant runs out, the lines of the batch
+    refused get a rate limit error and the stream ends.
+    """
+
+    async def charge(lines: int) -> bool:
+        result = await get_rate_limiter().hit(principal.tenant_id, lines)
+        return result.allowed
+
+    return BodyStreamingResponse(
+        analyze_ndjson_stream(
+            request.stream(),
+            moderation_service,
+            charge=charge if settings.RATE_LIMIT_ENABLED else None,
+        ),
+        media_type="application/x-ndjson",
+        headers=rate_limit_headers,
+    )
+
+
+@router.post(
+    "/jobs",
+    response_model=JobResponse,
+    response_model_exclude_none=True,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def submit_job(
+    request: JobRequest,
+    principal: Principal = Depends(get_principal),
+    __: Dict[str, str] = Depends(enforce_rate_limit),
+    moderation_service: ModerationService = Depends(get_moderation_service),
+) -> Dict[str, Any]:
+    """
+    Queue a large list of texts for analysis by the job workers. Poll
+    `GET /jobs/{job_id}` for the results, or pass a `webhook_url` to have
+    the finished job posted to it. Webhooks must be https URLs of public
+    hosts, or of hosts in `JOB_WEBHOOK_ALLOWED_HOSTS`.
+    """
+    try:
+        heads = moderation_service.resolve_heads(request.heads)
+        if request.webhook_url:
+            await check_webhook_url(str(request.webhook_url))
+        job = Job(
+            tenant_id=principal.tenant_id,
+            texts=request.texts,
+            heads=heads if request.heads else None,
+            priority=request.priority,
+            webhook_url=str(request.webhook_url) if request.webhook_url else None,
+        )
+        await get_job_queue().submit(job)
+        return job.summary()
+    except HeadUnavailableError as e:
+        raise head_unavailable(e)
+    except WebhookURLError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
-        logger.error(f"Error in analyze_text endpoint: {str(e)}")
+        logger.error("Error in submit_job endpoint: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get(
+    "/jobs/{job_id}", response_model=JobResponse, response_model_exclude_none=True
+)
+async def get_job(
+    job_id: str,
+    principal: Principal = Depends(get_principal),
+    __: Dict[str, str] = Depends(enforce_rate_limit),
+) -> Dict[str, Any]:
+    """
+    Status of a job submitted with the same tenant's key, with its results
+    once it is done. Jobs are kept for `JOB_TTL_SECONDS`.
+    """
+    try:
+        job = await get_job_queue().get(job_id)
+    except Exception as e:
+        logger.error("Error in get_job endpoint: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    # Other tenants' jobs are indistinguishable from missing ones
+    if job is None or job.tenant_id != principal.tenant_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.summary()
+
+
 @router.get("/health")
 async def health_check() -> Dict[str, str]:
     """
     Health check endpoint.
     """
     return {"status": "healthy"}
+
+
+@router.get("/ready")
+async def readiness_check() -> JSONResponse:
+    """
+    Readiness check endpoint. Reports 503 until the models are loaded.
+    """
+    registry = get_model_registry()
+    if not registry.ready:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "loading"},
+        )
+    return JSONResponse(content={"status": "ready"})
+
+
+@router.post("/admin/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(10.0, gt=0),
+    interval_ms: float = Query(10.0, ge=1),
+    _: None = Depends(verify_admin_key),
+) -> PlainTextResponse:
+    """
+    Sample the stacks of every thread in this worker for the given number of
+    seconds and return them in folded format, ready for flamegraph.pl or
+    speedscope. Requires the `X-Admin-Key` header.
+    """
+    seconds = min(seconds, settings.PROFILE_MAX_SECONDS)
+    try:
+        counts = await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(format_folded(counts))
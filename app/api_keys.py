@@ -0,0 +1,88 @@
+"""
+Manage tenant API keys stored in Redis.
+
+Only the SHA-256 of each key is stored, in the hash named by
+API_KEYS_REDIS_HASH, so a new key is printed once and cannot be recovered.
+Running replicas pick up changes within API_KEYS_REFRESH_SECONDS.
+
+Usage:
+    python -m app.api_keys add --tenant acme
+    python -m app.api_keys list
+    python -m app.api_keys revoke --tenant acme
+"""
+
+import argparse
+import asyncio
+import logging
+import secrets
+import sys
+from typing import Dict, List
+import redis.asyncio as redis
+from app.core.config import get_settings
+from app.core.security import hash_api_key
+from app.services.cache import close_redis_pool, decode_reply, get_redis_pool
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+async def add_key(redis_client: redis.Redis, tenant: str) -> str:
+    """Create a key for ``tenant`` and return it."""
+    api_key = secrets.token_urlsafe(32)
+    await redis_client.hset(settings.API_KEYS_REDIS_HASH, hash_api_key(api_key), tenant)
+    return api_key
+
+
+async def list_keys(redis_client: redis.Redis) -> Dict[str, List[str]]:
+    """Key ids (hash prefixes) per tenant."""
+    tenants: Dict[str, List[str]] = {}
+    stored = await redis_client.hgetall(settings.API_KEYS_REDIS_HASH)
+    for key_hash, tenant in stored.items():
+        tenants.setdefault(decode_reply(tenant), []).append(decode_reply(key_hash)[:8])
+    return tenants
+
+
+async def revoke_keys(redis_client: redis.Redis, tenant: str) -> int:
+    """Remove every key of ``tenant``. Returns how many were removed."""
+    stored = await redis_client.hgetall(settings.API_KEYS_REDIS_HASH)
+    hashes = [
+        key_hash for key_hash, owner in stored.items() if decode_reply(owner) == tenant
+    ]
+    if hashes:
+        await redis_client.hdel(settings.API_KEYS_REDIS_HASH, *hashes)
+    return len(hashes)
+
+
+async def run(args: argparse.Namespace) -> None:
+    redis_client = redis.Redis(connection_pool=get_redis_pool())
+    try:
+        if args.command == "add":
+            api_key = await add_key(redis_client, args.tenant)
+            logger.info(f"Created a key for {args.tenant}; it is not shown again:")
+            print(api_key)
+        elif args.command == "list":
+            for tenant, key_ids in sorted((await list_keys(redis_client)).items()):
+                print(f"{tenant}\t{' '.join(key_ids)}")
+        else:
+            removed = await revoke_keys(redis_client, args.tenant)
+            logger.info(f"Revoked {removed} keys of {args.tenant}")
+    finally:
+        await close_redis_pool()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("add").add_argument("--tenant", required=True)
+    subparsers.add_parser("list")
+    subparsers.add_parser("revoke").add_argument("--tenant", required=True)
+    args = parser.parse_args()
+
+    if not settings.API_KEYS_REDIS_HASH:
+        sys.exit("API_KEYS_REDIS_HASH is empty, so keys in Redis are not used")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Score a JSONL or CSV file offline with a pool of worker processes.
+
+Usage:
+    python -m app.batch comments.jsonl --output scores.jsonl --workers 8
+    python -m app.batch comments.csv --output scores.jsonl --resume
+
+Each worker process loads its own SentimentAnalyzer with a pinned torch thread
+count, so throughput scales with cores instead of threads fighting over them.
+Results are written in input order as JSON lines, and progress is
+checkpointed after every chunk so an interrupted run can be resumed.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+from app.services.sentiment import SentimentAnalyzer
+
+logger = logging.getLogger(__name__)
+
+# (record id, text or None when the record has no usable text)
+Record = Tuple[Any, Optional[str]]
+
+_analyzer: Optional[SentimentAnalyzer] = None
+
+
+@dataclass
+class Checkpoint:
+    records_done: int = 0
+    output_bytes: int = 0
+
+    @classmethod
+    def load(cls, path: Path) -> "Checkpoint":
+        if not path.exists():
+            return cls()
+        return cls(**json.loads(path.read_text()))
+
+    def save(self, path: Path) -> None:
+        # Write then rename so a crash never leaves a half-written checkpoint
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps(self.__dict__))
+        os.replace(tmp_path, path)
+
+
+def iter_records(path: Path, text_field: str, id_field: str) -> Iterator[Record]:
+    """Stream records from a JSONL or CSV file without loading it whole."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.suffix.lower() == ".csv":
+            for number, row in enumerate(csv.DictReader(f)):
+                yield row.get(id_field, number), row.get(text_field)
+            return
+        for number, line in enumerate(f):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                yield number, None
+                continue
+            if isinstance(item, str):
+                yield number, item
+            elif isinstance(item, dict):
+                text = item.get(text_field)
+                yield item.get(id_field, number), (
+                    text if isinstance(text, str) else None
+                )
+            else:
+                yield number, None
+
+
+def iter_chunks(records: Iterator[Record], size: int) -> Iterator[List[Record]]:
+    chunk: List[Record] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _init_worker(threads: int) -> None:
+    """Load one analyzer per worker process with a fixed torch thread count."""
+    global _analyzer
+    if threads:
+        import torch
+
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    _analyzer = SentimentAnalyzer()
+
+
+def _score_chunk(chunk: List[Record]) -> List[Dict[str, Any]]:
+    assert _analyzer is not None, "worker not initialized"
+    texts = [text for _, text in chunk if text is not None]
+    results = iter(_analyzer.analyze_batch(texts) if texts else [])
+    outputs = []
+    for record_id, text in chunk:
+        if text is None:
+            outputs.append({"id": record_id, "error": "missing text"})
+        else:
+            outputs.append({"id": record_id, **next(results)})
+    return outputs
+
+
+def run(
+    input_path: Path,
+    output_path: Path,
+    checkpoint_path: Path,
+    workers: int,
+    threads: int,
+    chunk_size: int,
+    text_field: str = "text",
+    id_field: str = "id",
+    resume: bool = False,
+) -> Dict[str, float]:
+    """
+    Score every record of ``input_path`` into ``output_path``. With
+    ``workers=0`` chunks are scored in this process, which is handy for
+    debugging. Returns a summary with the record rate.
+    """
+    checkpoint = Checkpoint.load(checkpoint_path) if resume else Checkpoint()
+    records = iter_records(input_path, text_field, id_field)
+    for _ in range(checkpoint.records_done):
+        next(records, None)
+    if checkpoint.records_done:
+        logger.info(f"Resuming after {checkpoint.records_done} records")
+
+    started = time.perf_counter()
+    scored = 0
+    mode = "r+b" if resume and output_path.exists() else "wb"
+    with open(output_path, mode) as output:
+        # Drop anything written after the last checkpoint
+        output.truncate(checkpoint.output_bytes)
+        output.seek(checkpoint.output_bytes)
+
+        def write(results: List[Dict[str, Any]]) -> None:
+            nonlocal scored
+            output.write(
+                "".join(json.dumps(result) + "\n" for result in results).encode()
+            )
+            output.flush()
+            os.fsync(output.fileno())
+            scored += len(results)
+            checkpoint.records_done += len(results)
+            checkpoint.output_bytes = output.tell()
+            checkpoint.save(checkpoint_path)
+            elapsed = time.perf_counter() - started
+            logger.info(
+                f"{checkpoint.records_done} records done, "
+                f"{scored / elapsed:.1f} records/sec"
+            )
+
+        chunks = iter_chunks(records, chunk_size)
+        if workers == 0:
+            _init_worker(threads)
+            for chunk in chunks:
+                write(_score_chunk(chunk))
+        else:
+            context = multiprocessing.get_context("spawn")
+            with context.Pool(workers, _init_worker, (threads,)) as pool:
+                # Keep a bounded window of chunks in flight so the input is
+                # streamed rather than queued up front, and write in order
+                pending: Deque[Any] = deque()
+                for chunk in chunks:
+                    pending.append(pool.apply_async(_score_chunk, (chunk,)))
+                    if len(pending) >= workers * 2:
+                        write(pending.popleft().get())
+                while pending:
+                    write(pending.popleft().get())
+
+    elapsed = time.perf_counter() - started
+    return {
+        "records": scored,
+        "seconds": round(elapsed, 2),
+        "records_per_second": round(scored / elapsed, 1) if elapsed else 0.0,
+        "workers": workers,
+        "threads_per_worker": threads,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("input", type=Path, help="JSONL or CSV file")
+    parser.add_argument("--output", type=Path, required=True)
+    parser.add_argument(
+        "--checkpoint", type=Path, help="Defaults to <output>.checkpoint"
+    )
+    parser.add_argument("--resume", action="store_true")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--id-field", default="id")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    summary = run(
+        args.input,
+        args.output,
+        args.checkpoint or args.output.with_name(args.output.name + ".checkpoint"),
+        workers=args.workers,
+        threads=args.threads_per_worker,
+        chunk_size=args.chunk_size,
+        text_field=args.text_field,
+        id_field=args.id_field,
+        resume=args.resume,
+    )
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Drop cache entries that the running configuration can no longer read:
+old-style ``analysis:<text>`` keys and keys of older model or scoring versions.
+
+Usage:
+    python -m app.compact_cache [--dry-run]
+"""
+
+import argparse
+import asyncio
+import logging
+import redis.asyncio as redis
+from app.core.config import get_settings
+from app.services.backends import backend_identity
+from app.services.cache import CacheService, close_redis_pool
+from app.services.keys import CACHE_KEY_PREFIX, key_namespace
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+async def compact(
+    redis_client: redis.Redis, dry_run: bool = False, scan_count: int = 1000
+) -> int:
+    """Delete stale analysis keys. Returns how many keys were (or would be) removed."""
+    current = key_namespace(
+        settings.SENTIMENT_MODEL_NAME,
+        settings.SENTIMENT_MODEL_REVISION,
+        backend_identity(settings.INFERENCE_BACKEND, settings.ONNX_MODEL_PATH),
+    )
+    removed = 0
+    batch = []
+    async for key in redis_client.scan_iter(
+        match=f"{CACHE_KEY_PREFIX}:*", count=scan_count
+    ):
+        if key.decode(errors="replace").startswith(f"{current}:"):
+            continue
+        batch.append(key)
+        if len(batch) >= scan_count:
+            removed += len(batch)
+            if not dry_run:
+                await redis_client.unlink(*batch)
+            batch = []
+    if batch:
+        removed += len(batch)
+        if not dry_run:
+            await redis_client.unlink(*batch)
+    return removed
+
+
+async def run(dry_run: bool) -> int:
+    try:
+        return await compact(CacheService().redis_client, dry_run=dry_run)
+    finally:
+        await close_redis_pool()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Count stale keys without deleting"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    removed = asyncio.run(run(args.dry_run))
+    action = "Would remove" if args.dry_run else "Removed"
+    logger.info(f"{action} {removed} stale cache keys")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,17 +12,144 @@ class Settings(BaseSettings):
     # API Configuration
     API_KEY: str = os.getenv("API_KEY", "")
     API_KEY_NAME: str = "X-API-Key"
+    # Redis hash of SHA-256 key hashes to tenant ids, for keys beyond API_KEY;
+    # empty to only accept API_KEY
+    API_KEYS_REDIS_HASH: str = "api_keys"
+    API_KEYS_REFRESH_SECONDS: float = 30.0
     PORT: int = cast(int, os.getenv("PORT", 8000))
 
     # Redis Configuration
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: float = 0.25
+    REDIS_SOCKET_TIMEOUT: float = 0.25
+    REDIS_CONNECT_TIMEOUT: float = 0.25
+    REDIS_RETRY_INTERVAL: float = 5.0
+
+    # In-process (L1) Cache Configuration
+    L1_CACHE_ENABLED: bool = True
+    L1_CACHE_MAX_ITEMS: int = 10000
+    L1_CACHE_TTL: float = 300.0
+
+    # Cache Keys
+    CACHE_KEY_CASEFOLD: bool = True
+    # Replace mentions, URLs and emoji with bertweet's placeholders in the
+    # sentiment model's input and cache keys. Other heads get the raw text
+    TWEET_NORMALIZATION: bool = True
+
+    # Near-duplicate lookup: a cache miss reuses the cached result of a text
+    # whose SimHash differs in at most NEAR_DUPLICATE_MAX_DISTANCE of 64 bits
+    NEAR_DUPLICATE_ENABLED: bool = False
+    NEAR_DUPLICATE_MAX_DISTANCE: int = 3
+    # Shorter texts have too few shingles for a meaningful fingerprint
+    NEAR_DUPLICATE_MIN_TOKENS: int = 8
+    NEAR_DUPLICATE_MAX_ITEMS: int = 100000
+
+    # Request Coalescing
+    COALESCING_ENABLED: bool = True
+    DISTRIBUTED_COALESCING_ENABLED: bool = False
+    COALESCING_LOCK_TTL_MS: int = 5000
+    COALESCING_WAIT_TIMEOUT_MS: int = 3000
+    COALESCING_POLL_INTERVAL_MS: int = 20
 
     # Server Configuration
     HOST: str = "0.0.0.0"
     DEBUG: bool = False
 
-    # Rate Limiting
+    # Model Configuration
+    SENTIMENT_MODEL_NAME: str = "finiteautomata/bertweet-base-sentiment-analysis"
+    SENTIMENT_MODEL_REVISION: Optional[str] = None
+    MODEL_PRELOAD: bool = True
+    MODEL_WARMUP: bool = True
+    # Load from a snapshot made with `python -m app.download_model` instead of
+    # the Hugging Face hub, with no network lookups
+    MODEL_DIR: Optional[str] = None
+    # Only use files already in the local Hugging Face cache
+    MODEL_LOCAL_FILES_ONLY: bool = False
+
+    # Moderation heads besides sentiment, run when a request asks for them.
+    # Empty model names leave a head disabled.
+    TOXICITY_MODEL_NAME: str = ""
+    TOXICITY_MODEL_REVISION: Optional[str] = None
+    EMOTION_MODEL_NAME: str = ""
+    EMOTION_MODEL_REVISION: Optional[str] = None
+    # Multi-label heads list the labels scoring at least this as flagged
+    HEAD_FLAG_THRESHOLD: float = 0.5
+    # Heads run when a request doesn't name any
+    DEFAULT_HEADS: List[str] = ["sentiment"]
+
+    # Inference Backend: "torch", "torch-int8" or "onnx"
+    INFERENCE_BACKEND: str = "torch"
+    INFERENCE_THREADS: int = 0  # 0 keeps the library default
+    ONNX_MODEL_PATH: str = "models/sentiment.onnx"
+
+    # Inference Executor and load shedding
+    INFERENCE_WORKERS: int = 1  # threads running forward passes
+    INFERENCE_MAX_PENDING: int = 256  # queued texts or jobs before shedding
+    INFERENCE_TIMEOUT_MS: float = 10000.0  # per-request deadline; 0 disables
+    OVERLOAD_RETRY_AFTER_SECONDS: int = 1
+
+    # Inference Batching
+    BATCHING_ENABLED: bool = True
+    BATCH_MAX_SIZE: int = 32
+    BATCH_MAX_WAIT_MS: float = 5.0
+    MAX_BATCH_TEXTS: int = 1000
+    BATCH_MAX_TOKENS: int = 16384  # padded tokens per forward pass
+
+    # Streaming Bulk Analysis
+    STREAM_BATCH_SIZE: int = 64
+    STREAM_MAX_PENDING_BATCHES: int = 2
+    STREAM_MAX_LINE_BYTES: int = 1048576
+
+    # Long Texts: "first" (truncate), "mean" or "max_negative" over windows
+    MAX_SEQUENCE_LENGTH: int = 512
+    LONG_TEXT_POLICY: str = "mean"
+    CHUNK_OVERLAP_TOKENS: int = 32
+
+    # Rate Limiting, per API key
+    RATE_LIMIT_ENABLED: bool = True
+    # Tokens refilled per minute; batches and streams take one per text
     RATE_LIMIT_PER_MINUTE: int = 60
+    RATE_LIMIT_BURST: int = 0  # bucket size; 0 uses RATE_LIMIT_PER_MINUTE
+    # "redis" (exact, one round trip per request) or "local" (approximate,
+    # synced with Redis every RATE_LIMIT_SYNC_INTERVAL_MS)
+    RATE_LIMIT_MODE: str = "redis"
+    RATE_LIMIT_SYNC_INTERVAL_MS: float = 1000.0
+
+    # Asynchronous jobs: "redis" queues them for python -m app.worker
+    # processes, "local" runs them on a task in each API process
+    JOB_QUEUE_MODE: str = "redis"
+    JOB_MAX_TEXTS: int = 50000
+    # Texts a worker takes per round; small jobs are combined up to this
+    JOB_BATCH_SIZE: int = 512
+    # How long jobs and their results are kept
+    JOB_TTL_SECONDS: int = 86400
+    # Signs webhook bodies with HMAC-SHA256 when set
+    JOB_WEBHOOK_SECRET: str = ""
+    JOB_WEBHOOK_TIMEOUT_SECONDS: float = 5.0
+    JOB_WEBHOOK_RETRIES: int = 3
+    # Hosts webhooks may be sent to. When empty, any https host that
+    # resolves to public addresses only
+    JOB_WEBHOOK_ALLOWED_HOSTS: List[str] = []
+    # Added to worker processes' niceness so API processes on the same host
+    # get the CPU first
+    JOB_WORKER_NICE: int = 10
+
+    # Metrics
+    METRICS_ENABLED: bool = True
+
+    # Tracing and profiling
+    SERVER_TIMING_ENABLED: bool = False
+    ADMIN_API_KEY: str = ""
+    PROFILE_MAX_SECONDS: float = 60.0
+
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    LOG_SINK: str = "stdout"
+    LOG_FILE: str = "app.log"
+    LOG_SAMPLE_RATE: float = 1.0
+    LOG_INPUT_TEXT: bool = False
 
     # Content Analysis Configuration
     POSITIVE_WORDS: List[str] = [
@@ -62,6 +189,17 @@ class Settings(BaseSettings):
         "trash",
     ]
 
+    # Lexicon pre-filter: "off", "shadow" or "short_circuit"
+    LEXICON_POLICY: str = "off"
+    LEXICON_TOXIC_MIN_HITS: int = 2
+    LEXICON_CONFIDENCE: float = 0.9
+
+    # Cascade: a small hashed n-gram model answers first, and only texts it
+    # scores below the confidence threshold go to the full model. Disabled
+    # when no model path is set (train one with python -m app.train_cascade)
+    CASCADE_MODEL_PATH: str = ""
+    CASCADE_CONFIDENCE_THRESHOLD: float = 0.9
+
     model_config = SettingsConfigDict(
         env_file=".env", env_file_encoding="utf-8", case_sensitive=True, extra="ignore"
     )
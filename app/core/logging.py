@@ -0,0 +1,140 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+from app.core.config import get_settings
+
+settings = get_settings()
+
+LOG_FORMATS = ("json", "text")
+LOG_SINKS = ("stdout", "file", "none")
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Pass as ``extra`` on per-request lines so they are subject to sampling
+SAMPLED: Dict[str, Any] = {"sampled": True}
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "sampled"}
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of records logged with ``extra=SAMPLED``.
+    Warnings and errors are always kept.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not getattr(record, "sampled", False):
+            return True
+        return random.random() < self.rate
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now, since they may change once the caller moves
+        # on, but leave the formatting itself to the listener thread.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _sink_handler(sink: str, log_format: str) -> logging.Handler:
+    handler: logging.Handler
+    if sink == "stdout":
+        handler = logging.StreamHandler(sys.stdout)
+    elif sink == "file":
+        handler = logging.FileHandler(settings.LOG_FILE)
+    elif sink == "none":
+        handler = logging.NullHandler()
+    else:
+        raise ValueError(f"Unknown log sink {sink!r}, expected one of {LOG_SINKS}")
+    if log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    elif log_format == "text":
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    else:
+        raise ValueError(
+            f"Unknown log format {log_format!r}, expected one of {LOG_FORMATS}"
+        )
+    return handler
+
+
+def configure_logging() -> None:
+    """
+    Route all logging through a queue so request handlers never block on
+    the sink. A background listener thread formats records and writes them.
+    Safe to call more than once; later calls replace the earlier setup.
+    """
+    global _listener
+    stop_logging()
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    _listener = QueueListener(
+        log_queue, _sink_handler(settings.LOG_SINK, settings.LOG_FORMAT)
+    )
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_after_fork() -> None:
+    # The listener thread does not survive a fork, e.g. into gunicorn workers
+    if _listener is not None:
+        configure_logging()
+
+
+atexit.register(stop_logging)
+os.register_at_fork(after_in_child=_restart_after_fork)
@@ -0,0 +1,182 @@
+import time
+from typing import Dict, Iterator, Optional
+from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
+from prometheus_client.registry import Collector
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.timing import add_stage_observer
+
+# Latency buckets from 0.5ms to 10s
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+STAGE_SECONDS = Histogram(
+    "moderator_stage_seconds",
+    "Time spent in each processing stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "moderator_request_seconds",
+    "Total HTTP request time, including streaming the response",
+    ["method", "endpoint", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+BATCH_SIZE = Histogram(
+    "moderator_batch_size",
+    "Number of sequences per model forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+SHED_TOTAL = Counter(
+    "moderator_shed",
+    "Inference requests rejected under overload",
+    ["reason"],
+)
+CASCADE_TOTAL = Counter(
+    "moderator_cascade",
+    "Texts scored by the cascade, by the tier that answered",
+    ["tier"],
+)
+NEAR_DUPLICATE_TOTAL = Counter(
+    "moderator_near_duplicate",
+    "Cache misses looked up in the near-duplicate index, by outcome",
+    ["result"],
+)
+JOBS_TOTAL = Counter(
+    "moderator_jobs",
+    "Asynchronous jobs finished, by status",
+    ["status"],
+)
+
+# Histogram children are cached so observing a stage is a dict lookup
+_stage_children: Dict[str, Histogram] = {}
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    child = _stage_children.get(stage)
+    if child is None:
+        child = _stage_children[stage] = STAGE_SECONDS.labels(stage)
+    child.observe(seconds)
+
+
+class ServiceCollector(Collector):
+    """
+    Gauges read from the running services at scrape time, so keeping them up
+    to date costs nothing on the request path.
+    """
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        # Imported here because the services themselves import this module
+        from app.services.cache import CacheService, get_local_cache
+        from app.services.near_duplicates import get_near_duplicate_index
+        from app.services.registry import get_model_registry
+
+        cache = GaugeMetricFamily(
+            "moderator_cache", "Cache counters per tier", labels=["tier", "stat"]
+        )
+        tiers = {"redis": CacheService.redis_stats}
+        local_cache = get_local_cache()
+        if local_cache is not None:
+            tiers["local"] = local_cache.stats
+        for tier, stats in tiers.items():
+            for stat, value in stats.as_dict().items():
+                cache.add_metric([tier, stat], value)
+        yield cache
+
+        registry = get_model_registry()
+        yield GaugeMetricFamily(
+            "moderator_model_ready", "Whether models are loaded", value=registry.ready
+        )
+        if registry.load_seconds is not None:
+            yield GaugeMetricFamily(
+                "moderator_model_load_seconds",
+                "Time taken to load the models",
+                value=registry.load_seconds,
+            )
+        startup = GaugeMetricFamily(
+            "moderator_startup_phase_seconds",
+            "Time taken by each phase of model loading",
+            labels=["phase"],
+        )
+        for phase, seconds in registry.startup_phases.items():
+            startup.add_metric([phase], seconds)
+        yield startup
+        yield GaugeMetricFamily(
+            "moderator_batch_queue_depth",
+            "Texts waiting for the next inference batch",
+            value=registry.batch_queue_depth,
+        )
+        near_duplicates = get_near_duplicate_index()
+        if near_duplicates is not None:
+            yield GaugeMetricFamily(
+                "moderator_near_duplicate_index_size",
+                "Fingerprints in the near-duplicate index",
+                value=len(near_duplicates),
+            )
+        yield GaugeMetricFamily(
+            "moderator_inference_pending",
+            "Inference jobs queued or running in the inference executor",
+            value=registry.inference_pending,
+        )
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the total time of every HTTP request."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Label by route name rather than raw path to bound cardinality
+            route = scope.get("route")
+            REQUEST_SECONDS.labels(
+                scope["method"],
+                getattr(route, "name", "unmatched"),
+                str(status_code),
+            ).observe(time.perf_counter() - started)
+
+
+_service_collector: Optional[ServiceCollector] = None
+
+
+def enable_metrics() -> None:
+    """Start feeding stage timings into the histograms and register gauges."""
+    global _service_collector
+    add_stage_observer(observe_stage)
+    if _service_collector is None:
+        _service_collector = ServiceCollector()
+        REGISTRY.register(_service_collector)
+
+
+def render_metrics() -> bytes:
+    return generate_latest(REGISTRY)
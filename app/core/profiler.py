@@ -0,0 +1,59 @@
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import Dict, List, Optional
+
+# Only one profile may run per process at a time
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusyError(RuntimeError):
+    pass
+
+
+def _folded_stack(frame: Optional[FrameType], thread_name: str) -> str:
+    names: List[str] = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+        frame = frame.f_back
+    names.append(thread_name)
+    return ";".join(reversed(names))
+
+
+def sample_stacks(seconds: float, interval: float = 0.01) -> Dict[str, int]:
+    """
+    Sample the stacks of every thread in the process every ``interval``
+    seconds for ``seconds`` seconds. Returns how often each stack was seen,
+    keyed by the stack in folded form (``thread;outer;...;inner``), which
+    flamegraph.pl and speedscope read directly.
+
+    This runs in the calling thread, which is left out of the samples, and
+    adds no overhead to other threads beyond holding the GIL while sampling.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusyError("A profile is already running")
+    try:
+        own_id = threading.get_ident()
+        counts: Counter = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    thread_name = names.get(thread_id, str(thread_id))
+                    counts[_folded_stack(frame, thread_name)] += 1
+            time.sleep(interval)
+        return dict(counts)
+    finally:
+        _profile_lock.release()
+
+
+def format_folded(counts: Dict[str, int]) -> str:
+    """Render sampled stacks as folded lines, most frequent first."""
+    return "".join(
+        f"{stack} {count}\n"
+        for stack, count in sorted(counts.items(), key=lambda item: -item[1])
+    )
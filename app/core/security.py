@@ -1,13 +1,143 @@
-from fastapi import Security, HTTPException, status
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional, Set
+import redis.asyncio as redis
+from fastapi import Header, Security, HTTPException, status
 from fastapi.security.api_key import APIKeyHeader
 from app.core.config import get_settings
+from app.services.cache import REDIS_ERRORS, decode_reply, get_redis_pool
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
 api_key_header = APIKeyHeader(name=settings.API_KEY_NAME, auto_error=True)
 
+# Tenant of the key configured with API_KEY
+DEFAULT_TENANT = "default"
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """The caller an API key belongs to."""
+
+    tenant_id: str
+    # Short prefix of the key's hash, safe to log
+    key_id: str
+
+
+def hash_api_key(api_key: str) -> str:
+    """Hex SHA-256 of an API key, the form keys are stored in."""
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+class ApiKeyIndex:
+    """
+    In-memory index of API key hashes to the principals they belong to, so
+    checking a key costs one SHA-256 and a dict lookup rather than a Redis
+    round trip, and plaintext keys are never stored.
+
+    Keys come from ``API_KEY`` (tenant ``default``) and from the Redis hash
+    ``API_KEYS_REDIS_HASH``, mapping hex key hashes to tenant ids, which is
+    re-read in the background once the index is older than ``ttl`` seconds.
+    If Redis is unavailable the last loaded keys stay in use.
+    """
+
+    def __init__(
+        self,
+        static_keys: Dict[str, str],
+        redis_hash: str = "",
+        ttl: float = 30.0,
+        redis_client: Optional[redis.Redis] = None,
+    ):
+        self.redis_hash = redis_hash
+        self.ttl = ttl
+        self._redis_client = redis_client
+        self._static = {
+            bytes.fromhex(hash_api_key(key)): tenant
+            for key, tenant in static_keys.items()
+            if key
+        }
+        self._principals = self._build(self._static)
+        self._loaded_at: Optional[float] = None
+        self._refresh_tasks: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._principals)
+
+    def lookup(self, api_key: str) -> Optional[Principal]:
+        """Return the principal for ``api_key``, or None if it is unknown."""
+        # The lookup compares SHA-256 digests, never the keys themselves, so
+        # its timing tells an attacker nothing about a valid key
+        return self._principals.get(hashlib.sha256(api_key.encode()).digest())
+
+    async def authenticate(self, api_key: str) -> Optional[Principal]:
+        """Look up ``api_key``, loading or refreshing the index when due."""
+        if self.redis_hash:
+            if self._loaded_at is None:
+                await self.refresh()
+            elif time.monotonic() - self._loaded_at >= self.ttl:
+                self._refresh_in_background()
+        return self.lookup(api_key)
+
+    async def refresh(self) -> None:
+        """Reload the keys stored in Redis."""
+        # Mark the index fresh up front so concurrent requests don't start
+        # refreshes of their own meanwhile
+        self._loaded_at = time.monotonic()
+        client = self._redis_client or redis.Redis(connection_pool=get_redis_pool())
+        try:
+            stored = await client.hgetall(self.redis_hash)
+        except REDIS_ERRORS as e:
+            logger.warning("Could not load API keys from Redis: %r", e)
+            return
+        keys = dict(self._static)
+        for key_hash, tenant in stored.items():
+            try:
+                keys[bytes.fromhex(decode_reply(key_hash))] = decode_reply(tenant)
+            except ValueError:
+                logger.warning("Ignoring malformed API key hash %r", key_hash[:8])
+        self._principals = self._build(keys)
+        logger.debug("Loaded %d API keys", len(self._principals))
+
+    def _refresh_in_background(self) -> None:
+        if self._refresh_tasks:
+            return
+        task = asyncio.get_running_loop().create_task(self.refresh())
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    @staticmethod
+    def _build(keys: Dict[bytes, str]) -> Dict[bytes, Principal]:
+        return {
+            digest: Principal(tenant_id=tenant, key_id=digest.hex()[:8])
+            for digest, tenant in keys.items()
+        }
+
+
+@lru_cache()
+def get_api_key_index() -> ApiKeyIndex:
+    """Return the process-wide API key index."""
+    return ApiKeyIndex(
+        {settings.API_KEY: DEFAULT_TENANT},
+        redis_hash=settings.API_KEYS_REDIS_HASH,
+        ttl=settings.API_KEYS_REFRESH_SECONDS,
+    )
+
+
+async def get_principal(x_api_key: str = Header(...)) -> Principal:
+    """Authenticate the request's API key and return who it belongs to."""
+    principal = await get_api_key_index().authenticate(x_api_key)
+    if principal is None:
+        logger.warning("Invalid API key attempt")
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    return principal
+
 
 async def get_api_key(api_key_header: str = Security(api_key_header)) -> str:
-    if api_key_header == settings.API_KEY:
+    if api_key_header and get_api_key_index().lookup(api_key_header) is not None:
         return api_key_header
     raise HTTPException(
         status_code=status.HTTP_403_FORBIDDEN, detail="Could not validate API key"
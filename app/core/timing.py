@@ -0,0 +1,114 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+StageObserver = Callable[[str, float], None]
+
+_observers: List[StageObserver] = []
+
+# Timings being collected for the current request or startup, if any
+_collected_timings: ContextVar[Optional["StageTimings"]] = ContextVar(
+    "collected_timings", default=None
+)
+
+
+def add_stage_observer(observer: StageObserver) -> None:
+    """Register a callback receiving (stage, seconds) for every timed stage."""
+    if observer not in _observers:
+        _observers.append(observer)
+
+
+def remove_stage_observer(observer: StageObserver) -> None:
+    if observer in _observers:
+        _observers.remove(observer)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    for observer in _observers:
+        observer(stage, seconds)
+    collected_timings = _collected_timings.get()
+    if collected_timings is not None:
+        collected_timings(stage, seconds)
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Time the enclosed block and report it as ``stage``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+@contextmanager
+def collect_stages() -> Iterator["StageTimings"]:
+    """
+    Collect the stages timed within the block, in this context only, such as
+    the stages of one request while others run concurrently.
+    """
+    timings = StageTimings()
+    token = _collected_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _collected_timings.reset(token)
+
+
+class StageTimings:
+    """Observer accumulating total seconds and call counts per stage."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+
+    def __call__(self, stage: str, seconds: float) -> None:
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        return {
+            stage: {"seconds": round(total, 6), "calls": self.calls[stage]}
+            for stage, total in self.seconds.items()
+        }
+
+    def server_timing(self) -> str:
+        """Format the timings as a ``Server-Timing`` header value."""
+        return ", ".join(
+            f"{stage};dur={total * 1000:.2f}" for stage, total in self.seconds.items()
+        )
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware collecting the stages timed while handling each request
+    and reporting them in a ``Server-Timing`` response header.
+
+    Stages run in the request's own context are attributed to it, including
+    work handed to ``asyncio.to_thread``. Work done by shared background tasks,
+    such as the batch scheduler's forward pass, shows up as the time spent
+    waiting for it instead.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        with collect_stages() as timings:
+
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    timings("total", time.perf_counter() - started)
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", timings.server_timing())
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,65 @@
+"""
+Snapshot the sentiment model into a local directory for offline loading.
+
+The tokenizer and model are saved with safetensors weights, which are
+memory-mapped when loaded, together with the hub name and resolved commit they
+came from. Point MODEL_DIR at the directory to load it without any network
+lookups.
+
+Usage:
+    python -m app.download_model --output models/sentiment
+    python -m app.download_model --output models/sentiment --revision <commit>
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+from typing import Optional
+from app.core.config import get_settings
+from app.services.model_store import write_model_info
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def snapshot(model_name: str, revision: Optional[str], output: Path) -> Optional[str]:
+    """
+    Save the model and tokenizer to ``output``. Returns the resolved revision,
+    or None for models without one, such as a local directory.
+    """
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name, revision=revision)
+    model = AutoModelForSequenceClassification.from_pretrained(
+        model_name, revision=revision
+    )
+    # Pin the exact commit so every replica scores with the same weights
+    resolved = getattr(model.config, "_commit_hash", None) or revision
+
+    output.mkdir(parents=True, exist_ok=True)
+    tokenizer.save_pretrained(output)
+    model.save_pretrained(output, safe_serialization=True)
+    write_model_info(str(output), model_name, resolved)
+    return resolved
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default=settings.SENTIMENT_MODEL_NAME)
+    parser.add_argument("--revision", default=settings.SENTIMENT_MODEL_REVISION)
+    parser.add_argument("--output", type=Path, default=Path("models/sentiment"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    try:
+        revision = snapshot(args.model, args.revision, args.output)
+    except OSError as e:
+        logger.error(f"Could not download {args.model}: {e}")
+        sys.exit(1)
+    logger.info(f"Saved {args.model}@{revision or 'latest'} to {args.output}")
+    logger.info(f"Set MODEL_DIR={args.output} to load it offline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Export the sentiment model to ONNX and check it against the PyTorch model.
+
+Usage:
+    python -m app.export_onnx --output models/sentiment.onnx [--quantize]
+
+Exits with a non-zero status if the exported model's softmax scores differ
+from PyTorch's by more than ``--tolerance`` on the sample texts.
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+from typing import List
+import numpy as np
+import torch
+from transformers import AutoTokenizer
+from app.core.config import get_settings
+from app.services.backends import OnnxBackend, TorchBackend
+from app.services.classifier import softmax
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+SAMPLE_TEXTS = [
+    "I love this product! It's amazing!",
+    "I hate this product! It's terrible!",
+    "Today is Sunday",
+    "Hello! @#$%^&*()",
+    "This is a test sentence with multiple words. " * 8,
+]
+
+
+def export(model_name: str, revision: str, output: Path, opset: int) -> None:
+    tokenizer = AutoTokenizer.from_pretrained(model_name, revision=revision)
+    model = TorchBackend(model_name, revision).model.cpu()
+    inputs = tokenizer(SAMPLE_TEXTS[:2], return_tensors="pt", padding=True)
+    input_names = [name for name in ("input_ids", "attention_mask") if name in inputs]
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    torch.onnx.export(
+        model,
+        tuple(inputs[name] for name in input_names),
+        str(output),
+        input_names=input_names,
+        output_names=["logits"],
+        dynamic_axes={
+            **{name: {0: "batch", 1: "sequence"} for name in input_names},
+            "logits": {0: "batch"},
+        },
+        opset_version=opset,
+        dynamo=False,
+    )
+    logger.info(f"Exported {model_name} to {output}")
+
+
+def quantize(path: Path) -> Path:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized = path.with_name(f"{path.stem}.int8{path.suffix}")
+    quantize_dynamic(str(path), str(quantized), weight_type=QuantType.QInt8)
+    logger.info(f"Wrote int8 quantized model to {quantized}")
+    return quantized
+
+
+def max_difference(
+    model_name: str, revision: str, onnx_path: Path, texts: List[str]
+) -> float:
+    """Largest absolute difference in softmax scores between the two backends."""
+    tokenizer = AutoTokenizer.from_pretrained(model_name, revision=revision)
+    # As in SequenceClassifier: longer inputs overflow the position embeddings
+    max_length = min(settings.MAX_SEQUENCE_LENGTH, tokenizer.model_max_length)
+    inputs = dict(
+        tokenizer(
+            texts,
+            return_tensors="np",
+            truncation=True,
+            max_length=max_length,
+            padding=True,
+        )
+    )
+    expected = softmax(TorchBackend(model_name, revision).predict_logits(inputs))
+    actual = softmax(OnnxBackend(str(onnx_path)).predict_logits(inputs))
+    return float(np.abs(expected - actual).max())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default=settings.SENTIMENT_MODEL_NAME)
+    parser.add_argument("--revision", default=settings.SENTIMENT_MODEL_REVISION)
+    parser.add_argument("--output", type=Path, default=Path(settings.ONNX_MODEL_PATH))
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument(
+        "--quantize", action="store_true", help="Also write a dynamic int8 model"
+    )
+    parser.add_argument("--tolerance", type=float, default=1e-4)
+    parser.add_argument(
+        "--quantized-tolerance",
+        type=float,
+        default=0.05,
+        help="Tolerance for the int8 model, which trades accuracy for speed",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    export(args.model, args.revision, args.output, args.opset)
+    checks = [(args.output, args.tolerance)]
+    if args.quantize:
+        checks.append((quantize(args.output), args.quantized_tolerance))
+
+    failed = False
+    for path, tolerance in checks:
+        difference = max_difference(args.model, args.revision, path, SAMPLE_TEXTS)
+        ok = difference <= tolerance
+        failed = failed or not ok
+        logger.info(
+            f"{path}: max score difference {difference:.2e} "
+            f"({'ok' if ok else 'FAILED'}, tolerance {tolerance:.0e})"
+        )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,29 @@
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from app.api.routes import router
 from app.core.config import get_settings
+from app.core.logging import configure_logging
+from app.core.security import get_api_key_index
+from app.core.timing import ServerTimingMiddleware
+from app.core.metrics import (
+    CONTENT_TYPE_LATEST,
+    MetricsMiddleware,
+    enable_metrics,
+    render_metrics,
+)
+from app.services.cache import close_redis_pool, get_redis_pool
+from app.services.jobs import JobRunner, bulk_moderation_service, get_job_queue
+from app.services.registry import get_model_registry
+import asyncio
 import os
 import logging
-import sys
+import time
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.StreamHandler(sys.stdout), logging.FileHandler("app.log")],
-)
+configure_logging()
 
 # Create logger
 logger = logging.getLogger(__name__)
@@ -21,10 +31,45 @@ logger.info("Starting Content Moderator API")
 
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create the Redis connection pool, load API keys and load models once per
+    process before serving traffic.
+    When preloading is disabled, models are loaded on the first request.
+    In local job queue mode, jobs are also run on a task in this process.
+    """
+    started = time.perf_counter()
+    get_redis_pool()
+    if settings.API_KEYS_REDIS_HASH:
+        await get_api_key_index().refresh()
+    registry = get_model_registry()
+    if settings.MODEL_PRELOAD:
+        await asyncio.to_thread(registry.load, warmup=settings.MODEL_WARMUP)
+    logger.info("Startup completed in %.2fs", time.perf_counter() - started)
+    stop_jobs = asyncio.Event()
+    job_task = None
+    if settings.JOB_QUEUE_MODE == "local":
+        # Models are loaded on the first job, off the event loop
+        runner = JobRunner(
+            get_job_queue(), bulk_moderation_service, settings.JOB_BATCH_SIZE
+        )
+        job_task = asyncio.create_task(runner.run(stop_jobs))
+    yield
+    if job_task is not None:
+        stop_jobs.set()
+        await job_task
+        await runner.aclose()
+    await registry.aclose()
+    await close_redis_pool()
+
+
 app = FastAPI(
     title="Content Moderator API",
     description="AI-powered content moderation service",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 port = settings.PORT
@@ -38,6 +83,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.METRICS_ENABLED:
+    enable_metrics()
+    app.add_middleware(MetricsMiddleware)
+
+if settings.SERVER_TIMING_ENABLED:
+    app.add_middleware(ServerTimingMiddleware)
+
 # Set up templates
 templates = Jinja2Templates(directory="app/templates")
 
@@ -47,5 +99,13 @@ app.include_router(router, prefix="/api/v1")
 
 @app.get("/")
 async def root(request: Request):
-    logger.info("Serving root endpoint")
+    logger.debug("Serving root endpoint")
     return templates.TemplateResponse(request, "index.html")
+
+
+if settings.METRICS_ENABLED:
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics() -> Response:
+        """Prometheus metrics for this process."""
+        return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,155 @@
+import logging
+from typing import Any, Dict, Optional
+import numpy as np
+from app.core.timing import stage_timer
+
+# torch, transformers and onnxruntime are imported when a backend is created,
+# so importing the app stays fast and only the chosen runtime is loaded.
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceBackend:
+    """
+    Runs a sequence classification model over tokenized inputs.
+    Inputs are NumPy arrays as returned by the tokenizer; output is the logits.
+    """
+
+    name = "base"
+    model: Any = None
+
+    @property
+    def identity(self) -> str:
+        """What the backend's scores depend on besides the model, for cache keys."""
+        return backend_identity(self.name)
+
+    def predict_logits(self, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class TorchBackend(InferenceBackend):
+    """Eager PyTorch model, on GPU when one is available."""
+
+    name = "torch"
+
+    def __init__(
+        self,
+        model_name: str,
+        revision: Optional[str] = None,
+        threads: int = 0,
+        local_files_only: bool = False,
+    ):
+        with stage_timer("import"):
+            import torch
+            from transformers import AutoModelForSequenceClassification
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        with stage_timer("load_model"):
+            self.model = AutoModelForSequenceClassification.from_pretrained(
+                model_name, revision=revision, local_files_only=local_files_only
+            )
+            self.model.to(self.device)
+            self.model.eval()
+
+    def predict_logits(self, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        import torch
+
+        tensors = {
+            name: torch.from_numpy(array).to(self.device)
+            for name, array in inputs.items()
+        }
+        with torch.inference_mode():
+            logits = self.model(**tensors).logits
+        return logits.float().cpu().numpy()
+
+
+class QuantizedTorchBackend(TorchBackend):
+    """PyTorch model with Linear layers dynamically quantized to int8, CPU only."""
+
+    name = "torch-int8"
+
+    def __init__(
+        self,
+        model_name: str,
+        revision: Optional[str] = None,
+        threads: int = 0,
+        local_files_only: bool = False,
+    ):
+        import torch
+
+        super().__init__(model_name, revision, threads, local_files_only)
+        self.device = torch.device("cpu")
+        self.model = torch.ao.quantization.quantize_dynamic(
+            self.model.to(self.device), {torch.nn.Linear}, dtype=torch.qint8
+        )
+
+
+class OnnxBackend(InferenceBackend):
+    """ONNX Runtime session over a graph exported with ``python -m app.export_onnx``."""
+
+    name = "onnx"
+
+    def __init__(self, onnx_path: str, threads: int = 0):
+        try:
+            with stage_timer("import"):
+                import onnxruntime
+        except ImportError as e:  # optional dependency
+            raise RuntimeError(
+                "The onnx backend requires onnxruntime: pip install onnxruntime"
+            ) from e
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        with stage_timer("load_model"):
+            self.model = onnxruntime.InferenceSession(
+                onnx_path, options, providers=["CPUExecutionProvider"]
+            )
+        self.input_names = {graph_input.name for graph_input in self.model.get_inputs()}
+        self.onnx_path = onnx_path
+
+    @property
+    def identity(self) -> str:
+        return backend_identity(self.name, self.onnx_path)
+
+    def predict_logits(self, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        feed = {
+            name: array.astype(np.int64)
+            for name, array in inputs.items()
+            if name in self.input_names
+        }
+        return self.model.run(None, feed)[0]
+
+
+BACKENDS = ("torch", "torch-int8", "onnx")
+
+
+def backend_identity(name: str, onnx_path: Optional[str] = None) -> str:
+    """
+    Backend name, qualified for onnx by the exported graph, which may be
+    quantized or come from another export than its neighbours.
+    """
+    if name == "onnx":
+        return f"{name}:{onnx_path}"
+    return name
+
+
+def load_backend(
+    name: str,
+    model_name: str,
+    revision: Optional[str] = None,
+    threads: int = 0,
+    onnx_path: Optional[str] = None,
+    local_files_only: bool = False,
+) -> InferenceBackend:
+    """Create the inference backend called ``name``."""
+    if name == "torch":
+        return TorchBackend(model_name, revision, threads, local_files_only)
+    if name == "torch-int8":
+        return QuantizedTorchBackend(model_name, revision, threads, local_files_only)
+    if name == "onnx":
+        if not onnx_path:
+            raise ValueError("ONNX_MODEL_PATH must be set for the onnx backend")
+        return OnnxBackend(onnx_path, threads)
+    raise ValueError(f"Unknown inference backend {name!r}, expected one of {BACKENDS}")
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+from typing import Callable, List, Optional, Tuple
+import numpy as np
+from app.core.metrics import SHED_TOTAL
+from .executor import DeadlineExceededError, InferenceExecutor, OverloadedError
+
+logger = logging.getLogger(__name__)
+
+PredictFn = Callable[[List[str]], np.ndarray]
+
+
+class BatchScheduler:
+    """
+    Dynamic micro-batching for model inference.
+
+    Concurrent callers submit single texts; a background task collects them
+    into batches of at most ``max_batch_size`` texts, waiting at most
+    ``max_wait_ms`` after the first text arrives, runs the forward pass in an
+    executor thread and resolves each caller with its own row of scores.
+
+    With ``max_queue_size``, submissions beyond that many waiting texts fail
+    with OverloadedError. With ``timeout``, callers give up after that many
+    seconds and their texts are left out of any batch not yet started.
+    """
+
+    def __init__(
+        self,
+        predict: PredictFn,
+        max_batch_size: int,
+        max_wait_ms: float,
+        executor: Optional[InferenceExecutor] = None,
+        max_queue_size: int = 0,
+        timeout: float = 0.0,
+    ):
+        self.predict = predict
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.executor = executor
+        self.max_queue_size = max(0, max_queue_size)
+        self.timeout = max(0.0, timeout)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, text: str) -> np.ndarray:
+        """Queue a text for the next batch and wait for its scores."""
+        queue = self._ensure_worker()
+        if self.max_queue_size and queue.qsize() >= self.max_queue_size:
+            SHED_TOTAL.labels("queue_full").inc()
+            raise OverloadedError("Inference queue is full")
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        queue.put_nowait((text, future))
+        try:
+            return await asyncio.wait_for(future, self.timeout or None)
+        except asyncio.TimeoutError:
+            SHED_TOTAL.labels("deadline").inc()
+            raise DeadlineExceededError(
+                f"Inference did not finish within {self.timeout:.2f}s"
+            ) from None
+
+    async def close(self) -> None:
+        """Stop the background worker."""
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+        self._queue = None
+        self._loop = None
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        # The worker is bound to the event loop it was started on, so start a
+        # fresh one if we are now running on a different loop.
+        loop = asyncio.get_running_loop()
+        if (
+            self._queue is None
+            or self._worker is None
+            or self._worker.done()
+            or self._loop is not loop
+        ):
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run(self._queue))
+        return self._queue
+
+    async def _collect(self, queue: asyncio.Queue) -> List[Tuple[str, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not queue.empty():
+                batch.append(queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect(queue)
+            # Skip callers that gave up while waiting
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            texts = [text for text, _ in batch]
+            try:
+                if self.executor is not None:
+                    # Callers enforce their own deadlines while waiting
+                    scores = await self.executor.run(self.predict, texts, timeout=0)
+                else:
+                    scores = await loop.run_in_executor(None, self.predict, texts)
+            except Exception as e:
+                logger.error("Error in batched inference: %s", e)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for row, (_, future) in zip(scores, batch):
+                if not future.done():
+                    future.set_result(row)
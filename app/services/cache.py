@@ -1,32 +1,321 @@
+import asyncio
 import json
-from typing import Optional, Any
-import redis
+import logging
+import secrets
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Any, Tuple, Union
+import redis.asyncio as redis
+from redis.exceptions import RedisError
 from app.core.config import get_settings
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Errors that mean Redis is slow or unreachable rather than a bug in our code
+REDIS_ERRORS = (RedisError, OSError, asyncio.TimeoutError)
+
+
+def decode_reply(value: Union[bytes, str]) -> str:
+    """A Redis string reply as text, whether or not the client decodes replies."""
+    return value.decode() if isinstance(value, bytes) else value
+
+
+# Delete a lock only if it still holds our token
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Connections are bound to the event loop that opened them, so keep one
+# bounded pool per running loop (in production there is exactly one).
+_pools: (
+    "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, redis.BlockingConnectionPool]"
+) = weakref.WeakKeyDictionary()
+
+
+@dataclass(slots=True)
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hit_ratio,
+        }
+
+
+class LRUCache:
+    """
+    In-process cache bounded by item count and TTL, evicting the least
+    recently used entry when full. Values are stored as given, not serialized.
+    """
+
+    def __init__(self, max_items: int, ttl: float):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._items: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self._items.get(key)
+        if item is None:
+            self.stats.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._items[key]
+            self.stats.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._items[key] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+            self.stats.evictions += 1
+
+    def delete(self, key: str) -> None:
+        self._items.pop(key, None)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+@lru_cache()
+def get_local_cache() -> Optional[LRUCache]:
+    """Return the process-wide L1 cache, or None when it is disabled."""
+    if not settings.L1_CACHE_ENABLED:
+        return None
+    return LRUCache(settings.L1_CACHE_MAX_ITEMS, settings.L1_CACHE_TTL)
+
+
+def _to_json(value: Any) -> Any:
+    # Cached result objects are stored in Redis in their API dict form
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def get_redis_pool() -> redis.BlockingConnectionPool:
+    """Return the shared connection pool for the running event loop."""
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = redis.BlockingConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+        )
+        _pools[loop] = pool
+    return pool
+
+
+async def close_redis_pool() -> None:
+    """Disconnect the pool for the running event loop."""
+    pool = _pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool.disconnect()
+
 
 class CacheService:
-    def __init__(self):
-        self.redis_client = redis.from_url(settings.REDIS_URL)
+    """
+    Two-tier cache: an optional in-process LRU (L1) in front of Redis (L2),
+    which runs on a shared, bounded connection pool.
+
+    L2 values are JSON. Callers can pass a ``decoder`` when reading to turn
+    the decoded JSON back into their own objects before it is kept in L1.
+
+    Redis failures never fail the caller: reads behave as misses and writes
+    are dropped. After a failure Redis is skipped for ``REDIS_RETRY_INTERVAL``
+    seconds so requests don't each wait for a timeout while it is down.
+    """
+
+    # Monotonic time until which Redis is considered unavailable
+    _unavailable_until = 0.0
+    # Process-wide Redis hit/miss counters
+    redis_stats = CacheStats()
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        local_cache: Optional[LRUCache] = None,
+    ):
+        self._redis_client = redis_client
+        self.local_cache = local_cache if local_cache is not None else get_local_cache()
         self.default_ttl = 3600  # 1 hour
 
-    async def get(self, key: str) -> Optional[Any]:
+    @property
+    def redis_client(self) -> redis.Redis:
+        if self._redis_client is None:
+            self._redis_client = redis.Redis(connection_pool=get_redis_pool())
+        return self._redis_client
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= CacheService._unavailable_until
+
+    def _mark_unavailable(self, operation: str, error: Exception) -> None:
+        CacheService._unavailable_until = (
+            time.monotonic() + settings.REDIS_RETRY_INTERVAL
+        )
+        logger.warning("Redis %s failed, serving uncached: %r", operation, error)
+
+    def _decode(
+        self,
+        key: str,
+        value: Optional[Union[bytes, str]],
+        decoder: Optional[Callable[[Any], Any]],
+    ) -> Optional[Any]:
+        if not value:
+            CacheService.redis_stats.misses += 1
+            return None
+        CacheService.redis_stats.hits += 1
+        decoded = json.loads(value)
+        if decoder is not None:
+            decoded = decoder(decoded)
+        if self.local_cache is not None:
+            self.local_cache.set(key, decoded)
+        return decoded
+
+    async def get(
+        self, key: str, decoder: Optional[Callable[[Any], Any]] = None
+    ) -> Optional[Any]:
         """Get value from cache"""
-        value = self.redis_client.get(key)
-        if value:
-            return json.loads(value)
-        return None
+        if self.local_cache is not None:
+            local_value = self.local_cache.get(key)
+            if local_value is not None:
+                return local_value
+        if not self.available:
+            return None
+        try:
+            value = await self.redis_client.get(key)
+        except REDIS_ERRORS as e:
+            self._mark_unavailable("get", e)
+            return None
+        return self._decode(key, value, decoder)
+
+    async def get_many(
+        self, keys: List[str], decoder: Optional[Callable[[Any], Any]] = None
+    ) -> List[Optional[Any]]:
+        """Get several values from cache, fetching L1 misses with a single MGET"""
+        results: List[Optional[Any]] = [None] * len(keys)
+        if self.local_cache is not None:
+            results = [self.local_cache.get(key) for key in keys]
+        missing = [i for i, value in enumerate(results) if value is None]
+        if not missing or not self.available:
+            return results
+        try:
+            values = await self.redis_client.mget([keys[i] for i in missing])
+        except REDIS_ERRORS as e:
+            self._mark_unavailable("mget", e)
+            return results
+        for i, value in zip(missing, values):
+            results[i] = self._decode(keys[i], value, decoder)
+        return results
 
     async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
         """Set value in cache"""
+        if self.local_cache is not None:
+            self.local_cache.set(key, value)
+        if not self.available:
+            return
         ttl = ttl or self.default_ttl
-        self.redis_client.setex(key, ttl, json.dumps(value))
+        try:
+            await self.redis_client.set(
+                key, json.dumps(value, default=_to_json), ex=ttl
+            )
+        except REDIS_ERRORS as e:
+            self._mark_unavailable("set", e)
+
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        """Set several values in cache in one pipelined round trip"""
+        if not items:
+            return
+        if self.local_cache is not None:
+            for key, value in items.items():
+                self.local_cache.set(key, value)
+        if not self.available:
+            return
+        ttl = ttl or self.default_ttl
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipeline:
+                for key, value in items.items():
+                    pipeline.set(key, json.dumps(value, default=_to_json), ex=ttl)
+                await pipeline.execute()
+        except REDIS_ERRORS as e:
+            self._mark_unavailable("pipeline", e)
+
+    async def acquire_lock(self, key: str, ttl_ms: int) -> Optional[str]:
+        """
+        Try to take a short-lived lock on a key across replicas.
+        Returns a token to release it with, or None if another holder has it.
+        When Redis is unavailable the lock is treated as acquired.
+        """
+        token = secrets.token_hex(8)
+        if not self.available:
+            return token
+        try:
+            acquired = await self.redis_client.set(
+                f"lock:{key}", token, nx=True, px=ttl_ms
+            )
+        except REDIS_ERRORS as e:
+            self._mark_unavailable("lock", e)
+            return token
+        return token if acquired else None
+
+    async def release_lock(self, key: str, token: str) -> None:
+        """Release a lock taken with acquire_lock, if we still hold it"""
+        if not self.available:
+            return
+        try:
+            await self.redis_client.eval(RELEASE_LOCK_SCRIPT, 1, f"lock:{key}", token)
+        except REDIS_ERRORS as e:
+            self._mark_unavailable("unlock", e)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Hit/miss/eviction counters per tier"""
+        tiers = {"redis": CacheService.redis_stats.as_dict()}
+        if self.local_cache is not None:
+            tiers["local"] = self.local_cache.stats.as_dict()
+        return tiers
 
     async def delete(self, key: str) -> None:
         """Delete value from cache"""
-        self.redis_client.delete(key)
+        if self.local_cache is not None:
+            self.local_cache.delete(key)
+        try:
+            await self.redis_client.delete(key)
+        except REDIS_ERRORS as e:
+            self._mark_unavailable("delete", e)
 
     async def clear(self) -> None:
         """Clear all cache"""
-        self.redis_client.flushdb()
+        if self.local_cache is not None:
+            self.local_cache.clear()
+        try:
+            await self.redis_client.flushdb()
+        except REDIS_ERRORS as e:
+            self._mark_unavailable("flushdb", e)
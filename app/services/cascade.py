@@ -0,0 +1,226 @@
+import json
+import logging
+import re
+import unicodedata
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+import numpy as np
+from app.core.config import get_settings
+from .classifier import softmax
+from .normalization import normalize_tweet
+from .sentiment import SENTIMENT_CLASSES
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Tier reported for texts answered by the small model
+CASCADE_TIER = "small"
+
+# Bump when feature extraction changes, so stale models are refused
+FEATURIZER_VERSION = 2
+# Only the start of very long texts is featurized, bounding the cost per text
+MAX_FEATURE_CHARS = 2000
+CHAR_NGRAM = 3
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+# (feature indices, feature values, offset of each text's first feature)
+Features = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def _grams(text: str) -> List[str]:
+    """Word unigrams and bigrams, and character trigrams, of a text."""
+    text = normalize_tweet(unicodedata.normalize("NFKC", text[:MAX_FEATURE_CHARS]))
+    text = text.casefold()
+    tokens = _TOKEN.findall(text)
+    # Always present, so no text is left without features
+    grams = ["<s>"]
+    grams.extend(tokens)
+    grams.extend(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+    padded = f" {' '.join(tokens)} "
+    grams.extend(
+        f"#{padded[i:i + CHAR_NGRAM]}" for i in range(len(padded) - CHAR_NGRAM + 1)
+    )
+    return grams
+
+
+class HashedNGramModel:
+    """
+    Multinomial logistic regression over hashed n-grams, the cheap first
+    tier of the cascade.
+
+    N-grams are hashed into ``n_features`` buckets with CRC32, which is
+    stable across processes, and their log counts are L2-normalized per
+    text. Scoring a text is a few dozen row lookups in the weight matrix, so
+    it costs microseconds against milliseconds for the transformer.
+    """
+
+    def __init__(
+        self,
+        weights: np.ndarray,
+        bias: np.ndarray,
+        labels: Sequence[str] = SENTIMENT_CLASSES,
+    ):
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.labels = tuple(labels)
+
+    @property
+    def n_features(self) -> int:
+        return self.weights.shape[0]
+
+    def featurize(self, texts: Sequence[str]) -> Features:
+        """Sparse features of ``texts``, one segment per text in input order."""
+        indices: List[np.ndarray] = []
+        values: List[np.ndarray] = []
+        offsets = np.zeros(len(texts), dtype=np.int64)
+        total = 0
+        for i, text in enumerate(texts):
+            hashed = [
+                zlib.crc32(gram.encode()) % self.n_features for gram in _grams(text)
+            ]
+            unique, counts = np.unique(hashed, return_counts=True)
+            weights = np.log1p(counts)
+            offsets[i] = total
+            total += len(unique)
+            indices.append(unique)
+            values.append(weights / np.linalg.norm(weights))
+        return np.concatenate(indices), np.concatenate(values), offsets
+
+    def logits(self, features: Features) -> np.ndarray:
+        indices, values, offsets = features
+        contributions = self.weights[indices] * values[:, None].astype(np.float32)
+        return np.add.reduceat(contributions, offsets, axis=0) + self.bias
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        """Softmax scores of shape (len(texts), len(labels))."""
+        if not texts:
+            return np.empty((0, len(self.labels)), dtype=np.float32)
+        return softmax(self.logits(self.featurize(texts)))
+
+    @classmethod
+    def train(
+        cls,
+        texts: Sequence[str],
+        targets: np.ndarray,
+        n_features: int = 2**18,
+        epochs: int = 5,
+        learning_rate: float = 0.5,
+        batch_size: int = 64,
+        seed: int = 0,
+    ) -> "HashedNGramModel":
+        """
+        Fit the model with AdaGrad on cross-entropy against ``targets``, one
+        row of class probabilities per text: one-hot rows for gold labels, or
+        the full model's scores to distill it.
+        """
+        n_labels = targets.shape[1]
+        model = cls(
+            np.zeros((n_features, n_labels), dtype=np.float32),
+            np.zeros(n_labels, dtype=np.float32),
+        )
+        featurized = [model.featurize([text]) for text in texts]
+        squared_weights = np.zeros_like(model.weights)
+        squared_bias = np.zeros_like(model.bias)
+        rng = np.random.default_rng(seed)
+
+        for epoch in range(epochs):
+            loss = 0.0
+            order = rng.permutation(len(texts))
+            for start in range(0, len(order), batch_size):
+                batch = order[start : start + batch_size]
+                indices = np.concatenate([featurized[i][0] for i in batch])
+                values = np.concatenate([featurized[i][1] for i in batch])
+                sizes = [len(featurized[i][0]) for i in batch]
+                offsets = np.cumsum([0] + sizes[:-1])
+                probs = softmax(model.logits((indices, values, offsets)))
+                expected = targets[batch]
+                loss -= float((expected * np.log(probs + 1e-9)).sum())
+
+                grad_logits = (probs - expected) / len(batch)
+                owners = np.repeat(np.arange(len(batch)), sizes)
+                rows, inverse = np.unique(indices, return_inverse=True)
+                grad = np.zeros((len(rows), n_labels), dtype=np.float32)
+                np.add.at(grad, inverse, values[:, None] * grad_logits[owners])
+                squared_weights[rows] += grad**2
+                model.weights[rows] -= (
+                    learning_rate * grad / (np.sqrt(squared_weights[rows]) + 1e-8)
+                )
+                grad_bias = grad_logits.sum(axis=0)
+                squared_bias += grad_bias**2
+                model.bias -= learning_rate * grad_bias / (np.sqrt(squared_bias) + 1e-8)
+            logger.info("Epoch %d: loss %.4f", epoch + 1, loss / max(1, len(texts)))
+        return model
+
+    def save(self, path: Union[str, Path]) -> None:
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                weights=self.weights,
+                bias=self.bias,
+                labels=np.array(self.labels),
+                featurizer_version=FEATURIZER_VERSION,
+            )
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "HashedNGramModel":
+        with np.load(path) as data:
+            version = int(data["featurizer_version"])
+            if version != FEATURIZER_VERSION:
+                raise ValueError(
+                    f"{path} was trained with featurizer version {version}, "
+                    f"expected {FEATURIZER_VERSION}; retrain it"
+                )
+            labels = data["labels"].tolist()
+            if sorted(labels) != sorted(SENTIMENT_CLASSES):
+                raise ValueError(f"{path} has labels {labels}, not sentiment classes")
+            # Put the columns in the order of the full model's outputs
+            order = [labels.index(label) for label in SENTIMENT_CLASSES]
+            return cls(data["weights"][:, order], data["bias"][order])
+
+
+def read_labeled(
+    path: Union[str, Path], text_field: str = "text", label_field: str = "label"
+) -> Tuple[List[str], List[Optional[int]]]:
+    """
+    Texts and class indices from a JSONL file of ``{"text": ..., "label": ...}``
+    objects. Labels are sentiment class names or indices; lines without a
+    label get None, so unlabeled text can still be used for distillation.
+    """
+    texts: List[str] = []
+    labels: List[Optional[int]] = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            text = item.get(text_field)
+            if not isinstance(text, str):
+                continue
+            label = item.get(label_field)
+            if isinstance(label, str):
+                if label not in SENTIMENT_CLASSES:
+                    raise ValueError(f"Line {number}: unknown label {label!r}")
+                label = SENTIMENT_CLASSES.index(label)
+            elif label is not None and label not in range(len(SENTIMENT_CLASSES)):
+                raise ValueError(f"Line {number}: unknown label {label!r}")
+            texts.append(text)
+            labels.append(label)
+    return texts, labels
+
+
+@lru_cache()
+def get_cascade_model() -> Optional[HashedNGramModel]:
+    """Return the small cascade model, or None when the cascade is disabled."""
+    if not settings.CASCADE_MODEL_PATH:
+        return None
+    model = HashedNGramModel.load(settings.CASCADE_MODEL_PATH)
+    logger.info(
+        "Loaded cascade model %s (%d features, threshold %.2f)",
+        settings.CASCADE_MODEL_PATH,
+        model.n_features,
+        settings.CASCADE_CONFIDENCE_THRESHOLD,
+    )
+    return model
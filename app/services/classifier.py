@@ -0,0 +1,162 @@
+import logging
+from typing import Any, List, Optional, Sequence, Tuple
+import numpy as np
+from app.core.config import get_settings
+from app.core.metrics import BATCH_SIZE
+from app.core.timing import stage_timer
+from .backends import InferenceBackend, load_backend
+from .model_store import ModelSource
+from .normalization import normalize_tweet
+from .tokenization import (
+    aggregate_windows,
+    bucket_by_length,
+    special_token_affixes,
+    tokenizer_fingerprint,
+    windows_for_texts,
+)
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+MULTI_LABEL = "multi_label_classification"
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    """Row-wise softmax of a logits matrix."""
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def sigmoid(logits: np.ndarray) -> np.ndarray:
+    """Element-wise sigmoid, for models scoring each label independently."""
+    return 1 / (1 + np.exp(-logits))
+
+
+class SequenceClassifier:
+    """
+    A sequence classification model with its tokenizer, scoring texts in
+    padded, length-bucketed batches.
+
+    ``labels`` name the model's outputs in logit order; when not given they
+    are read from the model config, which also decides whether scores are a
+    softmax over the labels or an independent sigmoid per label
+    (multi-label models such as toxicity classifiers).
+
+    With ``tweet_normalization``, texts are rewritten with bertweet's
+    placeholders (see ``normalize_tweet``) before tokenizing; other models
+    see the raw text.
+    """
+
+    def __init__(
+        self,
+        source: ModelSource,
+        backend: str,
+        labels: Optional[Sequence[str]] = None,
+        long_text_policy: Optional[str] = None,
+        tweet_normalization: bool = False,
+    ):
+        self.model_name = source.model_name
+        self.model_revision = source.revision
+        self.long_text_policy = long_text_policy or settings.LONG_TEXT_POLICY
+        self.tweet_normalization = tweet_normalization
+        pretrained_kwargs = source.pretrained_kwargs()
+
+        with stage_timer("import"):
+            from transformers import AutoConfig, AutoTokenizer
+
+        with stage_timer("load_tokenizer"):
+            self.tokenizer: Any = AutoTokenizer.from_pretrained(
+                source.path, **pretrained_kwargs
+            )
+            config = AutoConfig.from_pretrained(source.path, **pretrained_kwargs)
+        # Classifiers whose tokenizers agree share tokenizer output. It is
+        # never truncated, so their maximum lengths may differ
+        self.tokenizer_key = tokenizer_fingerprint(self.tokenizer)
+        self.labels: Tuple[str, ...] = tuple(
+            labels
+            if labels is not None
+            else (config.id2label[i] for i in range(config.num_labels))
+        )
+        self.multi_label = getattr(config, "problem_type", None) == MULTI_LABEL
+        self.backend: InferenceBackend = load_backend(
+            backend,
+            source.path,
+            pretrained_kwargs.get("revision"),
+            threads=settings.INFERENCE_THREADS,
+            onnx_path=settings.ONNX_MODEL_PATH,
+            local_files_only=pretrained_kwargs["local_files_only"],
+        )
+        self.model = self.backend.model
+        self.prefix_ids, self.suffix_ids = special_token_affixes(self.tokenizer)
+
+    @property
+    def max_length(self) -> int:
+        """Longest input, in tokens, that the model accepts."""
+        return min(settings.MAX_SEQUENCE_LENGTH, self.tokenizer.model_max_length)
+
+    def tokenize(self, texts: List[str]) -> List[List[int]]:
+        """Token ids of each text, without special tokens or truncation."""
+        with stage_timer("tokenize"):
+            return self._encode(texts)
+
+    def _encode(self, texts: List[str]) -> List[List[int]]:
+        if self.tweet_normalization:
+            texts = [normalize_tweet(text) for text in texts]
+        return self.tokenizer(
+            texts, add_special_tokens=False, truncation=False, verbose=False
+        )["input_ids"]
+
+    def predict_scores(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None,
+        token_ids: Optional[List[List[int]]] = None,
+    ) -> np.ndarray:
+        """
+        Run the model over padded batches of texts.
+        Returns the scores as an array of shape (len(texts), len(labels)).
+
+        Pass ``token_ids`` from ``tokenize`` of a classifier with the same
+        ``tokenizer_key`` to skip tokenizing again.
+
+        Texts longer than the model's maximum length are split into overlapping
+        windows whose scores are combined according to the long text policy.
+        Windows are grouped by length so short texts are not padded to the
+        length of long ones.
+        """
+        if not texts:
+            return np.empty((0, len(self.labels)), dtype=np.float32)
+        batch_size = batch_size or settings.BATCH_MAX_SIZE
+
+        with stage_timer("tokenize"):
+            if token_ids is None:
+                token_ids = self._encode(texts)
+            window = self.max_length - len(self.prefix_ids) - len(self.suffix_ids)
+            windows, owners = windows_for_texts(
+                token_ids,
+                window,
+                min(settings.CHUNK_OVERLAP_TOKENS, window // 2),
+                self.long_text_policy,
+            )
+            sequences = [self.prefix_ids + ids + self.suffix_ids for ids in windows]
+
+        activation = sigmoid if self.multi_label else softmax
+        scores = np.empty((len(sequences), len(self.labels)), dtype=np.float32)
+        for batch in bucket_by_length(
+            [len(sequence) for sequence in sequences],
+            batch_size,
+            settings.BATCH_MAX_TOKENS,
+        ):
+            with stage_timer("pad"):
+                inputs = self.tokenizer.pad(
+                    {"input_ids": [sequences[i] for i in batch]}, return_tensors="np"
+                )
+
+            # Get model predictions
+            BATCH_SIZE.observe(len(batch))
+            with stage_timer("forward"):
+                logits = self.backend.predict_logits(dict(inputs))
+            scores[batch] = activation(logits)
+
+        with stage_timer("aggregate"):
+            return aggregate_windows(scores, owners, len(texts), self.long_text_policy)
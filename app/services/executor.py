@@ -0,0 +1,144 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple, TypeVar
+from app.core.metrics import SHED_TOTAL
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Job priorities, lowest first: requests a client is waiting on go ahead of
+# bulk work such as queued jobs
+INTERACTIVE = 0
+BULK = 1
+
+
+class OverloadedError(Exception):
+    """Raised when inference work is shed instead of queued."""
+
+
+class DeadlineExceededError(OverloadedError):
+    """Raised when inference did not finish before the request's deadline."""
+
+
+class InferenceExecutor:
+    """
+    Dedicated thread pool for model inference, apart from the event loop and
+    from asyncio's default executor, so a slow forward pass never holds up
+    other requests or anything else handed to ``asyncio.to_thread``.
+
+    At most ``max_pending`` jobs may be queued or running at once; further
+    submissions fail immediately with OverloadedError rather than queueing
+    without bound. Each job has a deadline of ``timeout`` seconds (0 disables
+    it): callers stop waiting once it passes, and jobs still queued by then
+    are dropped without running.
+
+    Queued jobs start in ``priority`` order, then in submission order, so
+    bulk work never holds interactive requests up for longer than the jobs
+    already running.
+    """
+
+    def __init__(self, workers: int, max_pending: int, timeout: float):
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.timeout = max(0.0, timeout)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="inference"
+        )
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._queue: List[Tuple[int, int, Future, Callable[[], Any]]] = []
+        self._sequence = itertools.count()
+
+    @property
+    def pending(self) -> int:
+        """Jobs queued or running."""
+        return self._pending
+
+    async def run(
+        self,
+        fn: Callable[..., T],
+        *args: Any,
+        timeout: Optional[float] = None,
+        priority: int = INTERACTIVE,
+    ) -> T:
+        """
+        Run ``fn(*args)`` on the pool and wait for its result. ``timeout``
+        overrides the executor's default deadline for this job.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            if self._pending >= self.max_pending:
+                SHED_TOTAL.labels("queue_full").inc()
+                raise OverloadedError("Inference queue is full")
+            self._pending += 1
+
+        deadline = time.monotonic() + timeout if timeout else None
+        # Run in a copy of the caller's context, like asyncio.to_thread, so
+        # stage timings are attributed to the request
+        context = contextvars.copy_context()
+        future: Future = Future()
+        future.add_done_callback(self._release)
+        with self._lock:
+            heapq.heappush(
+                self._queue,
+                (
+                    priority,
+                    next(self._sequence),
+                    future,
+                    lambda: context.run(self._call, deadline, fn, *args),
+                ),
+            )
+        try:
+            # Every queued job gets a slot on the pool, and each slot runs
+            # whichever job comes first when a thread frees up
+            self._pool.submit(self._run_next)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or None)
+        except asyncio.TimeoutError:
+            # Cancelling the wait also cancels the job if it hasn't started
+            SHED_TOTAL.labels("deadline").inc()
+            raise DeadlineExceededError(
+                f"Inference did not finish within {timeout:.2f}s"
+            ) from None
+
+    def close(self) -> None:
+        """Stop the pool, dropping queued jobs."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            queue, self._queue = self._queue, []
+        for _, _, future, _ in queue:
+            future.cancel()
+
+    def _run_next(self) -> None:
+        while True:
+            with self._lock:
+                if not self._queue:
+                    return
+                _, _, future, call = heapq.heappop(self._queue)
+            # Skip jobs whose callers stopped waiting
+            if future.set_running_or_notify_cancel():
+                break
+        try:
+            future.set_result(call())
+        except BaseException as e:
+            future.set_exception(e)
+
+    def _call(self, deadline: Optional[float], fn: Callable[..., T], *args: Any) -> T:
+        if deadline is not None and time.monotonic() > deadline:
+            raise DeadlineExceededError("Inference deadline passed while queued")
+        return fn(*args)
+
+    def _release(self, future: Optional[Future] = None) -> None:
+        with self._lock:
+            self._pending -= 1
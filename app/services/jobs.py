@@ -0,0 +1,400 @@
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import itertools
+import json
+import logging
+import socket
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+from urllib.parse import urlsplit
+import httpx
+import redis.asyncio as redis
+from app.core.config import get_settings
+from app.core.metrics import JOBS_TOTAL
+from .cache import REDIS_ERRORS, CacheService, decode_reply, get_redis_pool
+from .executor import BULK, OverloadedError
+from .moderation import ModerationService
+from .registry import get_model_registry
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+JOB_QUEUE_MODES = ("redis", "local")
+# Queue lanes, always drained in this order
+JOB_PRIORITIES = ("high", "normal", "low")
+
+JOB_KEY_PREFIX = "job"
+LANE_KEY_PREFIX = "jobs:lane"
+
+
+@dataclass
+class Job:
+    tenant_id: str
+    texts: List[str]
+    heads: Optional[List[str]] = None
+    priority: str = "normal"
+    webhook_url: Optional[str] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    # "queued", "running", "done" or "failed"
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    results: Optional[List[Dict[str, Any]]] = None
+    error: Optional[str] = None
+
+    def summary(self) -> Dict[str, Any]:
+        """The job as reported to clients, without its texts."""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "texts": len(self.texts),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "results": self.results,
+        }
+
+    def dumps(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def loads(cls, data: Union[str, bytes]) -> "Job":
+        return cls(**json.loads(data))
+
+
+class RedisJobQueue:
+    """
+    Jobs stored as JSON under ``job:<id>`` for ``ttl`` seconds, with their
+    ids queued on one Redis list per priority lane.
+
+    Workers BLPOP the lanes in priority order, so a lane is only drained
+    once the lanes above it are empty, and each job goes to one worker.
+    """
+
+    def __init__(
+        self, redis_client: Optional[redis.Redis] = None, ttl: Optional[int] = None
+    ):
+        self._redis_client = redis_client
+        self.ttl = ttl or settings.JOB_TTL_SECONDS
+        self.lanes = [f"{LANE_KEY_PREFIX}:{priority}" for priority in JOB_PRIORITIES]
+
+    @property
+    def redis_client(self) -> redis.Redis:
+        # The queue outlives event loops in tests, so don't hold on to a
+        # client bound to one
+        if self._redis_client is not None:
+            return self._redis_client
+        return redis.Redis(connection_pool=get_redis_pool())
+
+    async def submit(self, job: Job) -> None:
+        lane = self.lanes[JOB_PRIORITIES.index(job.priority)]
+        async with self.redis_client.pipeline(transaction=True) as pipeline:
+            pipeline.set(f"{JOB_KEY_PREFIX}:{job.id}", job.dumps(), ex=self.ttl)
+            pipeline.rpush(lane, job.id)
+            await pipeline.execute()
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        data = await self.redis_client.get(f"{JOB_KEY_PREFIX}:{job_id}")
+        return Job.loads(data) if data is not None else None
+
+    async def save(self, job: Job) -> None:
+        await self.redis_client.set(
+            f"{JOB_KEY_PREFIX}:{job.id}", job.dumps(), ex=self.ttl
+        )
+
+    async def next_jobs(self, max_texts: int, timeout: float) -> List[Job]:
+        """
+        Wait up to ``timeout`` seconds for a queued job, then take more
+        without waiting until they add up to ``max_texts`` texts.
+        """
+        popped = await self.redis_client.blpop(self.lanes, timeout=timeout)
+        if popped is None:
+            return []
+        job_ids = [decode_reply(popped[1])]
+        jobs: List[Job] = []
+        texts = 0
+        while job_ids:
+            job = await self.get(job_ids.pop())
+            # Jobs expire if they wait in the queue longer than the TTL
+            if job is not None:
+                jobs.append(job)
+                texts += len(job.texts)
+            if texts >= max_texts:
+                break
+            for lane in self.lanes:
+                job_id = await self.redis_client.lpop(lane)
+                if isinstance(job_id, (bytes, str)):
+                    job_ids.append(decode_reply(job_id))
+                    break
+        return jobs
+
+
+class LocalJobQueue:
+    """
+    In-process stand-in for RedisJobQueue, for single-process deployments
+    and development. Jobs are lost when the process exits.
+    """
+
+    def __init__(self, ttl: Optional[int] = None):
+        self.ttl = ttl or settings.JOB_TTL_SECONDS
+        self._jobs: Dict[str, Job] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._sequence = itertools.count()
+
+    @property
+    def queue(self) -> asyncio.PriorityQueue:
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+        return self._queue
+
+    async def submit(self, job: Job) -> None:
+        self._expire()
+        self._jobs[job.id] = job
+        self.queue.put_nowait(
+            (JOB_PRIORITIES.index(job.priority), next(self._sequence), job.id)
+        )
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def save(self, job: Job) -> None:
+        self._jobs[job.id] = job
+
+    async def next_jobs(self, max_texts: int, timeout: float) -> List[Job]:
+        try:
+            _, _, job_id = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        jobs = [self._jobs[job_id]]
+        texts = len(jobs[0].texts)
+        while texts < max_texts and not self.queue.empty():
+            _, _, job_id = self.queue.get_nowait()
+            jobs.append(self._jobs[job_id])
+            texts += len(jobs[-1].texts)
+        return jobs
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+
+JobQueue = Union[RedisJobQueue, LocalJobQueue]
+
+
+@lru_cache()
+def get_job_queue() -> JobQueue:
+    """Return the process-wide job queue for JOB_QUEUE_MODE."""
+    if settings.JOB_QUEUE_MODE == "local":
+        return LocalJobQueue()
+    if settings.JOB_QUEUE_MODE == "redis":
+        return RedisJobQueue()
+    raise ValueError(
+        f"Unknown job queue mode {settings.JOB_QUEUE_MODE!r}, "
+        f"expected one of {JOB_QUEUE_MODES}"
+    )
+
+
+def bulk_moderation_service() -> ModerationService:
+    """
+    The service jobs are analyzed with: bulk priority and no deadline, so
+    jobs wait behind interactive requests rather than fail, and executor
+    jobs of BATCH_MAX_SIZE texts, so interactive requests run between them.
+    """
+    return ModerationService(
+        CacheService(),
+        priority=BULK,
+        inference_timeout=0,
+        inference_chunk_size=settings.BATCH_MAX_SIZE,
+    )
+
+
+def sign_webhook(body: bytes, secret: str) -> str:
+    """Value of the X-Signature-256 header of a webhook body."""
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+class WebhookURLError(ValueError):
+    """Raised for webhook URLs that jobs must not be posted to."""
+
+
+async def check_webhook_url(url: str) -> None:
+    """
+    Refuse webhook URLs that could reach internal services. Only https is
+    allowed, and the host must be in JOB_WEBHOOK_ALLOWED_HOSTS when that is
+    set, or else resolve to public addresses only: no private, loopback,
+    link-local, multicast or reserved ones.
+    """
+    parts = urlsplit(url)
+    host = parts.hostname
+    if parts.scheme != "https" or not host:
+        raise WebhookURLError("Webhook URLs must use https")
+    if settings.JOB_WEBHOOK_ALLOWED_HOSTS:
+        if host not in settings.JOB_WEBHOOK_ALLOWED_HOSTS:
+            raise WebhookURLError(f"Webhook host {host} is not allowed")
+        return
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, parts.port or 443, type=socket.SOCK_STREAM
+        )
+    except (OSError, UnicodeError, ValueError) as e:
+        raise WebhookURLError(f"Could not resolve webhook host {host}") from e
+    for *_, sockaddr in infos:
+        address = ipaddress.ip_address(sockaddr[0])
+        if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise WebhookURLError(f"Webhook host {host} is not a public address")
+
+
+class JobRunner:
+    """
+    Drains a job queue. Each round takes queued jobs, highest lane first,
+    until they add up to ``batch_size`` texts, so small jobs share model
+    calls. Texts are analyzed in chunks of ``batch_size`` by a service that
+    should run at bulk priority in small executor jobs, results are stored
+    on each job, and jobs with a webhook are posted to it in the background.
+
+    The service is made by ``make_service`` for the first job, once models
+    are loaded off the event loop, so a runner can start before them.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        make_service: Callable[[], ModerationService],
+        batch_size: int,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.queue = queue
+        self.make_service = make_service
+        self._service: Optional[ModerationService] = None
+        self.batch_size = max(1, batch_size)
+        # Redirects are not followed: the target was checked, not where it
+        # redirects to
+        self.http_client = http_client or httpx.AsyncClient(
+            timeout=settings.JOB_WEBHOOK_TIMEOUT_SECONDS, follow_redirects=False
+        )
+        self._webhooks: Set[asyncio.Task] = set()
+
+    async def run(self, stop: asyncio.Event, poll_timeout: float = 1.0) -> None:
+        """Process jobs until ``stop`` is set."""
+        while not stop.is_set():
+            try:
+                jobs = await self.queue.next_jobs(self.batch_size, poll_timeout)
+            except REDIS_ERRORS as e:
+                logger.warning("Could not take jobs from Redis: %r", e)
+                await asyncio.sleep(settings.REDIS_RETRY_INTERVAL)
+                continue
+            if jobs:
+                await self.process(jobs)
+
+    async def process(self, jobs: List[Job]) -> None:
+        for job in jobs:
+            job.status = "running"
+            await self.queue.save(job)
+
+        # Jobs asking for the same heads are analyzed together
+        groups: Dict[Tuple[str, ...], List[Job]] = {}
+        for job in jobs:
+            groups.setdefault(tuple(job.heads or ()), []).append(job)
+
+        for heads, group in groups.items():
+            texts = [text for job in group for text in job.texts]
+            try:
+                results = await self._analyze(texts, list(heads) or None)
+            except Exception as e:
+                logger.error("Error in job analysis: %s", e, exc_info=True)
+                for job in group:
+                    job.status, job.error = "failed", str(e)
+            else:
+                offset = 0
+                for job in group:
+                    job.results = results[offset : offset + len(job.texts)]
+                    job.status = "done"
+                    offset += len(job.texts)
+
+            for job in group:
+                job.finished_at = time.time()
+                await self.queue.save(job)
+                JOBS_TOTAL.labels(job.status).inc()
+                logger.info(
+                    "Job %s %s: %d texts in %.2fs",
+                    job.id,
+                    job.status,
+                    len(job.texts),
+                    job.finished_at - job.created_at,
+                )
+                if job.webhook_url:
+                    task = asyncio.get_running_loop().create_task(self.notify(job))
+                    self._webhooks.add(task)
+                    task.add_done_callback(self._webhooks.discard)
+
+    async def get_service(self) -> ModerationService:
+        if self._service is None:
+            await asyncio.to_thread(get_model_registry().load)
+            self._service = self.make_service()
+        return self._service
+
+    async def _analyze(
+        self, texts: List[str], heads: Optional[List[str]]
+    ) -> List[Dict[str, Any]]:
+        service = await self.get_service()
+        results: List[Dict[str, Any]] = []
+        for start in range(0, len(texts), self.batch_size):
+            chunk = texts[start : start + self.batch_size]
+            while True:
+                try:
+                    results.extend(await service.analyze_batch(chunk, heads))
+                    break
+                except OverloadedError:
+                    # Interactive traffic has the executor full; back off
+                    await asyncio.sleep(settings.OVERLOAD_RETRY_AFTER_SECONDS)
+        return results
+
+    async def notify(self, job: Job) -> bool:
+        """
+        POST the finished job to its webhook, retrying with exponential
+        backoff. Returns whether the webhook accepted it.
+        """
+        assert job.webhook_url is not None
+        # Checked again at delivery, as the host may resolve elsewhere by now
+        try:
+            await check_webhook_url(job.webhook_url)
+        except WebhookURLError as e:
+            logger.error("Not posting job %s to its webhook: %s", job.id, e)
+            return False
+        body = json.dumps(job.summary()).encode()
+        headers = {"Content-Type": "application/json"}
+        if settings.JOB_WEBHOOK_SECRET:
+            headers["X-Signature-256"] = sign_webhook(body, settings.JOB_WEBHOOK_SECRET)
+        for attempt in range(settings.JOB_WEBHOOK_RETRIES + 1):
+            if attempt:
+                await asyncio.sleep(2 ** (attempt - 1))
+            try:
+                response = await self.http_client.post(
+                    job.webhook_url, content=body, headers=headers
+                )
+            except httpx.HTTPError as e:
+                logger.warning("Webhook for job %s failed: %r", job.id, e)
+                continue
+            if response.is_success:
+                return True
+            logger.warning(
+                "Webhook for job %s returned %d", job.id, response.status_code
+            )
+        logger.error("Giving up on the webhook for job %s", job.id)
+        return False
+
+    async def aclose(self) -> None:
+        """Wait for pending webhooks, then close the HTTP client."""
+        if self._webhooks:
+            await asyncio.gather(*self._webhooks, return_exceptions=True)
+        await self.http_client.aclose()
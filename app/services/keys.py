@@ -0,0 +1,88 @@
+import hashlib
+import json
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Optional
+from app.core.config import get_settings
+from .normalization import get_demojizer, normalize_tweet
+from .sentiment import EMOTION_LABELS, EMOTION_THRESHOLDS
+from .sentiment import SENTIMENT_LABELS, SENTIMENT_THRESHOLDS
+
+settings = get_settings()
+
+CACHE_KEY_PREFIX = "analysis"
+# Bump when the key layout itself changes
+CACHE_KEY_VERSION = "v2"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str, tweet_normalization: Optional[bool] = None) -> str:
+    """
+    Canonical form of a text for cache lookups: Unicode NFKC, tweet
+    normalization (``TWEET_NORMALIZATION`` unless given), collapsed
+    whitespace and, unless disabled, case folding.
+    """
+    text = unicodedata.normalize("NFKC", text)
+    if tweet_normalization is None:
+        tweet_normalization = settings.TWEET_NORMALIZATION
+    if tweet_normalization:
+        text = normalize_tweet(text)
+    text = _WHITESPACE.sub(" ", text).strip()
+    if settings.CACHE_KEY_CASEFOLD:
+        text = text.casefold()
+    return text
+
+
+def scoring_config_hash() -> str:
+    """Hash of everything besides the model that shapes a cached result."""
+    config = {
+        "sentiment_thresholds": SENTIMENT_THRESHOLDS,
+        "sentiment_labels": SENTIMENT_LABELS.tolist(),
+        "emotion_thresholds": EMOTION_THRESHOLDS,
+        "emotion_labels": EMOTION_LABELS.tolist(),
+        "casefold": settings.CACHE_KEY_CASEFOLD,
+        "tweet_normalization": settings.TWEET_NORMALIZATION,
+        "demojize": get_demojizer() is not None,
+        "long_text_policy": settings.LONG_TEXT_POLICY,
+        "max_sequence_length": settings.MAX_SEQUENCE_LENGTH,
+        "chunk_overlap_tokens": settings.CHUNK_OVERLAP_TOKENS,
+    }
+    encoded = json.dumps(config, sort_keys=True).encode()
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+
+@lru_cache()
+def key_namespace(
+    model_name: str, model_revision: Optional[str] = None, backend: str = "torch"
+) -> str:
+    """
+    Key prefix for one model version, inference backend and scoring config.
+    Results cached under an older model, another backend or older thresholds
+    live under a different namespace and are never read again.
+    """
+    version = (
+        f"{model_name}@{model_revision or 'latest'}:{backend}:{scoring_config_hash()}"
+    )
+    digest = hashlib.blake2b(version.encode(), digest_size=8).hexdigest()
+    return f"{CACHE_KEY_PREFIX}:{CACHE_KEY_VERSION}:{digest}"
+
+
+def make_cache_key(
+    text: str,
+    model_name: str,
+    model_revision: Optional[str] = None,
+    backend: str = "torch",
+    tweet_normalization: Optional[bool] = None,
+) -> str:
+    """
+    Fixed-size cache key for a text under the given model version and
+    backend identity (see ``InferenceBackend.identity``). Pass the model's
+    ``tweet_normalization`` so texts share a key only when the model sees
+    them the same.
+    """
+    normalized = normalize_text(text, tweet_normalization)
+    digest = hashlib.blake2b(normalized.encode(), digest_size=16)
+    namespace = key_namespace(model_name, model_revision, backend)
+    return f"{namespace}:{digest.hexdigest()}"
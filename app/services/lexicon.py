@@ -0,0 +1,94 @@
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+import numpy as np
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Lexicon policies: "off", "shadow" (score only, the model always runs) or
+# "short_circuit" (clearly toxic texts are answered without the model)
+LEXICON_POLICIES = ("off", "shadow", "short_circuit")
+
+
+@dataclass(slots=True)
+class LexiconScore:
+    positive: int = 0
+    negative: int = 0
+    toxic: int = 0
+
+    @property
+    def score(self) -> float:
+        """Lexicon sentiment from -1 (all negative hits) to 1 (all positive)."""
+        hits = self.positive + self.negative
+        return (self.positive - self.negative) / hits if hits else 0.0
+
+    @property
+    def matched(self) -> bool:
+        return bool(self.positive or self.negative or self.toxic)
+
+
+class LexiconMatcher:
+    """
+    Word-list matcher compiled once into a single regular expression.
+
+    Text is NFKC-normalized and case-folded before matching, and words only
+    match on word boundaries, so "bad" matches "BAD!" but not "badge".
+    """
+
+    def __init__(
+        self,
+        positive_words: Iterable[str],
+        negative_words: Iterable[str],
+        toxic_words: Iterable[str],
+    ):
+        # word -> (positive, negative, toxic) membership; a word may be in several lists
+        self.categories: Dict[str, Tuple[bool, bool, bool]] = {}
+        positive, negative, toxic = (
+            {self.normalize(word) for word in words}
+            for words in (positive_words, negative_words, toxic_words)
+        )
+        for word in positive | negative | toxic:
+            self.categories[word] = (word in positive, word in negative, word in toxic)
+
+        # Longest first so multi-word entries win over their prefixes
+        alternation = "|".join(
+            re.escape(word) for word in sorted(self.categories, key=len, reverse=True)
+        )
+        self.pattern = re.compile(rf"\b(?:{alternation})\b") if alternation else None
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return unicodedata.normalize("NFKC", text).casefold()
+
+    def score(self, text: str) -> LexiconScore:
+        result = LexiconScore()
+        if self.pattern is None:
+            return result
+        for match in self.pattern.finditer(self.normalize(text)):
+            positive, negative, toxic = self.categories[match.group()]
+            result.positive += positive
+            result.negative += negative
+            result.toxic += toxic
+        return result
+
+    def short_circuit_scores(self, text: str) -> Optional[np.ndarray]:
+        """
+        Softmax-style (negative, neutral, positive) scores for texts that are
+        clearly toxic by the word lists, or None if the model should decide.
+        """
+        lexicon_score = self.score(text)
+        if lexicon_score.toxic < settings.LEXICON_TOXIC_MIN_HITS:
+            return None
+        confidence = settings.LEXICON_CONFIDENCE
+        rest = (1 - confidence) / 2
+        return np.array([confidence, rest, rest])
+
+
+@lru_cache()
+def get_lexicon_matcher() -> LexiconMatcher:
+    return LexiconMatcher(
+        settings.POSITIVE_WORDS, settings.NEGATIVE_WORDS, settings.TOXIC_WORDS
+    )
@@ -0,0 +1,66 @@
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Written next to a model snapshot to record where it came from
+MODEL_INFO_FILE = "model_info.json"
+
+
+@dataclass(frozen=True)
+class ModelSource:
+    """Where to load a model from, and the identity it is cached under."""
+
+    # Hub model id or local directory, as passed to ``from_pretrained``
+    path: str
+    # Hub model id and revision, used for cache keys
+    model_name: str
+    revision: Optional[str]
+    local_files_only: bool
+
+    def pretrained_kwargs(self) -> Dict[str, Any]:
+        if Path(self.path).is_dir():
+            return {"local_files_only": True}
+        return {"revision": self.revision, "local_files_only": self.local_files_only}
+
+
+def read_model_info(model_dir: str) -> Dict[str, Any]:
+    info_path = Path(model_dir) / MODEL_INFO_FILE
+    if not info_path.exists():
+        return {}
+    return json.loads(info_path.read_text())
+
+
+def write_model_info(model_dir: str, model_name: str, revision: Optional[str]) -> None:
+    info = {"model_name": model_name, "revision": revision}
+    (Path(model_dir) / MODEL_INFO_FILE).write_text(json.dumps(info, indent=2))
+
+
+def resolve_model_source(
+    model_name: Optional[str] = None, revision: Optional[str] = None
+) -> ModelSource:
+    """
+    Decide where the sentiment model is loaded from. An explicit model name
+    wins; otherwise ``MODEL_DIR`` is used when set, keeping the hub name and
+    revision it was snapshotted from so cache keys match replicas that load
+    from the hub.
+    """
+    if model_name is None and settings.MODEL_DIR:
+        info = read_model_info(settings.MODEL_DIR)
+        return ModelSource(
+            path=settings.MODEL_DIR,
+            model_name=info.get("model_name", settings.SENTIMENT_MODEL_NAME),
+            revision=info.get("revision", settings.SENTIMENT_MODEL_REVISION),
+            local_files_only=True,
+        )
+    return ModelSource(
+        path=model_name or settings.SENTIMENT_MODEL_NAME,
+        model_name=model_name or settings.SENTIMENT_MODEL_NAME,
+        revision=revision or settings.SENTIMENT_MODEL_REVISION,
+        local_files_only=settings.MODEL_LOCAL_FILES_ONLY,
+    )
@@ -1,58 +1,597 @@
-from typing import Dict, Any, cast
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Sequence, Tuple, cast
+import asyncio
 import logging
+import numpy as np
+from app.core.config import get_settings
+from app.core.logging import SAMPLED
+from app.core.metrics import CASCADE_TOTAL, NEAR_DUPLICATE_TOTAL
+from app.core.timing import stage_timer
+from .batching import BatchScheduler
+from .cascade import CASCADE_TIER, get_cascade_model
 from .sentiment import SentimentAnalyzer
 from .cache import CacheService
+from .coalesce import SingleFlight
+from .executor import INTERACTIVE, InferenceExecutor, OverloadedError
+from .keys import make_cache_key
+from .lexicon import get_lexicon_matcher
+from .near_duplicates import fingerprint, get_near_duplicate_index
+from .pipeline import (
+    HEADS,
+    ClassifierHead,
+    HeadUnavailableError,
+    ModerationPipeline,
+)
+from .registry import get_model_registry
+from .results import AnalysisResult
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+@dataclass
+class _SentimentLookup:
+    """Sentiment results found without the full model, and what is left."""
+
+    results: List[Optional[AnalysisResult]]
+    # Cache key of each text that went past the lexicon, by index
+    cache_keys: Dict[int, str]
+    # Texts for the full model, by cache key
+    misses: Dict[str, str]
+    # Fingerprints of the misses, to index once their results are cached
+    fingerprints: Dict[str, int]
+
+
+@dataclass
+class _HeadsLookup:
+    """Cached scores of the heads besides sentiment, and what is left."""
+
+    heads: List[ClassifierHead]
+    # Per head, the cache key and cached scores (or None) of each text
+    keys: List[List[str]]
+    scores: List[List[Optional[List[float]]]]
+    # Texts missing from any head's cache, and the heads that missed some
+    misses: List[str]
+    missing: List[str]
 
 
 class ModerationService:
-    def __init__(self, cache_service: CacheService):
+    # Shared by every instance so concurrent requests in the process coalesce
+    in_flight = SingleFlight()
+
+    def __init__(
+        self,
+        cache_service: CacheService,
+        sentiment_analyzer: Optional[SentimentAnalyzer] = None,
+        batch_scheduler: Optional[BatchScheduler] = None,
+        executor: Optional[InferenceExecutor] = None,
+        pipeline: Optional[ModerationPipeline] = None,
+        priority: int = INTERACTIVE,
+        inference_timeout: Optional[float] = None,
+        inference_chunk_size: Optional[int] = None,
+    ):
         self.cache_service = cache_service
-        self.sentiment_analyzer = SentimentAnalyzer()
-        logger.info("Initialized ModerationService")
+        registry = get_model_registry()
+        if sentiment_analyzer is None:
+            sentiment_analyzer = registry.get_sentiment_analyzer()
+            batch_scheduler = batch_scheduler or registry.get_batch_scheduler()
+        self.sentiment_analyzer = sentiment_analyzer
+        self.batch_scheduler = batch_scheduler
+        self.executor = executor or registry.get_inference_executor()
+        self.pipeline = pipeline or registry.get_pipeline()
+        # Executor priority and deadline of the inference this service runs
+        self.priority = priority
+        self.inference_timeout = inference_timeout
+        # Most texts per executor job. Bulk callers set it so interactive
+        # requests get the executor between their chunks
+        self.inference_chunk_size = inference_chunk_size
+        logger.debug("Initialized ModerationService")
+
+    def cache_key(self, text: str) -> str:
+        return make_cache_key(
+            text,
+            self.sentiment_analyzer.model_name,
+            self.sentiment_analyzer.model_revision,
+            self.sentiment_analyzer.backend.identity,
+            self.sentiment_analyzer.tweet_normalization,
+        )
+
+    def resolve_heads(self, heads: Optional[Sequence[str]]) -> List[str]:
+        """
+        The heads to run for a request, in canonical order: those asked for,
+        or ``DEFAULT_HEADS``. Raises HeadUnavailableError for heads that are
+        unknown or have no model configured.
+        """
+        requested = set(heads or settings.DEFAULT_HEADS)
+        unavailable = sorted(
+            name
+            for name in requested
+            if name != "sentiment" and name not in self.pipeline.available
+        )
+        if unavailable:
+            raise HeadUnavailableError(f"Heads not available: {', '.join(unavailable)}")
+        return [name for name in HEADS if name in requested]
 
-    async def analyze_text(self, text: str) -> Dict[str, Any]:
+    async def analyze_text(
+        self, text: str, heads: Optional[Sequence[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Analyze text with the requested heads, sentiment by default.
+        Sentiment and the other heads are scored in one pipeline call.
+        """
+        names = self.resolve_heads(heads)
+        extra = [name for name in names if name != "sentiment"]
+        if not extra:
+            return await self._analyze_sentiment(text)
+        if "sentiment" not in names:
+            return {"heads": (await self._analyze_heads([text], extra))[0]}
+        return (await self._analyze_with_heads([text], extra))[0]
+
+    async def analyze_batch(
+        self, texts: List[str], heads: Optional[Sequence[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Analyze many texts at once with the requested heads, sentiment by
+        default. Results are returned in input order.
+        """
+        names = self.resolve_heads(heads)
+        extra = [name for name in names if name != "sentiment"]
+        if not extra:
+            return await self._analyze_sentiment_batch(texts)
+        if "sentiment" not in names:
+            return [
+                {"heads": head_result}
+                for head_result in await self._analyze_heads(texts, extra)
+            ]
+        return await self._analyze_with_heads(texts, extra)
+
+    @staticmethod
+    def _merge(
+        result: Dict[str, Any], head_results: Dict[str, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        merged = {**result, "heads": head_results}
+        # A trained emotion classifier beats the sentiment-derived guess
+        if "emotion" in head_results:
+            merged["dominant_emotion"] = head_results["emotion"]["label"]
+        return merged
+
+    async def _analyze_with_heads(
+        self, texts: List[str], names: List[str]
+    ) -> List[Dict[str, Any]]:
+        """
+        Analyze texts for sentiment and with the heads besides sentiment in
+        ``names``. Texts missing from the sentiment cache or a head's cache
+        are scored by the pipeline together, so sentiment shares tokenization
+        with the heads whose tokenizer agrees with its own.
+        """
+        try:
+            sentiment, heads = await asyncio.gather(
+                self._lookup_sentiment_batch(texts), self._lookup_heads(texts, names)
+            )
+            sentiment_misses = list(sentiment.misses.values())
+            misses = list(dict.fromkeys(sentiment_misses + heads.misses))
+            predicted: Dict[str, np.ndarray] = {}
+            if misses:
+                with stage_timer("inference"):
+                    predicted = await self._predict(
+                        misses,
+                        heads.missing,
+                        self.sentiment_analyzer if sentiment_misses else None,
+                    )
+            analyzed: List[Dict[str, Any]] = []
+            if sentiment_misses:
+                rows = {text: i for i, text in enumerate(misses)}
+                analyzed = self.sentiment_analyzer.build_results(
+                    predicted["sentiment"][[rows[text] for text in sentiment_misses]]
+                )
+            results = await self._finish_sentiment_batch(sentiment, analyzed)
+            head_results = await self._finish_heads(texts, heads, misses, predicted)
+        except OverloadedError:
+            raise
+        except Exception as e:
+            logger.error("Error in text analysis with heads: %s", e, exc_info=True)
+            raise
+        return [
+            self._merge(result, head_result)
+            for result, head_result in zip(results, head_results)
+        ]
+
+    async def _analyze_heads(
+        self, texts: List[str], names: List[str]
+    ) -> List[Dict[str, Dict[str, Any]]]:
+        """
+        Run the heads besides sentiment over ``texts``. Scores are cached per
+        head under that head's model, and every miss is scored by the
+        pipeline, which tokenizes each text once per tokenizer.
+        """
+        lookup = await self._lookup_heads(texts, names)
+        predicted: Dict[str, np.ndarray] = {}
+        if lookup.misses:
+            with stage_timer("inference"):
+                predicted = await self._predict(lookup.misses, lookup.missing)
+        return await self._finish_heads(texts, lookup, lookup.misses, predicted)
+
+    def _chunks(self, texts: List[str]) -> List[List[str]]:
+        """Split texts into the executor jobs they are scored in."""
+        size = self.inference_chunk_size or len(texts) or 1
+        return [texts[start : start + size] for start in range(0, len(texts), size)]
+
+    async def _predict(
+        self,
+        texts: List[str],
+        names: List[str],
+        sentiment: Optional[SentimentAnalyzer] = None,
+    ) -> Dict[str, np.ndarray]:
+        """Score texts with the pipeline on the executor, one job per chunk."""
+        parts: List[Dict[str, np.ndarray]] = []
+        for chunk in self._chunks(texts):
+            parts.append(
+                await self.executor.run(
+                    self.pipeline.predict,
+                    chunk,
+                    names,
+                    settings.BATCH_MAX_SIZE,
+                    sentiment,
+                    timeout=self.inference_timeout,
+                    priority=self.priority,
+                )
+            )
+        return {
+            name: np.concatenate([part[name] for part in parts]) for name in parts[0]
+        }
+
+    async def _lookup_heads(self, texts: List[str], names: List[str]) -> _HeadsLookup:
+        """Fetch the cached scores of each head for each text."""
+        heads = [self.pipeline.heads[name] for name in names]
+        keys = [[head.cache_key(text) for text in texts] for head in heads]
+        with stage_timer("cache_get"):
+            cached = await self.cache_service.get_many(
+                [key for head_keys in keys for key in head_keys]
+            )
+        scores: List[List[Optional[List[float]]]] = [
+            cached[i * len(texts) : (i + 1) * len(texts)] for i in range(len(heads))
+        ]
+        # Each text missing from any head's cache is scored once, with the
+        # heads that missed some text
+        misses = list(
+            dict.fromkeys(
+                texts[j]
+                for head_scores in scores
+                for j, row in enumerate(head_scores)
+                if row is None
+            )
+        )
+        missing = [
+            head.name for head, head_scores in zip(heads, scores) if None in head_scores
+        ]
+        return _HeadsLookup(heads, keys, scores, misses, missing)
+
+    async def _finish_heads(
+        self,
+        texts: List[str],
+        lookup: _HeadsLookup,
+        scored: List[str],
+        predicted: Dict[str, np.ndarray],
+    ) -> List[Dict[str, Dict[str, Any]]]:
+        """
+        Cache the heads' fresh scores, predicted for the texts ``scored``,
+        and build every text's head results.
+        """
+        fresh: Dict[str, List[float]] = {}
+        for i, head in enumerate(lookup.heads):
+            if head.name not in predicted:
+                continue
+            rows = dict(zip(scored, predicted[head.name].tolist()))
+            for j, text in enumerate(texts):
+                if lookup.scores[i][j] is None:
+                    lookup.scores[i][j] = rows[text]
+                    fresh[lookup.keys[i][j]] = rows[text]
+        if fresh:
+            with stage_timer("cache_set"):
+                await self.cache_service.set_many(fresh)
+
+        results: List[Dict[str, Dict[str, Any]]] = [{} for _ in texts]
+        for head, head_scores in zip(lookup.heads, lookup.scores):
+            built = head.build_results(np.array(head_scores, dtype=np.float32))
+            for result, head_result in zip(results, built):
+                result[head.name] = head_result
+        return results
+
+    async def _analyze_sentiment(self, text: str) -> Dict[str, Any]:
         """
         Analyze text for sentiment and emotions using BERT.
         """
         try:
-            logger.info(f"Analyzing text: {text[:50]}...")  # Log first 50 chars of text
+            if settings.LOG_INPUT_TEXT:
+                logger.debug("Analyzing text: %.50s...", text, extra=SAMPLED)
+            else:
+                logger.debug("Analyzing text of length %d", len(text), extra=SAMPLED)
+
+            # Clearly toxic texts may be answered by the lexicon alone
+            lexicon_result = self._prefilter(text)
+            if lexicon_result is not None:
+                logger.debug("Answered by lexicon pre-filter", extra=SAMPLED)
+                return lexicon_result.to_dict()
 
             # Check cache first
-            cache_key = f"analysis:{text}"
-            cached_result = await self.cache_service.get(cache_key)
+            cache_key = self.cache_key(text)
+            with stage_timer("cache_get"):
+                cached_result = await self.cache_service.get(
+                    cache_key, decoder=AnalysisResult.from_dict
+                )
             if cached_result:
-                logger.info("Retrieved analysis from cache")
+                logger.debug("Retrieved analysis from cache", extra=SAMPLED)
+                return cached_result.to_dict()
+
+            # Texts close to an analyzed one reuse its cached result
+            near, fingerprints = await self._find_near_duplicates({cache_key: text})
+            if near:
+                logger.debug("Retrieved analysis of a near-duplicate", extra=SAMPLED)
+                return near[cache_key].to_dict()
+
+            # Easy texts are answered by the small cascade model
+            (small_result,) = self._score_small([text])
+            if small_result is not None:
+                return small_result.to_dict()
+
+            # Identical texts already being analyzed share that inference
+            if settings.COALESCING_ENABLED:
+                result = await self.in_flight.do(
+                    cache_key, lambda: self._analyze_uncached(text, cache_key)
+                )
+            else:
+                result = await self._analyze_uncached(text, cache_key)
+            self._index_near_duplicates(fingerprints)
+
+            return result.to_dict()
+
+        except OverloadedError:
+            raise
+        except Exception as e:
+            logger.error("Error in text analysis: %s", e, exc_info=True)
+            raise
+
+    def _prefilter(self, text: str) -> Optional[AnalysisResult]:
+        """
+        Run the lexicon pre-filter according to LEXICON_POLICY. Returns a result
+        when the text can skip the model, otherwise None.
+        """
+        if settings.LEXICON_POLICY == "off":
+            return None
+        with stage_timer("lexicon"):
+            return self._run_lexicon(text)
+
+    def _run_lexicon(self, text: str) -> Optional[AnalysisResult]:
+        matcher = get_lexicon_matcher()
+        if settings.LEXICON_POLICY == "shadow":
+            lexicon_score = matcher.score(text)
+            logger.debug(
+                "Lexicon score %.2f with %d toxic hits",
+                lexicon_score.score,
+                lexicon_score.toxic,
+            )
+            return None
+        scores = matcher.short_circuit_scores(text)
+        if scores is None:
+            return None
+        result = self.sentiment_analyzer.build_result(scores)
+        return AnalysisResult.from_dict({**result, "tier": "lexicon"})
+
+    async def _find_near_duplicates(
+        self, misses: Dict[str, str]
+    ) -> Tuple[Dict[str, AnalysisResult], Dict[str, int]]:
+        """
+        Look up cache misses, by cache key, in the near-duplicate index.
+        Returns the cached results of the near-duplicates found, and the
+        fingerprints of the misses to index once their results are cached.
+        """
+        index = get_near_duplicate_index()
+        if index is None:
+            return {}, {}
+        with stage_timer("near_duplicate"):
+            fingerprints: Dict[str, int] = {}
+            matches: Dict[str, Tuple[int, str]] = {}
+            for cache_key, text in misses.items():
+                text_fingerprint = fingerprint(text)
+                if text_fingerprint is None:
+                    continue
+                fingerprints[cache_key] = text_fingerprint
+                match = index.find(text_fingerprint)
+                if match is not None:
+                    matches[cache_key] = match
+            cached = await self.cache_service.get_many(
+                [match_key for _, match_key in matches.values()],
+                decoder=AnalysisResult.from_dict,
+            )
+        found: Dict[str, AnalysisResult] = {}
+        for (cache_key, (match_fingerprint, _)), result in zip(matches.items(), cached):
+            if result is None:
+                # The result has expired from the cache
+                index.discard(match_fingerprint)
+            else:
+                found[cache_key] = result
+        NEAR_DUPLICATE_TOTAL.labels("hit").inc(len(found))
+        NEAR_DUPLICATE_TOTAL.labels("miss").inc(len(fingerprints) - len(found))
+        return found, fingerprints
+
+    def _index_near_duplicates(self, fingerprints: Dict[str, int]) -> None:
+        """Index the fingerprints of texts whose results are now cached."""
+        index = get_near_duplicate_index()
+        if index is not None:
+            for cache_key, text_fingerprint in fingerprints.items():
+                index.add(text_fingerprint, cache_key)
+
+    def _score_small(self, texts: List[str]) -> List[Optional[AnalysisResult]]:
+        """
+        Score texts with the small cascade model. Returns a result for each
+        text it scores with at least CASCADE_CONFIDENCE_THRESHOLD confidence,
+        and None for texts that escalate to the full model.
+
+        Small-model results are not cached: they cost about as much as a cache
+        lookup, and the cache keeps holding full-model results only.
+        """
+        model = get_cascade_model()
+        if model is None or not texts:
+            return [None] * len(texts)
+        with stage_timer("cascade"):
+            scores = model.predict_proba(texts)
+        confident = np.flatnonzero(
+            scores.max(axis=1) >= settings.CASCADE_CONFIDENCE_THRESHOLD
+        )
+        CASCADE_TOTAL.labels(CASCADE_TIER).inc(len(confident))
+        CASCADE_TOTAL.labels("full").inc(len(texts) - len(confident))
+        results: List[Optional[AnalysisResult]] = [None] * len(texts)
+        built = self.sentiment_analyzer.build_results(scores[confident])
+        for i, result in zip(confident.tolist(), built):
+            results[i] = AnalysisResult.from_dict({**result, "tier": CASCADE_TIER})
+        return results
+
+    async def _analyze_uncached(self, text: str, cache_key: str) -> AnalysisResult:
+        """
+        Run the model for a cache miss and cache the result. With distributed
+        coalescing, only the replica holding the Redis lock for the key runs
+        the model; the others wait for its result to appear in the cache.
+        """
+        if not settings.DISTRIBUTED_COALESCING_ENABLED:
+            return await self._run_model(text, cache_key)
+
+        lock_token = await self.cache_service.acquire_lock(
+            cache_key, settings.COALESCING_LOCK_TTL_MS
+        )
+        if lock_token is None:
+            cached_result = await self._wait_for_cached(cache_key)
+            if cached_result is not None:
                 return cached_result
+            logger.info("Timed out waiting for coalesced result, analyzing locally")
+            return await self._run_model(text, cache_key)
 
-            # Perform sentiment analysis
-            logger.info("Performing sentiment analysis")
-            analysis_result = self.sentiment_analyzer.analyze_sentiment(text)
-            logger.debug(f"Raw analysis result: {analysis_result}")
+        try:
+            return await self._run_model(text, cache_key)
+        finally:
+            await self.cache_service.release_lock(cache_key, lock_token)
 
-            # Get sentiment label
-            sentiment_label = self.sentiment_analyzer.get_sentiment_label(
-                cast(float, analysis_result["sentiment_score"])
+    async def _wait_for_cached(self, cache_key: str) -> Optional[AnalysisResult]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.COALESCING_WAIT_TIMEOUT_MS / 1000
+        while loop.time() < deadline:
+            await asyncio.sleep(settings.COALESCING_POLL_INTERVAL_MS / 1000)
+            cached_result = await self.cache_service.get(
+                cache_key, decoder=AnalysisResult.from_dict
             )
-            logger.info(f"Detected sentiment: {sentiment_label}")
+            if cached_result is not None:
+                return cached_result
+        return None
 
-            # Prepare response
-            result = {
-                "sentiment_score": analysis_result["sentiment_score"],
-                "sentiment": sentiment_label,
-                "confidence": analysis_result["confidence"],
-                "dominant_emotion": analysis_result["dominant_emotion"],
-                "raw_scores": analysis_result["raw_scores"],
-            }
-            logger.debug(f"Prepared response: {result}")
+    async def _run_model(self, text: str, cache_key: str) -> AnalysisResult:
+        # Perform sentiment analysis
+        with stage_timer("inference"):
+            if self.batch_scheduler is not None:
+                scores = await self.batch_scheduler.submit(text)
+                analysis_result = self.sentiment_analyzer.build_result(scores)
+            else:
+                analysis_result = await self.executor.run(
+                    self.sentiment_analyzer.analyze_sentiment,
+                    text,
+                    timeout=self.inference_timeout,
+                    priority=self.priority,
+                )
+        result = AnalysisResult.from_dict(analysis_result)
+        logger.debug("Detected sentiment: %s", result.sentiment, extra=SAMPLED)
 
-            # Cache the result
+        # Cache the result
+        with stage_timer("cache_set"):
             await self.cache_service.set(cache_key, result)
-            logger.info("Analysis completed and cached")
 
-            return result
+        return result
 
+    async def _analyze_sentiment_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Analyze many texts for sentiment at once. Cached results are fetched
+        with a single multi-get and only the misses go through the model, in
+        batched calls. Results are returned in input order.
+        """
+        try:
+            lookup = await self._lookup_sentiment_batch(texts)
+            analyzed: List[Dict[str, Any]] = []
+            if lookup.misses:
+                with stage_timer("inference"):
+                    for chunk in self._chunks(list(lookup.misses.values())):
+                        analyzed.extend(
+                            await self.executor.run(
+                                self.sentiment_analyzer.analyze_batch,
+                                chunk,
+                                settings.BATCH_MAX_SIZE,
+                                timeout=self.inference_timeout,
+                                priority=self.priority,
+                            )
+                        )
+            return await self._finish_sentiment_batch(lookup, analyzed)
+
+        except OverloadedError:
+            raise
         except Exception as e:
-            logger.error(f"Error in text analysis: {str(e)}", exc_info=True)
+            logger.error("Error in batch text analysis: %s", e, exc_info=True)
             raise
+
+    async def _lookup_sentiment_batch(self, texts: List[str]) -> _SentimentLookup:
+        """
+        Answer what can be answered without the full model: the lexicon, the
+        cache, near-duplicates and the small cascade model. Misses are
+        deduplicated so repeated texts are scored once.
+        """
+        logger.debug("Analyzing batch of %d texts", len(texts), extra=SAMPLED)
+
+        results = [self._prefilter(text) for text in texts]
+        pending = [i for i, result in enumerate(results) if result is None]
+        cache_keys = {i: self.cache_key(texts[i]) for i in pending}
+        with stage_timer("cache_get"):
+            cached = await self.cache_service.get_many(
+                [cache_keys[i] for i in pending], decoder=AnalysisResult.from_dict
+            )
+        for i, result in zip(pending, cached):
+            results[i] = result
+
+        misses: Dict[str, str] = {}
+        for i in pending:
+            if results[i] is None:
+                misses.setdefault(cache_keys[i], texts[i])
+        logger.debug("Batch cache hits: %d", len(pending) - len(misses), extra=SAMPLED)
+
+        answered, fingerprints = await self._find_near_duplicates(misses)
+        for cache_key in answered:
+            del misses[cache_key]
+        small = list(zip(misses, self._score_small(list(misses.values()))))
+        for cache_key, result in small:
+            if result is not None:
+                answered[cache_key] = result
+                del misses[cache_key]
+        for i in pending:
+            if results[i] is None:
+                results[i] = answered.get(cache_keys[i])
+        return _SentimentLookup(results, cache_keys, misses, fingerprints)
+
+    async def _finish_sentiment_batch(
+        self, lookup: _SentimentLookup, analyzed: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Cache the model's results for the misses, given in ``lookup.misses``
+        order, and return every text's result.
+        """
+        if lookup.misses:
+            fresh = {
+                cache_key: AnalysisResult.from_dict(result)
+                for cache_key, result in zip(lookup.misses, analyzed)
+            }
+            with stage_timer("cache_set"):
+                await self.cache_service.set_many(fresh)
+            self._index_near_duplicates(
+                {
+                    cache_key: lookup.fingerprints[cache_key]
+                    for cache_key in fresh
+                    if cache_key in lookup.fingerprints
+                }
+            )
+            for i, cache_key in lookup.cache_keys.items():
+                if lookup.results[i] is None:
+                    lookup.results[i] = fresh[cache_key]
+        return [cast(AnalysisResult, result).to_dict() for result in lookup.results]
@@ -0,0 +1,121 @@
+import hashlib
+import re
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from app.core.config import get_settings
+from .keys import normalize_text
+
+settings = get_settings()
+
+FINGERPRINT_BITS = 64
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def simhash(tokens: Sequence[str]) -> int:
+    """
+    64-bit SimHash of a token sequence over its unigrams and bigrams: each
+    bit is the majority vote of that bit across the features' hashes, so
+    texts sharing most features get fingerprints a few bits apart.
+    """
+    features = list(tokens)
+    features.extend(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+    hashes = b"".join(
+        hashlib.blake2b(feature.encode(), digest_size=8).digest()
+        for feature in features
+    )
+    bits = np.unpackbits(
+        np.frombuffer(hashes, dtype=np.uint8), bitorder="little"
+    ).reshape(len(features), FINGERPRINT_BITS)
+    votes = bits.sum(axis=0) * 2 > len(features)
+    return int.from_bytes(np.packbits(votes, bitorder="little").tobytes(), "little")
+
+
+def fingerprint(text: str) -> Optional[int]:
+    """
+    SimHash of a text's cache-normalized form, or None for texts too short
+    to fingerprint reliably.
+    """
+    tokens = _TOKEN.findall(normalize_text(text))
+    if len(tokens) < settings.NEAR_DUPLICATE_MIN_TOKENS:
+        return None
+    return simhash(tokens)
+
+
+class NearDuplicateIndex:
+    """
+    Bounded, least-recently-used index of SimHash fingerprints to the cache
+    keys of their results.
+
+    Fingerprints are split into ``max_distance + 1`` bands. Two fingerprints
+    at most ``max_distance`` bits apart agree on at least one whole band, so
+    a lookup only compares the fingerprints sharing a band with the query
+    rather than every indexed one.
+    """
+
+    def __init__(self, max_items: int, max_distance: int):
+        self.max_items = max_items
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        edges = [FINGERPRINT_BITS * i // bands for i in range(bands + 1)]
+        self._bands = [
+            (start, (1 << (end - start)) - 1) for start, end in zip(edges, edges[1:])
+        ]
+        self._keys: "OrderedDict[int, str]" = OrderedDict()
+        self._buckets: List[Dict[int, Set[int]]] = [{} for _ in self._bands]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _band_values(self, fingerprint: int) -> List[int]:
+        return [(fingerprint >> shift) & mask for shift, mask in self._bands]
+
+    def add(self, fingerprint: int, key: str) -> None:
+        if fingerprint in self._keys:
+            self._keys.move_to_end(fingerprint)
+            self._keys[fingerprint] = key
+            return
+        self._keys[fingerprint] = key
+        for bucket, value in zip(self._buckets, self._band_values(fingerprint)):
+            bucket.setdefault(value, set()).add(fingerprint)
+        if len(self._keys) > self.max_items:
+            self.discard(next(iter(self._keys)))
+
+    def discard(self, fingerprint: int) -> None:
+        if self._keys.pop(fingerprint, None) is None:
+            return
+        for bucket, value in zip(self._buckets, self._band_values(fingerprint)):
+            candidates = bucket[value]
+            candidates.discard(fingerprint)
+            if not candidates:
+                del bucket[value]
+
+    def find(self, fingerprint: int) -> Optional[Tuple[int, str]]:
+        """
+        The closest indexed fingerprint within ``max_distance`` bits, with
+        its cache key, or None.
+        """
+        best: Optional[Tuple[int, int]] = None
+        for bucket, value in zip(self._buckets, self._band_values(fingerprint)):
+            for candidate in bucket.get(value, ()):
+                distance = (candidate ^ fingerprint).bit_count()
+                if distance <= self.max_distance and (
+                    best is None or distance < best[0]
+                ):
+                    best = (distance, candidate)
+        if best is None:
+            return None
+        self._keys.move_to_end(best[1])
+        return best[1], self._keys[best[1]]
+
+
+@lru_cache()
+def get_near_duplicate_index() -> Optional[NearDuplicateIndex]:
+    """Return the process-wide near-duplicate index, or None when disabled."""
+    if not settings.NEAR_DUPLICATE_ENABLED:
+        return None
+    return NearDuplicateIndex(
+        settings.NEAR_DUPLICATE_MAX_ITEMS, settings.NEAR_DUPLICATE_MAX_DISTANCE
+    )
@@ -0,0 +1,37 @@
+import logging
+import re
+from functools import lru_cache
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# The placeholders bertweet was pre-trained with
+USER_TOKEN = "@USER"
+URL_TOKEN = "HTTPURL"
+
+_USER = re.compile(r"(?<!\w)@\w+")
+_URL = re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE)
+_PUNCTUATION = str.maketrans({"’": "'", "‘": "'", "“": '"', "”": '"', "…": "..."})
+
+
+@lru_cache()
+def get_demojizer() -> Optional[Callable[[str], str]]:
+    """emoji.demojize, or None when the optional emoji package is missing."""
+    try:
+        import emoji
+    except ImportError:  # optional dependency
+        logger.warning("emoji is not installed, so emoji are not normalized")
+        return None
+    return emoji.demojize
+
+
+def normalize_tweet(text: str) -> str:
+    """
+    Canonicalize a text the way bertweet's tweet normalization does: user
+    mentions become ``@USER``, URLs ``HTTPURL`` and emoji their ``:name:``,
+    with typographic quotes and ellipses made ASCII. Texts that differ only
+    in who they mention or link to come out the same.
+    """
+    text = _USER.sub(USER_TOKEN, _URL.sub(URL_TOKEN, text.translate(_PUNCTUATION)))
+    demojize = get_demojizer()
+    return demojize(text) if demojize is not None else text
@@ -0,0 +1,149 @@
+import contextvars
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Literal, Optional, Sequence, Tuple, get_args
+import numpy as np
+from app.core.config import get_settings
+from .classifier import SequenceClassifier
+from .keys import make_cache_key
+from .model_store import ModelSource
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+HeadName = Literal["sentiment", "toxicity", "emotion"]
+HEADS: Tuple[str, ...] = get_args(HeadName)
+
+
+class HeadUnavailableError(ValueError):
+    """Raised when a request asks for a head that has no model configured."""
+
+
+def configured_heads() -> Dict[str, Tuple[str, Optional[str]]]:
+    """Model name and revision of every head besides sentiment that is enabled."""
+    models = {
+        "toxicity": (settings.TOXICITY_MODEL_NAME, settings.TOXICITY_MODEL_REVISION),
+        "emotion": (settings.EMOTION_MODEL_NAME, settings.EMOTION_MODEL_REVISION),
+    }
+    return {name: model for name, model in models.items() if model[0]}
+
+
+class ClassifierHead(SequenceClassifier):
+    """
+    A moderation head besides sentiment: a classifier whose result is its
+    top label and the score of every label, with the labels of multi-label
+    models scoring at least ``HEAD_FLAG_THRESHOLD`` listed as flagged.
+    """
+
+    def __init__(self, name: str, model_name: str, revision: Optional[str] = None):
+        source = ModelSource(
+            path=model_name,
+            model_name=model_name,
+            revision=revision,
+            local_files_only=settings.MODEL_LOCAL_FILES_ONLY,
+        )
+        # The onnx export covers the sentiment model only
+        backend = settings.INFERENCE_BACKEND
+        if backend == "onnx":
+            backend = "torch"
+        # "max_negative" is specific to sentiment; average the windows instead
+        policy = "first" if settings.LONG_TEXT_POLICY == "first" else "mean"
+        super().__init__(source, backend, long_text_policy=policy)
+        self.name = name
+        logger.info(
+            "Initialized %s head with model: %s (%s backend)",
+            name,
+            self.model_name,
+            self.backend.name,
+        )
+
+    def cache_key(self, text: str) -> str:
+        """Key of the head's cached scores for ``text``."""
+        # Qualified by head so a model serving two heads, or also sentiment,
+        # never reads another head's entries
+        return make_cache_key(
+            text,
+            f"{self.name}:{self.model_name}",
+            self.model_revision,
+            self.backend.identity,
+            self.tweet_normalization,
+        )
+
+    def build_results(self, scores: np.ndarray) -> List[Dict[str, Any]]:
+        """Build one result per row of scores."""
+        results = []
+        for row, top in zip(scores.tolist(), scores.argmax(axis=1).tolist()):
+            result: Dict[str, Any] = {
+                "label": self.labels[top],
+                "score": row[top],
+                "scores": dict(zip(self.labels, row)),
+            }
+            if self.multi_label:
+                result["flagged"] = [
+                    label
+                    for label, score in zip(self.labels, row)
+                    if score >= settings.HEAD_FLAG_THRESHOLD
+                ]
+            results.append(result)
+        return results
+
+
+class ModerationPipeline:
+    """
+    Runs several classifier heads, and optionally the sentiment model, over
+    the same texts.
+
+    Classifiers whose tokenizers agree (see ``tokenizer_fingerprint``) share
+    one tokenization of the texts, and their forward passes run concurrently
+    on a thread pool of their own (torch releases the GIL while it computes).
+    """
+
+    def __init__(self, heads: Dict[str, ClassifierHead]):
+        self.heads = heads
+        # One thread per head, plus one for sentiment
+        self._pool = ThreadPoolExecutor(
+            max_workers=len(heads) + 1, thread_name_prefix="head"
+        )
+
+    @property
+    def available(self) -> Tuple[str, ...]:
+        return tuple(self.heads)
+
+    def predict(
+        self,
+        texts: List[str],
+        names: Sequence[str],
+        batch_size: Optional[int] = None,
+        sentiment: Optional[SequenceClassifier] = None,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Scores of each named head, one row per text. With ``sentiment``,
+        its scores are included under "sentiment", and it shares tokenizer
+        output with the heads as well.
+        """
+        classifiers: Dict[str, SequenceClassifier] = {
+            name: self.heads[name] for name in names
+        }
+        if sentiment is not None:
+            classifiers["sentiment"] = sentiment
+        groups: Dict[str, List[str]] = {}
+        for name, classifier in classifiers.items():
+            groups.setdefault(classifier.tokenizer_key, []).append(name)
+
+        futures: Dict[str, Future] = {}
+        for group in groups.values():
+            token_ids = classifiers[group[0]].tokenize(texts)
+            for name in group:
+                # Keep the caller's context so stage timings are attributed
+                context = contextvars.copy_context()
+                futures[name] = self._pool.submit(
+                    context.run,
+                    classifiers[name].predict_scores,
+                    texts,
+                    batch_size,
+                    token_ids,
+                )
+        return {name: future.result() for name, future in futures.items()}
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
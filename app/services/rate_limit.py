@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional, Set, Tuple
+import redis.asyncio as redis
+from redis.commands.core import AsyncScript
+from app.core.config import get_settings
+from .cache import REDIS_ERRORS, get_redis_pool
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+RATE_LIMIT_MODES = ("redis", "local")
+
+# Refill a bucket for the time since it was last used, then take tokens from
+# it, in one atomic step. ARGV: capacity, refill rate per second, tokens to
+# take, and "1" to take them only if available or "0" to take them anyway
+# (used to report usage counted locally). Taking more tokens than the bucket
+# holds needs a full bucket and leaves it in debt. Returns whether the tokens
+# were taken and how many are left, as a string to keep the fraction.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local clock = redis.call("TIME")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call("HMGET", KEYS[1], "tokens", "updated")
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= math.min(requested, capacity) or ARGV[4] == "0" then
+    tokens = tokens - requested
+    allowed = 1
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated", tostring(now))
+redis.call("PEXPIRE", KEYS[1], math.ceil(((capacity - tokens) / rate + 1) * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+
+@dataclass(slots=True)
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: float
+    # Tokens added back per second
+    rate: float
+    # Tokens the request asked for
+    cost: int = 1
+
+    def headers(self) -> Dict[str, str]:
+        """Quota headers for the response; ``Retry-After`` when rejected."""
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(max(0, int(self.remaining))),
+            # Seconds until the bucket is full again
+            "X-RateLimit-Reset": str(
+                math.ceil((self.limit - self.remaining) / self.rate)
+            ),
+        }
+        if not self.allowed:
+            needed = min(self.cost, self.limit) - self.remaining
+            headers["Retry-After"] = str(max(1, math.ceil(needed / self.rate)))
+        return headers
+
+
+@dataclass(slots=True)
+class _LocalBucket:
+    tokens: float
+    updated: float
+    synced_at: float
+    # Tokens taken locally and not yet reported to Redis
+    unsynced: int = 0
+    syncing: bool = False
+
+
+class RateLimiter:
+    """
+    Per-client token buckets holding up to ``capacity`` tokens and refilling
+    at ``per_minute`` tokens a minute. Each hit takes as many tokens as it
+    costs; one costing more than ``capacity`` is let through only with a
+    full bucket, which it leaves in debt until refilled.
+
+    In ``redis`` mode each request runs one Lua script that refills the
+    bucket and takes a token atomically, so the limit is exact across
+    replicas at the cost of one round trip. In ``local`` mode each process
+    answers from its own copy of the bucket and reconciles it with Redis in
+    the background every ``sync_interval`` seconds, so most requests never
+    touch Redis; the limit is then approximate and each replica may let
+    through up to one interval's worth of extra requests.
+
+    While Redis is unavailable, the local buckets are used on their own, so
+    every replica enforces the full limit by itself.
+    """
+
+    # Monotonic time until which Redis is considered unavailable
+    _unavailable_until = 0.0
+
+    def __init__(
+        self,
+        per_minute: int,
+        capacity: int,
+        mode: str = "redis",
+        sync_interval: float = 1.0,
+        redis_client: Optional[redis.Redis] = None,
+    ):
+        if mode not in RATE_LIMIT_MODES:
+            raise ValueError(
+                f"Unknown rate limit mode {mode!r}, expected one of {RATE_LIMIT_MODES}"
+            )
+        self.rate = max(1, per_minute) / 60
+        self.capacity = max(1, capacity)
+        self.mode = mode
+        self.sync_interval = sync_interval
+        self._redis_client = redis_client
+        self._buckets: Dict[str, _LocalBucket] = {}
+        self._sync_tasks: Set[asyncio.Task] = set()
+        # The token bucket script and the connection pool it was registered on
+        self._script: Optional[Tuple[redis.ConnectionPool, AsyncScript]] = None
+
+    @property
+    def script(self) -> AsyncScript:
+        """
+        The token bucket script, registered once rather than per request:
+        registering hashes the source and builds a client. The limiter
+        outlives event loops in tests, so the script is registered again
+        when the running loop has another connection pool.
+        """
+        if self._redis_client is not None:
+            pool = self._redis_client.connection_pool
+        else:
+            pool = get_redis_pool()
+        if self._script is None or self._script[0] is not pool:
+            client = self._redis_client or redis.Redis(connection_pool=pool)
+            self._script = (pool, client.register_script(TOKEN_BUCKET_SCRIPT))
+        return self._script[1]
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= RateLimiter._unavailable_until
+
+    async def hit(self, client: str, tokens: int = 1) -> RateLimitResult:
+        """Take ``tokens`` tokens from ``client``'s bucket."""
+        if self.mode == "redis" and self.available:
+            try:
+                allowed, remaining = await self._take(client, tokens, strict=True)
+                return RateLimitResult(
+                    allowed, self.capacity, remaining, self.rate, tokens
+                )
+            except REDIS_ERRORS as e:
+                self._mark_unavailable(e)
+        return self._hit_local(client, tokens)
+
+    def _hit_local(self, client: str, tokens: int) -> RateLimitResult:
+        now = time.monotonic()
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = _LocalBucket(self.capacity, now, now)
+        bucket.tokens = min(
+            self.capacity, bucket.tokens + (now - bucket.updated) * self.rate
+        )
+        bucket.updated = now
+        allowed = bucket.tokens >= min(tokens, self.capacity)
+        if allowed:
+            bucket.tokens -= tokens
+            bucket.unsynced += tokens
+
+        if (
+            self.mode == "local"
+            and not bucket.syncing
+            and now - bucket.synced_at >= self.sync_interval
+            and self.available
+        ):
+            bucket.syncing = True
+            task = asyncio.get_running_loop().create_task(self._sync(client, bucket))
+            self._sync_tasks.add(task)
+            task.add_done_callback(self._sync_tasks.discard)
+
+        return RateLimitResult(allowed, self.capacity, bucket.tokens, self.rate, tokens)
+
+    async def _sync(self, client: str, bucket: _LocalBucket) -> None:
+        """Report local usage to Redis and adopt its view of the bucket."""
+        used, bucket.unsynced = bucket.unsynced, 0
+        try:
+            _, remaining = await self._take(client, used, strict=False)
+        except REDIS_ERRORS as e:
+            bucket.unsynced += used
+            self._mark_unavailable(e)
+            return
+        finally:
+            bucket.synced_at = time.monotonic()
+            bucket.syncing = False
+        # Tokens taken here while the sync was in flight still count
+        bucket.tokens = remaining - bucket.unsynced
+        bucket.updated = time.monotonic()
+
+    async def _take(self, client: str, tokens: int, strict: bool) -> Tuple[bool, float]:
+        allowed, remaining = await self.script(
+            keys=[f"ratelimit:{client}"],
+            args=[self.capacity, self.rate, tokens, "1" if strict else "0"],
+        )
+        return bool(allowed), float(remaining)
+
+    def _mark_unavailable(self, error: Exception) -> None:
+        RateLimiter._unavailable_until = (
+            time.monotonic() + settings.REDIS_RETRY_INTERVAL
+        )
+        logger.warning("Redis rate limiting failed, limiting locally: %r", error)
+
+
+@lru_cache()
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide rate limiter."""
+    return RateLimiter(
+        per_minute=settings.RATE_LIMIT_PER_MINUTE,
+        capacity=settings.RATE_LIMIT_BURST or settings.RATE_LIMIT_PER_MINUTE,
+        mode=settings.RATE_LIMIT_MODE,
+        sync_interval=settings.RATE_LIMIT_SYNC_INTERVAL_MS / 1000,
+    )
@@ -0,0 +1,178 @@
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Optional, cast
+from app.core.config import get_settings
+from app.core.timing import collect_stages, stage_timer
+from .batching import BatchScheduler
+from .cascade import get_cascade_model
+from .executor import InferenceExecutor
+from .pipeline import ClassifierHead, ModerationPipeline, configured_heads
+from .sentiment import SentimentAnalyzer
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+WARMUP_TEXT = "Warming up the content moderator"
+
+# Stages reported as startup phases when models are loaded
+STARTUP_PHASES = ("import", "load_tokenizer", "load_model", "warmup")
+
+
+class ModelRegistry:
+    """
+    Process-wide holder for loaded models.
+
+    Models are loaded once, either at startup through the application lifespan
+    or lazily on first use, and then shared by every request in the process.
+    """
+
+    def __init__(self):
+        self._sentiment_analyzer: Optional[SentimentAnalyzer] = None
+        self._batch_scheduler: Optional[BatchScheduler] = None
+        self._inference_executor: Optional[InferenceExecutor] = None
+        self._pipeline: Optional[ModerationPipeline] = None
+        self._lock = threading.Lock()
+        self.ready = False
+        self.load_seconds: Optional[float] = None
+        self.startup_phases: Dict[str, float] = {}
+        self._warmed_up = False
+
+    def get_sentiment_analyzer(self) -> SentimentAnalyzer:
+        """Return the shared sentiment analyzer, loading it on first use."""
+        analyzer = self._sentiment_analyzer
+        if analyzer is None:
+            analyzer = self.load()
+        return analyzer
+
+    def get_pipeline(self) -> ModerationPipeline:
+        """Return the pipeline of heads besides sentiment, loading it on first use."""
+        pipeline = self._pipeline
+        if pipeline is None:
+            self.load()
+            pipeline = cast(ModerationPipeline, self._pipeline)
+        return pipeline
+
+    def get_inference_executor(self) -> InferenceExecutor:
+        """Return the shared thread pool that runs model inference."""
+        if self._inference_executor is None:
+            with self._lock:
+                if self._inference_executor is None:
+                    self._inference_executor = InferenceExecutor(
+                        workers=settings.INFERENCE_WORKERS,
+                        max_pending=settings.INFERENCE_MAX_PENDING,
+                        timeout=settings.INFERENCE_TIMEOUT_MS / 1000,
+                    )
+        return self._inference_executor
+
+    def get_batch_scheduler(self) -> Optional[BatchScheduler]:
+        """
+        Return the shared batch scheduler for the sentiment model,
+        or None when batching is disabled.
+        """
+        if not settings.BATCHING_ENABLED:
+            return None
+        if self._batch_scheduler is None:
+            analyzer = self.get_sentiment_analyzer()
+            self._batch_scheduler = BatchScheduler(
+                analyzer.predict_scores,
+                max_batch_size=settings.BATCH_MAX_SIZE,
+                max_wait_ms=settings.BATCH_MAX_WAIT_MS,
+                executor=self.get_inference_executor(),
+                max_queue_size=settings.INFERENCE_MAX_PENDING,
+                timeout=settings.INFERENCE_TIMEOUT_MS / 1000,
+            )
+        return self._batch_scheduler
+
+    @property
+    def batch_queue_depth(self) -> int:
+        """Texts waiting in the batch scheduler, without creating it."""
+        scheduler = self._batch_scheduler
+        return scheduler.queue_depth if scheduler is not None else 0
+
+    @property
+    def inference_pending(self) -> int:
+        """Jobs in the inference executor, without creating it."""
+        executor = self._inference_executor
+        return executor.pending if executor is not None else 0
+
+    async def aclose(self) -> None:
+        """Stop background workers owned by the registry."""
+        if self._batch_scheduler is not None:
+            await self._batch_scheduler.close()
+            self._batch_scheduler = None
+        if self._inference_executor is not None:
+            self._inference_executor.close()
+            self._inference_executor = None
+
+    def load(self, warmup: bool = False) -> SentimentAnalyzer:
+        """
+        Load all models if they are not loaded yet, and warm them up with one
+        inference if asked and not done yet in this process.
+        Safe to call from several threads; only the first caller loads.
+        """
+        with self._lock:
+            if self._sentiment_analyzer is None:
+                started = time.perf_counter()
+                with collect_stages() as timings:
+                    # Only the bertweet sentiment model was trained on
+                    # normalized tweets; the heads get the raw text
+                    self._sentiment_analyzer = SentimentAnalyzer(
+                        tweet_normalization=settings.TWEET_NORMALIZATION
+                    )
+                    get_cascade_model()
+                    self._pipeline = ModerationPipeline(
+                        {
+                            name: ClassifierHead(name, model_name, revision)
+                            for name, (
+                                model_name,
+                                revision,
+                            ) in configured_heads().items()
+                        }
+                    )
+                self.load_seconds = time.perf_counter() - started
+                self._record_phases(timings.seconds)
+                logger.info(
+                    "Loaded models in %.2fs (%s)",
+                    self.load_seconds,
+                    ", ".join(
+                        f"{phase} {seconds:.2f}s"
+                        for phase, seconds in self.startup_phases.items()
+                    ),
+                )
+            if warmup and not self._warmed_up:
+                # Kept separate from loading so models can be loaded before
+                # forking workers and warmed up in each worker afterwards
+                with collect_stages() as timings:
+                    with stage_timer("warmup"):
+                        self._sentiment_analyzer.analyze_sentiment(WARMUP_TEXT)
+                        pipeline = cast(ModerationPipeline, self._pipeline)
+                        if pipeline.heads:
+                            pipeline.predict([WARMUP_TEXT], pipeline.available)
+                self._warmed_up = True
+                self._record_phases(timings.seconds)
+                logger.info("Warmed up models in %.2fs", timings.seconds["warmup"])
+            self.ready = True
+            return self._sentiment_analyzer
+
+    def _record_phases(self, seconds: Dict[str, float]) -> None:
+        for phase in STARTUP_PHASES:
+            if phase in seconds:
+                self.startup_phases[phase] = seconds[phase]
+
+    def unload(self) -> None:
+        """Drop references to loaded models."""
+        with self._lock:
+            self._sentiment_analyzer = None
+            self._batch_scheduler = None
+            if self._pipeline is not None:
+                self._pipeline.close()
+                self._pipeline = None
+            self._warmed_up = False
+            self.ready = False
+
+
+@lru_cache()
+def get_model_registry() -> ModelRegistry:
+    return ModelRegistry()
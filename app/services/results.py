@@ -0,0 +1,48 @@
+from dataclasses import dataclass
+from typing import Any, Dict
+
+
+@dataclass(slots=True, frozen=True)
+class AnalysisResult:
+    """
+    Compact analysis result, as kept in the in-process cache.
+    Converted to the nested API dict only when a response is built.
+    """
+
+    sentiment_score: float
+    sentiment: str
+    confidence: float
+    dominant_emotion: str
+    negative: float
+    neutral: float
+    positive: float
+    # Which stage produced the result: "model", "small" (cascade) or "lexicon"
+    tier: str = "model"
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AnalysisResult":
+        raw_scores = data["raw_scores"]
+        return cls(
+            sentiment_score=data["sentiment_score"],
+            sentiment=data["sentiment"],
+            confidence=data["confidence"],
+            dominant_emotion=data["dominant_emotion"],
+            negative=raw_scores["negative"],
+            neutral=raw_scores["neutral"],
+            positive=raw_scores["positive"],
+            tier=data.get("tier", "model"),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sentiment_score": self.sentiment_score,
+            "sentiment": self.sentiment,
+            "confidence": self.confidence,
+            "dominant_emotion": self.dominant_emotion,
+            "raw_scores": {
+                "negative": self.negative,
+                "neutral": self.neutral,
+                "positive": self.positive,
+            },
+            "tier": self.tier,
+        }
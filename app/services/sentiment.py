@@ -1,86 +1,122 @@
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
 import numpy as np
-from typing import Dict, Union
+from bisect import bisect_right
+from typing import Dict, List, Optional, Union
 import logging
+from app.core.config import get_settings
+from .classifier import SequenceClassifier
+from .model_store import resolve_model_source
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
+# Model output classes, in logit order
+SENTIMENT_CLASSES = ("negative", "neutral", "positive")
 
-class SentimentAnalyzer:
-    def __init__(self):
+# Labels for sentiment scores below each threshold, and the last one for the rest
+SENTIMENT_THRESHOLDS = [-0.5, -0.2, 0.2, 0.5]
+SENTIMENT_LABELS = np.array(
+    ["very_negative", "negative", "neutral", "positive", "very_positive"]
+)
+
+# Dominant emotion guessed from the sentiment score, same layout as above
+EMOTION_THRESHOLDS = [-0.5, 0.0, 0.5]
+EMOTION_LABELS = np.array(["anger", "disappointment", "neutral", "joy"])
+
+
+class SentimentAnalyzer(SequenceClassifier):
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        model_revision: Optional[str] = None,
+        backend: Optional[str] = None,
+        tweet_normalization: Optional[bool] = None,
+    ):
         # Load pre-trained model and tokenizer
-        self.model_name = "finiteautomata/bertweet-base-sentiment-analysis"
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-        self.model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.model.to(self.device)
-        logger.info(f"Initialized sentiment analyzer with model: {self.model_name}")
+        super().__init__(
+            resolve_model_source(model_name, model_revision),
+            backend or settings.INFERENCE_BACKEND,
+            labels=SENTIMENT_CLASSES,
+            tweet_normalization=(
+                settings.TWEET_NORMALIZATION
+                if tweet_normalization is None
+                else tweet_normalization
+            ),
+        )
+        logger.info(
+            "Initialized sentiment analyzer with model: %s (%s backend)",
+            self.model_name,
+            self.backend.name,
+        )
 
-    def analyze_sentiment(
-        self, text: str
-    ) -> Dict[str, Union[float, Dict[str, float], str]]:
+    def build_results(
+        self, scores: np.ndarray
+    ) -> List[Dict[str, Union[float, Dict[str, float], str]]]:
         """
-        Analyze the sentiment of the given text using BERT.
-        Returns a dictionary with sentiment scores.
+        Build analysis results for a matrix of softmax scores, one row per text.
+        Scores, labels and emotions are computed over the whole matrix at once.
         """
-        try:
-            # Tokenize and prepare input
-            inputs = self.tokenizer(
-                text, return_tensors="pt", truncation=True, max_length=512, padding=True
-            ).to(self.device)
+        # Overall sentiment score (-1 to 1): positive - negative
+        sentiment_scores = scores[:, 2] - scores[:, 0]
+        confidences = scores.max(axis=1)
+        labels = SENTIMENT_LABELS[np.digitize(sentiment_scores, SENTIMENT_THRESHOLDS)]
+        emotions = EMOTION_LABELS[np.digitize(sentiment_scores, EMOTION_THRESHOLDS)]
 
-            # Get model predictions
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                scores = torch.softmax(outputs.logits, dim=1)
-                scores = scores.cpu().numpy()[0]
-
-            # Map scores to sentiment categories (3 classes: negative, neutral, positive)
-            sentiment_scores = {
-                "negative": float(scores[0]),
-                "neutral": float(scores[1]),
-                "positive": float(scores[2]),
+        return [
+            {
+                "sentiment_score": sentiment_score,
+                "sentiment": label,
+                "confidence": confidence,
+                "dominant_emotion": emotion,
+                "raw_scores": dict(zip(SENTIMENT_CLASSES, row)),
             }
+            for sentiment_score, label, confidence, emotion, row in zip(
+                sentiment_scores.tolist(),
+                labels.tolist(),
+                confidences.tolist(),
+                emotions.tolist(),
+                scores.tolist(),
+            )
+        ]
 
-            # Calculate overall sentiment score (-1 to 1)
-            sentiment_score = scores[2] - scores[0]  # positive - negative
+    def build_result(
+        self, scores: np.ndarray
+    ) -> Dict[str, Union[float, Dict[str, float], str]]:
+        """
+        Build the analysis result from one row of softmax scores.
+        """
+        return self.build_results(scores[np.newaxis, :])[0]
 
-            # Get dominant emotion based on sentiment
-            if sentiment_score < -0.5:
-                dominant_emotion = "anger"
-            elif sentiment_score < 0:
-                dominant_emotion = "disappointment"
-            elif sentiment_score < 0.5:
-                dominant_emotion = "neutral"
-            else:
-                dominant_emotion = "joy"
+    def analyze_batch(
+        self, texts: List[str], batch_size: Optional[int] = None
+    ) -> List[Dict[str, Union[float, Dict[str, float], str]]]:
+        """
+        Analyze the sentiment of many texts with batched forward passes.
+        Returns one result per text, in input order.
+        """
+        try:
+            return self.build_results(self.predict_scores(texts, batch_size))
 
-            # Calculate confidence
-            confidence = float(max(scores))
+        except Exception as e:
+            logger.error("Error in batch sentiment analysis: %s", e)
+            raise
 
-            return {
-                "sentiment_score": float(sentiment_score),
-                "confidence": float(confidence),
-                "dominant_emotion": dominant_emotion,
-                "raw_scores": sentiment_scores,
-            }
+    def analyze_sentiment(
+        self, text: str
+    ) -> Dict[str, Union[float, Dict[str, float], str]]:
+        """
+        Analyze the sentiment of the given text using BERT.
+        Returns a dictionary with sentiment scores.
+        """
+        try:
+            scores = self.predict_scores([text])[0]
+            return self.build_result(scores)
 
         except Exception as e:
-            logger.error(f"Error in sentiment analysis: {str(e)}")
+            logger.error("Error in sentiment analysis: %s", e)
             raise
 
     def get_sentiment_label(self, score: float) -> str:
         """
         Convert sentiment score to label.
         """
-        if score < -0.5:
-            return "very_negative"
-        elif score < -0.2:
-            return "negative"
-        elif score < 0.2:
-            return "neutral"
-        elif score < 0.5:
-            return "positive"
-        else:
-            return "very_positive"
+        return str(SENTIMENT_LABELS[bisect_right(SENTIMENT_THRESHOLDS, score)])
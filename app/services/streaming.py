@@ -0,0 +1,196 @@
+import asyncio
+import json
+import logging
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+from app.core.config import get_settings
+from .executor import OverloadedError
+from .moderation import ModerationService
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# (line index, caller-supplied id, text or None if the line was invalid, error)
+StreamItem = Tuple[int, Any, Optional[str], Optional[str]]
+# Takes the cost of a batch of lines, returning False when it is refused
+Charge = Callable[[int], Awaitable[bool]]
+
+RATE_LIMITED = "rate limit exceeded"
+
+
+async def iter_lines(
+    chunks: AsyncIterator[bytes], max_line_bytes: int
+) -> AsyncIterator[Optional[bytes]]:
+    """
+    Split a byte stream into lines without holding more than one line in
+    memory. Lines longer than ``max_line_bytes`` are dropped and yielded as
+    None so the caller can report them. Blank lines are skipped.
+    """
+    buffer = bytearray()
+    too_long = False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            piece = chunk[start:] if end == -1 else chunk[start:end]
+            if not too_long:
+                buffer += piece
+                if len(buffer) > max_line_bytes:
+                    too_long = True
+                    buffer.clear()
+            if end == -1:
+                break
+            if too_long:
+                yield None
+            elif buffer.strip():
+                yield bytes(buffer)
+            buffer.clear()
+            too_long = False
+            start = end + 1
+    if too_long:
+        yield None
+    elif buffer.strip():
+        yield bytes(buffer)
+
+
+def parse_line(line: Optional[bytes]) -> Tuple[Any, Optional[str], Optional[str]]:
+    """
+    Parse one NDJSON input line, either ``{"text": ..., "id": ...}`` or a bare
+    JSON string. Returns (id, text, error).
+    """
+    if line is None:
+        return None, None, "line too long"
+    try:
+        item = json.loads(line)
+    except ValueError:
+        return None, None, "invalid JSON"
+    if isinstance(item, str):
+        return None, item, None
+    if isinstance(item, dict) and isinstance(item.get("text"), str):
+        return item.get("id"), item["text"], None
+    return (
+        item.get("id") if isinstance(item, dict) else None,
+        None,
+        'expected a JSON string or an object with a "text" string',
+    )
+
+
+async def _put_batch(
+    queue: asyncio.Queue, batch: List[StreamItem], charge: Optional[Charge]
+) -> bool:
+    """
+    Queue a batch for analysis, or only its errors when ``charge`` refuses
+    it. Returns whether to keep reading.
+    """
+    if charge is not None and not await charge(len(batch)):
+        await queue.put(
+            [(index, item_id, None, RATE_LIMITED) for index, item_id, _, _ in batch]
+        )
+        return False
+    # Blocks while the consumer is behind, which stops reading the body
+    await queue.put(batch)
+    return True
+
+
+async def _read_batches(
+    chunks: AsyncIterator[bytes],
+    queue: asyncio.Queue,
+    batch_size: int,
+    charge: Optional[Charge] = None,
+) -> None:
+    batch: List[StreamItem] = []
+    index = 0
+    async for line in iter_lines(chunks, settings.STREAM_MAX_LINE_BYTES):
+        item_id, text, error = parse_line(line)
+        batch.append((index, item_id, text, error))
+        index += 1
+        if len(batch) >= batch_size:
+            if not await _put_batch(queue, batch, charge):
+                return
+            batch = []
+    if batch:
+        await _put_batch(queue, batch, charge)
+
+
+async def analyze_ndjson_stream(
+    chunks: AsyncIterator[bytes],
+    moderation_service: ModerationService,
+    batch_size: Optional[int] = None,
+    max_pending_batches: Optional[int] = None,
+    charge: Optional[Charge] = None,
+) -> AsyncIterator[str]:
+    """
+    Analyze newline-delimited JSON texts from ``chunks`` in bounded batches and
+    yield one NDJSON result line per input line, in input order.
+
+    Reading runs ahead of analysis by at most ``max_pending_batches`` batches,
+    so memory stays bounded whatever the input size and a slow model or a
+    slow client pushes back on the sender.
+
+    Each batch read is first passed to ``charge`` with its number of lines.
+    Once it refuses one, that batch's lines get a rate limit error and the
+    rest of the body is not read.
+    """
+    queue: asyncio.Queue = asyncio.Queue(
+        maxsize=max_pending_batches or settings.STREAM_MAX_PENDING_BATCHES
+    )
+    reader = asyncio.ensure_future(
+        _read_batches(chunks, queue, batch_size or settings.STREAM_BATCH_SIZE, charge)
+    )
+    try:
+        while True:
+            get_batch = asyncio.ensure_future(queue.get())
+            await asyncio.wait({get_batch, reader}, return_when=asyncio.FIRST_COMPLETED)
+            if not get_batch.done():
+                # The reader finished (or failed) and nothing is left to analyze
+                get_batch.cancel()
+                if queue.empty():
+                    reader.result()
+                    return
+                batch = queue.get_nowait()
+            else:
+                batch = get_batch.result()
+
+            for output in await _analyze_items(batch, moderation_service):
+                yield json.dumps(output) + "\n"
+    finally:
+        reader.cancel()
+
+
+async def _analyze_items(
+    batch: List[StreamItem], moderation_service: ModerationService
+) -> List[Dict[str, Any]]:
+    texts = [text for _, _, text, _ in batch if text is not None]
+    results: Iterator[Dict[str, Any]] = iter([])
+    analysis_error = None
+    try:
+        if texts:
+            results = iter(await moderation_service.analyze_batch(texts))
+    except OverloadedError as e:
+        analysis_error = str(e)
+    except Exception as e:
+        logger.error("Error in streamed batch analysis: %s", e)
+        analysis_error = "analysis failed"
+
+    outputs = []
+    for index, item_id, text, error in batch:
+        output: Dict[str, Any] = {"index": index}
+        if item_id is not None:
+            output["id"] = item_id
+        if text is None:
+            output["error"] = error
+        elif analysis_error is not None:
+            output["error"] = analysis_error
+        else:
+            output.update(next(results))
+        outputs.append(output)
+    return outputs
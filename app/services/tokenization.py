@@ -0,0 +1,146 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, List, Sequence, Tuple
+import numpy as np
+
+# How scores of a long text's windows are combined into one row
+LONG_TEXT_POLICIES = ("first", "mean", "max_negative")
+
+# Tokenizer init flags that say how it was loaded, not how it tokenizes
+_LOADING_FLAGS = {"is_local", "local_files_only", "trust_remote_code", "use_fast"}
+
+
+def special_token_affixes(tokenizer: Any) -> Tuple[List[int], List[int]]:
+    """
+    Special token ids the tokenizer puts before and after a single sequence,
+    e.g. ``([0], [2])`` for ``<s> ... </s>``. Works out the template from a
+    probe encoding so it doesn't depend on tokenizer-specific helpers.
+    """
+    plain = tokenizer("a", add_special_tokens=False)["input_ids"]
+    wrapped = tokenizer("a", add_special_tokens=True)["input_ids"]
+    for start in range(len(wrapped) - len(plain) + 1):
+        if wrapped[start : start + len(plain)] == plain:
+            return wrapped[:start], wrapped[start + len(plain) :]
+    raise ValueError("Could not locate the sequence in the tokenizer's template")
+
+
+def tokenizer_fingerprint(tokenizer: Any) -> str:
+    """
+    Digest of what decides a tokenizer's output: its class, and either the
+    full definition of a fast tokenizer or the vocabulary files and flags of
+    a slow one. Models fine-tuned from the same base model usually agree on
+    it even though they are loaded from different repos.
+    """
+    digest = hashlib.blake2b(type(tokenizer).__name__.encode(), digest_size=16)
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    if backend is not None:
+        digest.update(backend.to_str().encode())
+    else:
+        for attribute in sorted(getattr(tokenizer, "vocab_files_names", {})):
+            path = getattr(tokenizer, attribute, None)
+            if isinstance(path, str) and Path(path).is_file():
+                digest.update(Path(path).read_bytes())
+        digest.update(json.dumps(tokenizer.get_added_vocab(), sort_keys=True).encode())
+        flags = {
+            name: value
+            for name, value in tokenizer.init_kwargs.items()
+            if isinstance(value, bool) and name not in _LOADING_FLAGS
+        }
+        digest.update(json.dumps(flags, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def chunk_token_ids(
+    token_ids: Sequence[int], window: int, overlap: int
+) -> List[List[int]]:
+    """
+    Split a token sequence into windows of at most ``window`` tokens, each
+    overlapping the previous one by ``overlap`` tokens. Short sequences
+    (including empty ones) give a single window.
+    """
+    if len(token_ids) <= window:
+        return [list(token_ids)]
+    stride = max(1, window - overlap)
+    windows = []
+    for start in range(0, len(token_ids), stride):
+        windows.append(list(token_ids[start : start + window]))
+        if start + window >= len(token_ids):
+            break
+    return windows
+
+
+def bucket_by_length(
+    lengths: Sequence[int], max_batch_size: int, max_batch_tokens: int
+) -> List[List[int]]:
+    """
+    Group sequence indices into batches of similar length so little padding is
+    needed. Each batch has at most ``max_batch_size`` sequences and, once
+    padded to its longest sequence, at most ``max_batch_tokens`` tokens (a
+    single sequence longer than that still gets a batch of its own).
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    for index in order:
+        padded_tokens = lengths[index] * (len(batch) + 1)
+        if batch and (len(batch) >= max_batch_size or padded_tokens > max_batch_tokens):
+            batches.append(batch)
+            batch = []
+        batch.append(index)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def aggregate_windows(
+    scores: np.ndarray, owners: Sequence[int], count: int, policy: str
+) -> np.ndarray:
+    """
+    Combine per-window score rows into one row per text. ``owners[i]`` is the
+    index of the text window ``i`` belongs to; windows of a text are in order.
+    Column 0 is taken to be the negative class.
+    """
+    if policy not in LONG_TEXT_POLICIES:
+        raise ValueError(
+            f"Unknown long text policy {policy!r}, expected one of {LONG_TEXT_POLICIES}"
+        )
+    if len(owners) == count:
+        # One window per text, nothing to combine
+        return scores
+    owners_array = np.asarray(owners)
+
+    result = np.empty((count, scores.shape[1]), dtype=scores.dtype)
+    if policy == "mean":
+        sums = np.zeros((count, scores.shape[1]), dtype=np.float64)
+        np.add.at(sums, owners_array, scores)
+        result[:] = sums / np.bincount(owners_array, minlength=count)[:, None]
+        return result
+
+    chosen = np.full(count, -1)
+    for window, owner in enumerate(owners):
+        current = chosen[owner]
+        if current == -1:
+            chosen[owner] = window
+        elif policy == "max_negative" and scores[window, 0] > scores[current, 0]:
+            chosen[owner] = window
+    return scores[chosen]
+
+
+def windows_for_texts(
+    token_ids: Sequence[Sequence[int]], window: int, overlap: int, policy: str
+) -> Tuple[List[List[int]], List[int]]:
+    """
+    Chunk every text into windows. Returns the windows and, for each window,
+    the index of the text it came from. With the ``first`` policy only the
+    first window of each text is kept, which matches plain truncation.
+    """
+    windows: List[List[int]] = []
+    owners: List[int] = []
+    for owner, ids in enumerate(token_ids):
+        chunks = chunk_token_ids(ids, window, overlap)
+        if policy == "first":
+            chunks = chunks[:1]
+        windows.extend(chunks)
+        owners.extend([owner] * len(chunks))
+    return windows, owners
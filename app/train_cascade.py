@@ -0,0 +1,84 @@
+"""
+Train the small hashed n-gram model that answers first in the cascade.
+
+Usage:
+    python -m app.train_cascade train.jsonl --output models/cascade.npz
+    python -m app.train_cascade comments.jsonl --output models/cascade.npz --distill
+
+Input lines are {"text": ..., "label": ...} objects with labels "negative",
+"neutral" or "positive" (or 0-2). With --distill the model is fit to the full
+model's scores instead of the labels, so unlabeled text can be used and the
+small model learns to agree with the one it stands in for. A held-out split
+reports accuracy and how many texts clear CASCADE_CONFIDENCE_THRESHOLD.
+"""
+
+import argparse
+import logging
+import sys
+import numpy as np
+from app.core.config import get_settings
+from app.services.cascade import HashedNGramModel, read_labeled
+from app.services.sentiment import SENTIMENT_CLASSES
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("input", help="JSONL file")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--distill", action="store_true")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--label-field", default="label")
+    parser.add_argument("--feature-bits", type=int, default=18)
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--learning-rate", type=float, default=0.5)
+    parser.add_argument("--holdout", type=float, default=0.1)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    texts, labels = read_labeled(args.input, args.text_field, args.label_field)
+    if args.distill:
+        from app.services.sentiment import SentimentAnalyzer
+
+        logger.info(f"Scoring {len(texts)} texts with the full model")
+        targets = SentimentAnalyzer().predict_scores(texts)
+    else:
+        labeled = [
+            (text, label) for text, label in zip(texts, labels) if label is not None
+        ]
+        if not labeled:
+            sys.exit("No labeled lines; pass --distill to learn from the full model")
+        texts = [text for text, _ in labeled]
+        classes = np.array([label for _, label in labeled], dtype=np.int64)
+        targets = np.eye(len(SENTIMENT_CLASSES), dtype=np.float32)[classes]
+
+    order = np.random.default_rng(0).permutation(len(texts))
+    split = len(texts) - int(len(texts) * args.holdout)
+    train, holdout = order[:split], order[split:]
+    logger.info(f"Training on {len(train)} texts, holding out {len(holdout)}")
+    model = HashedNGramModel.train(
+        [texts[i] for i in train],
+        targets[train],
+        n_features=2**args.feature_bits,
+        epochs=args.epochs,
+        learning_rate=args.learning_rate,
+    )
+    model.save(args.output)
+    logger.info(f"Saved model to {args.output}")
+
+    if len(holdout):
+        scores = model.predict_proba([texts[i] for i in holdout])
+        correct = scores.argmax(axis=1) == targets[holdout].argmax(axis=1)
+        confident = scores.max(axis=1) >= settings.CASCADE_CONFIDENCE_THRESHOLD
+        logger.info(
+            f"Held-out accuracy {correct.mean():.3f}; "
+            f"{confident.mean():.1%} of texts clear the "
+            f"{settings.CASCADE_CONFIDENCE_THRESHOLD} threshold, "
+            f"with accuracy {correct[confident].mean() if confident.any() else 0:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
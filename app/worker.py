@@ -0,0 +1,78 @@
+"""
+Run queued moderation jobs from Redis.
+
+Usage:
+    python -m app.worker
+    python -m app.worker --batch-size 1024 --poll-timeout 5
+
+Workers take jobs from the high, normal and low lanes in that order and
+combine small jobs into batches of up to --batch-size texts. They run at
+JOB_WORKER_NICE so API processes sharing the host get the CPU first; run as
+many as there are spare cores. SIGTERM and SIGINT let the current batch
+finish before exiting. A job taken by a worker that dies stays "running"
+until it expires.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import redis.asyncio as redis
+from app.core.config import get_settings
+from app.services.cache import close_redis_pool
+from app.services.jobs import JobRunner, RedisJobQueue, bulk_moderation_service
+from app.services.registry import get_model_registry
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+async def run(batch_size: int, poll_timeout: float) -> None:
+    registry = get_model_registry()
+    await asyncio.to_thread(registry.load, warmup=settings.MODEL_WARMUP)
+
+    # The shared pool's socket timeout is shorter than a BLPOP, so the queue
+    # gets a client of its own
+    queue_client = redis.Redis.from_url(
+        settings.REDIS_URL,
+        socket_timeout=poll_timeout + settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+    )
+    runner = JobRunner(RedisJobQueue(queue_client), bulk_moderation_service, batch_size)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+
+    logger.info(f"Worker {os.getpid()} waiting for jobs")
+    try:
+        await runner.run(stop, poll_timeout)
+    finally:
+        await runner.aclose()
+        await queue_client.aclose()
+        await registry.aclose()
+        await close_redis_pool()
+    logger.info(f"Worker {os.getpid()} stopped")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=settings.JOB_BATCH_SIZE)
+    parser.add_argument(
+        "--poll-timeout",
+        type=float,
+        default=1.0,
+        help="Seconds to wait for a job before checking for shutdown",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if settings.JOB_WORKER_NICE:
+        os.nice(settings.JOB_WORKER_NICE)
+    asyncio.run(run(args.batch_size, args.poll_timeout))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+SentimentAnalyzer throughput, one text at a time against batched, for
+different text-length distributions.
+
+Usage:
+    python -m benchmarks.bench_analyzer --texts 256 --batch-sizes 8 32
+    python -m benchmarks.bench_analyzer --distributions short long
+"""
+
+import argparse
+import json
+import random
+import time
+from typing import Any, Callable, Dict, List
+from app.services.sentiment import SentimentAnalyzer
+from benchmarks.stats import git_commit, latency_summary
+
+WORDS = (
+    "the product service support team really very quite good bad great awful "
+    "love hate today delivery price quality would recommend never again"
+).split()
+
+# Word counts per text for each distribution
+DISTRIBUTIONS: Dict[str, Callable[[random.Random], int]] = {
+    "short": lambda rng: rng.randint(3, 15),
+    "medium": lambda rng: rng.randint(30, 80),
+    "long": lambda rng: rng.randint(300, 600),
+    # Mostly short comments with a long tail, like real traffic
+    "mixed": lambda rng: min(600, int(rng.paretovariate(1.2) * 8)),
+}
+
+
+def make_texts(distribution: str, count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    length = DISTRIBUTIONS[distribution]
+    return [
+        " ".join(rng.choice(WORDS) for _ in range(length(rng))) for _ in range(count)
+    ]
+
+
+def run_single(analyzer: SentimentAnalyzer, texts: List[str]) -> Dict[str, Any]:
+    latencies = []
+    started = time.perf_counter()
+    for text in texts:
+        text_started = time.perf_counter()
+        analyzer.analyze_sentiment(text)
+        latencies.append(time.perf_counter() - text_started)
+    elapsed = time.perf_counter() - started
+    summary = latency_summary(latencies, elapsed)
+    return {
+        "texts_per_second": summary["requests_per_second"],
+        "p50_ms": summary["p50_ms"],
+        "p99_ms": summary["p99_ms"],
+    }
+
+
+def run_batched(
+    analyzer: SentimentAnalyzer, texts: List[str], batch_size: int
+) -> Dict[str, Any]:
+    started = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        analyzer.analyze_batch(texts[i : i + batch_size], batch_size)
+    elapsed = time.perf_counter() - started
+    return {"texts_per_second": round(len(texts) / elapsed, 2)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--texts", type=int, default=256)
+    parser.add_argument(
+        "--distributions",
+        nargs="+",
+        choices=list(DISTRIBUTIONS),
+        default=list(DISTRIBUTIONS),
+    )
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32])
+    args = parser.parse_args()
+
+    analyzer = SentimentAnalyzer()
+    analyzer.analyze_sentiment("warm up")
+    commit = git_commit()
+
+    for distribution in args.distributions:
+        texts = make_texts(distribution, args.texts)
+        tokens = sum(
+            len(ids) for ids in analyzer.tokenizer(texts, verbose=False)["input_ids"]
+        )
+        common = {
+            "commit": commit,
+            "distribution": distribution,
+            "texts": len(texts),
+            "mean_tokens": round(tokens / len(texts), 1),
+        }
+        print(json.dumps({**common, "mode": "single", **run_single(analyzer, texts)}))
+        for batch_size in args.batch_sizes:
+            result = run_batched(analyzer, texts, batch_size)
+            print(
+                json.dumps(
+                    {**common, "mode": f"batched_{batch_size}", **result},
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Cost of checking an API key against the in-memory key index.
+
+Usage:
+    python -m benchmarks.bench_auth --keys 10000 --operations 200000
+"""
+
+import argparse
+import json
+import secrets
+import time
+from app.core.security import ApiKeyIndex
+from benchmarks.stats import git_commit
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--keys", type=int, default=10000)
+    parser.add_argument("--operations", type=int, default=200000)
+    args = parser.parse_args()
+
+    keys = [secrets.token_urlsafe(32) for _ in range(args.keys)]
+    index = ApiKeyIndex({key: f"tenant-{i}" for i, key in enumerate(keys)})
+    unknown = [secrets.token_urlsafe(32) for _ in range(100)]
+
+    print(json.dumps({"commit": git_commit(), "keys": len(index)}))
+    for name, candidates in (("lookup_valid", keys), ("lookup_invalid", unknown)):
+        started = time.perf_counter()
+        for i in range(args.operations):
+            index.lookup(candidates[i % len(candidates)])
+        elapsed = time.perf_counter() - started
+        print(
+            json.dumps(
+                {
+                    "benchmark": name,
+                    "operations": args.operations,
+                    "ops_per_second": round(args.operations / elapsed, 1),
+                    "per_op_us": round(elapsed / args.operations * 1e6, 3),
+                }
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
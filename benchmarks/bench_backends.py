@@ -0,0 +1,98 @@
+"""
+Compare inference backends on latency, throughput and resident memory.
+
+Each backend is measured in a fresh process so RSS numbers don't mix.
+
+Usage:
+    python -m benchmarks.bench_backends --backends torch torch-int8 onnx
+"""
+
+import argparse
+import json
+import multiprocessing
+import resource
+import time
+from typing import Any, Dict, List
+from app.services.sentiment import SentimentAnalyzer
+
+SAMPLE_TEXTS = [
+    "I love this product! It's amazing!",
+    "I hate this product! It's terrible!",
+    "Today is Sunday",
+    "This is a test sentence with multiple words.",
+]
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process in MB."""
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * resource.getpagesize() / 2**20
+    except OSError:
+        # ru_maxrss is the peak, in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(backend: str, iterations: int, batch_size: int) -> Dict[str, Any]:
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    analyzer = SentimentAnalyzer(backend=backend)
+    load_seconds = time.perf_counter() - started
+    analyzer.predict_scores(SAMPLE_TEXTS)  # warm up
+
+    latencies: List[float] = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        analyzer.predict_scores([SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]])
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+
+    batch = [SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)] for i in range(batch_size)]
+    started = time.perf_counter()
+    for _ in range(max(1, iterations // batch_size)):
+        analyzer.predict_scores(batch)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 2),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+        "batched_texts_per_second": round(
+            max(1, iterations // batch_size) * batch_size / elapsed, 1
+        ),
+        "rss_mb": round(rss_mb(), 1),
+        "model_rss_mb": round(rss_mb() - rss_before, 1),
+    }
+
+
+def _worker(backend: str, iterations: int, batch_size: int, queue) -> None:
+    queue.put(measure(backend, iterations, batch_size))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--backends", nargs="+", default=["torch", "torch-int8", "onnx"]
+    )
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    for backend in args.backends:
+        queue = context.Queue()
+        process = context.Process(
+            target=_worker, args=(backend, args.iterations, args.batch_size, queue)
+        )
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            print(json.dumps({"backend": backend, "error": process.exitcode}))
+            continue
+        print(json.dumps(queue.get()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Throughput of the dynamic batching scheduler against batch size and wait time.
+
+Usage:
+    python -m benchmarks.bench_batching --requests 256 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+from app.core.timing import StageTimings, add_stage_observer, remove_stage_observer
+from app.services.batching import BatchScheduler
+from app.services.sentiment import SentimentAnalyzer
+
+SAMPLE_TEXTS = [
+    "I love this product! It's amazing!",
+    "I hate this product! It's terrible!",
+    "Today is Sunday",
+    "This is a test sentence with multiple words.",
+]
+
+
+async def run_scenario(
+    analyzer: SentimentAnalyzer,
+    max_batch_size: int,
+    max_wait_ms: float,
+    requests: int,
+    concurrency: int,
+) -> Dict[str, Any]:
+    scheduler = BatchScheduler(analyzer.predict_scores, max_batch_size, max_wait_ms)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    timings = StageTimings()
+    add_stage_observer(timings)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await scheduler.submit(SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)])
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    await scheduler.close()
+    remove_stage_observer(timings)
+
+    latencies.sort()
+    return {
+        "max_batch_size": max_batch_size,
+        "max_wait_ms": max_wait_ms,
+        "requests_per_second": round(requests / elapsed, 2),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+        "stages": timings.as_dict(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 16, 32])
+    parser.add_argument("--wait-ms", type=float, nargs="+", default=[0, 2, 5, 10])
+    args = parser.parse_args()
+
+    analyzer = SentimentAnalyzer()
+    analyzer.analyze_sentiment(SAMPLE_TEXTS[0])  # warm up
+
+    for batch_size in args.batch_sizes:
+        for wait_ms in args.wait_ms:
+            result = asyncio.run(
+                run_scenario(
+                    analyzer, batch_size, wait_ms, args.requests, args.concurrency
+                )
+            )
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+CacheService round trips and cache key hashing.
+
+Runs against an in-process fakeredis by default, so it measures our own
+overhead (serialization, L1, pipelining) rather than the network. Pass
+--redis-url to measure against a real server; the selected database is
+flushed, so point it at a scratch database.
+
+Usage:
+    python -m benchmarks.bench_cache --operations 5000
+    python -m benchmarks.bench_cache --redis-url redis://localhost:6379/15
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+import redis.asyncio as redis
+from app.core.config import get_settings
+from app.services.cache import CacheService, LRUCache
+from app.services.keys import make_cache_key, normalize_text
+from app.services.results import AnalysisResult
+from benchmarks.stats import git_commit
+
+settings = get_settings()
+
+RESULT = AnalysisResult(
+    sentiment_score=0.42,
+    sentiment="positive",
+    confidence=0.87,
+    dominant_emotion="joy",
+    negative=0.05,
+    neutral=0.08,
+    positive=0.87,
+)
+
+KEY_TEXTS = {
+    "short": "Great product, would buy again!",
+    "long": "This is a long review that keeps going. " * 50,
+}
+
+
+def report(name: str, operations: int, elapsed: float, **extra: Any) -> None:
+    print(
+        json.dumps(
+            {
+                "benchmark": name,
+                "operations": operations,
+                "ops_per_second": round(operations / elapsed, 1),
+                "per_op_us": round(elapsed / operations * 1e6, 2),
+                **extra,
+            }
+        )
+    )
+
+
+async def timed(
+    name: str, operations: int, operation: Callable[[int], Awaitable[Any]]
+) -> None:
+    started = time.perf_counter()
+    for i in range(operations):
+        await operation(i)
+    report(name, operations, time.perf_counter() - started)
+
+
+async def run_cache(redis_url: Optional[str], operations: int, batch: int) -> None:
+    if redis_url:
+        client = redis.Redis.from_url(redis_url)
+    else:
+        from fakeredis import FakeAsyncRedis
+
+        client = FakeAsyncRedis()
+    await client.flushdb()
+
+    # Redis only, and Redis behind an L1 cache
+    remote = CacheService(client)
+    remote.local_cache = None
+    local = CacheService(client, LRUCache(max_items=operations, ttl=300))
+    keys = [f"bench:{i}" for i in range(operations)]
+    decoder: Callable[[Dict[str, Any]], AnalysisResult] = AnalysisResult.from_dict
+
+    await timed("set", operations, lambda i: remote.set(keys[i], RESULT))
+    await timed("get_redis_hit", operations, lambda i: remote.get(keys[i], decoder))
+    await timed("get_miss", operations, lambda i: remote.get(f"missing:{i}", decoder))
+    await timed("get_l1_hit", operations, lambda i: local.get(keys[0], decoder))
+
+    batches = max(1, operations // batch)
+    started = time.perf_counter()
+    for i in range(batches):
+        chunk = keys[(i * batch) % operations :][:batch]
+        await remote.set_many({key: RESULT for key in chunk})
+    report("set_many", batches, time.perf_counter() - started, batch=batch)
+
+    started = time.perf_counter()
+    for i in range(batches):
+        chunk = keys[(i * batch) % operations :][:batch]
+        await remote.get_many(chunk, decoder)
+    report("get_many", batches, time.perf_counter() - started, batch=batch)
+
+    await client.flushdb()
+    await client.aclose()
+
+
+def run_keys(operations: int) -> None:
+    for name, text in KEY_TEXTS.items():
+        started = time.perf_counter()
+        for _ in range(operations):
+            normalize_text(text)
+        report(f"normalize_{name}", operations, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for _ in range(operations):
+            make_cache_key(text, settings.SENTIMENT_MODEL_NAME)
+        report(f"make_cache_key_{name}", operations, time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--redis-url", help="Defaults to an in-process fakeredis")
+    parser.add_argument("--operations", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=100)
+    args = parser.parse_args()
+
+    print(json.dumps({"commit": git_commit(), "redis": args.redis_url or "fakeredis"}))
+    asyncio.run(run_cache(args.redis_url, args.operations, args.batch))
+    run_keys(args.operations * 10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Accuracy and throughput of the cascade (small model first, full model for
+texts it is unsure of) against the full model alone, on a labeled JSONL file
+of {"text": ..., "label": ...} lines.
+
+Usage:
+    python -m benchmarks.bench_cascade labeled.jsonl --model models/cascade.npz
+    python -m benchmarks.bench_cascade labeled.jsonl --model models/cascade.npz \\
+        --thresholds 0.8 0.9 0.95 --batch-size 32
+
+Accuracy is measured on lines with a label; agreement, with the full model's
+prediction, on every line.
+"""
+
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from app.services.cascade import HashedNGramModel, read_labeled
+from app.services.sentiment import SentimentAnalyzer
+from benchmarks.stats import git_commit
+
+
+def timed_scores(
+    analyzer: SentimentAnalyzer, texts: List[str], batch_size: int
+) -> Tuple[np.ndarray, float]:
+    started = time.perf_counter()
+    scores = [
+        analyzer.predict_scores(texts[i : i + batch_size], batch_size)
+        for i in range(0, len(texts), batch_size)
+    ]
+    elapsed = time.perf_counter() - started
+    return np.concatenate(scores) if scores else np.empty((0, 3)), elapsed
+
+
+def quality(
+    predicted: np.ndarray, labels: List[Any], full: np.ndarray
+) -> Dict[str, Any]:
+    labeled = [i for i, label in enumerate(labels) if label is not None]
+    accuracy = (
+        float((predicted[labeled] == np.array([labels[i] for i in labeled])).mean())
+        if labeled
+        else None
+    )
+    return {
+        "accuracy": round(accuracy, 4) if accuracy is not None else None,
+        "agreement": round(float((predicted == full).mean()), 4),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("input", help="Labeled JSONL file")
+    parser.add_argument("--model", required=True, help="Cascade model (.npz)")
+    parser.add_argument(
+        "--thresholds", type=float, nargs="+", default=[0.7, 0.8, 0.9, 0.95]
+    )
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    texts, labels = read_labeled(args.input)
+    small = HashedNGramModel.load(args.model)
+    analyzer = SentimentAnalyzer()
+    analyzer.analyze_sentiment("warm up")
+
+    full_scores, full_seconds = timed_scores(analyzer, texts, args.batch_size)
+    full = full_scores.argmax(axis=1)
+    full_quality = quality(full, labels, full)
+    full_rate = len(texts) / full_seconds
+    print(
+        json.dumps(
+            {
+                "commit": git_commit(),
+                "texts": len(texts),
+                "labeled": sum(label is not None for label in labels),
+            }
+        )
+    )
+    print(
+        json.dumps(
+            {
+                "benchmark": "full",
+                **full_quality,
+                "texts_per_second": round(full_rate, 1),
+            }
+        )
+    )
+
+    started = time.perf_counter()
+    small_scores = small.predict_proba(texts)
+    small_seconds = time.perf_counter() - started
+
+    for threshold in args.thresholds:
+        escalated = np.flatnonzero(small_scores.max(axis=1) < threshold)
+        escalated_scores, escalated_seconds = timed_scores(
+            analyzer, [texts[i] for i in escalated], args.batch_size
+        )
+        predicted = small_scores.argmax(axis=1)
+        if len(escalated):
+            predicted[escalated] = escalated_scores.argmax(axis=1)
+        cascade_quality = quality(predicted, labels, full)
+        rate = len(texts) / (small_seconds + escalated_seconds)
+        accuracy_delta = (
+            round(cascade_quality["accuracy"] - full_quality["accuracy"], 4)
+            if full_quality["accuracy"] is not None
+            else None
+        )
+        print(
+            json.dumps(
+                {
+                    "benchmark": "cascade",
+                    "threshold": threshold,
+                    "escalated_fraction": round(len(escalated) / len(texts), 4),
+                    **cascade_quality,
+                    "accuracy_delta": accuracy_delta,
+                    "texts_per_second": round(rate, 1),
+                    "speedup": round(rate / full_rate, 2),
+                    "small_us_per_text": round(small_seconds / len(texts) * 1e6, 1),
+                }
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Cost of the lexicon pre-filter per MB of text.
+
+Usage:
+    python -m benchmarks.bench_lexicon --megabytes 10
+"""
+
+import argparse
+import json
+import random
+import time
+from app.core.config import get_settings
+from app.services.lexicon import get_lexicon_matcher
+
+settings = get_settings()
+
+FILLER_WORDS = "the a this that product service today really very quite".split()
+
+
+def make_texts(megabytes: float, text_words: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    vocabulary = (
+        FILLER_WORDS * 10
+        + settings.POSITIVE_WORDS
+        + settings.NEGATIVE_WORDS
+        + settings.TOXIC_WORDS
+    )
+    texts, size = [], 0
+    while size < megabytes * 2**20:
+        text = " ".join(rng.choice(vocabulary) for _ in range(text_words))
+        texts.append(text)
+        size += len(text.encode())
+    return texts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--megabytes", type=float, default=10)
+    parser.add_argument("--text-words", type=int, default=30)
+    args = parser.parse_args()
+
+    matcher = get_lexicon_matcher()
+    texts = make_texts(args.megabytes, args.text_words)
+    megabytes = sum(len(text.encode()) for text in texts) / 2**20
+
+    started = time.perf_counter()
+    short_circuited = sum(
+        matcher.short_circuit_scores(text) is not None for text in texts
+    )
+    elapsed = time.perf_counter() - started
+
+    print(
+        json.dumps(
+            {
+                "megabytes": round(megabytes, 2),
+                "texts": len(texts),
+                "seconds_per_mb": round(elapsed / megabytes, 4),
+                "megabytes_per_second": round(megabytes / elapsed, 2),
+                "microseconds_per_text": round(elapsed / len(texts) * 1e6, 2),
+                "short_circuited": short_circuited,
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+How many model runs exact cache keys and the near-duplicate index would save
+on a stream of texts, and what a lookup costs.
+
+Texts are replayed in order against an empty cache: a text hits if an
+earlier text had the same cache key (exact) or a fingerprint within the
+distance (near); every other text counts as a model run and is indexed.
+
+Usage:
+    python -m benchmarks.bench_near_duplicates comments.jsonl --distances 0 3 6
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from app.batch import iter_records
+from app.core.config import get_settings
+from app.services.keys import make_cache_key
+from app.services.near_duplicates import NearDuplicateIndex, fingerprint
+from benchmarks.stats import git_commit
+
+settings = get_settings()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("input", type=Path, help="JSONL or CSV file")
+    parser.add_argument("--distances", type=int, nargs="+", default=[0, 3, 6])
+    parser.add_argument("--text-field", default="text")
+    args = parser.parse_args()
+
+    texts = [
+        text
+        for _, text in iter_records(args.input, args.text_field, "id")
+        if text is not None
+    ]
+    print(json.dumps({"commit": git_commit(), "texts": len(texts)}))
+
+    for distance in args.distances:
+        index = NearDuplicateIndex(len(texts) + 1, distance)
+        seen = set()
+        exact = near = 0
+        started = time.perf_counter()
+        for text in texts:
+            key = make_cache_key(text, settings.SENTIMENT_MODEL_NAME)
+            if key in seen:
+                exact += 1
+                continue
+            text_fingerprint = fingerprint(text)
+            if text_fingerprint is not None:
+                if index.find(text_fingerprint) is not None:
+                    near += 1
+                    continue
+                index.add(text_fingerprint, key)
+            seen.add(key)
+        elapsed = time.perf_counter() - started
+        print(
+            json.dumps(
+                {
+                    "benchmark": "near_duplicates",
+                    "max_distance": distance,
+                    "exact_hit_rate": round(exact / len(texts), 4),
+                    "near_hit_rate": round(near / len(texts), 4),
+                    "model_runs_saved": exact + near,
+                    "per_text_us": round(elapsed / len(texts) * 1e6, 1),
+                }
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Per-request overhead of the rate limiter in each mode.
+
+Runs against an in-process fakeredis by default; pass --redis-url to include
+a real network round trip in redis mode (the keys used are deleted
+afterwards). Prints the p50/p99 time of one check in microseconds.
+
+Usage:
+    python -m benchmarks.bench_rate_limit --operations 20000
+    python -m benchmarks.bench_rate_limit --redis-url redis://localhost:6379/15
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import List, Optional
+import redis.asyncio as redis
+from app.services.rate_limit import RATE_LIMIT_MODES, RateLimiter
+from benchmarks.stats import git_commit, percentile
+
+
+async def run_mode(
+    client: redis.Redis, mode: str, operations: int, clients: int
+) -> None:
+    # A bucket large enough that every check is allowed
+    limiter = RateLimiter(
+        per_minute=operations,
+        capacity=operations,
+        mode=mode,
+        sync_interval=1.0,
+        redis_client=client,
+    )
+    ids = [f"bench-tenant-{i}" for i in range(clients)]
+    timings: List[float] = []
+    started = time.perf_counter()
+    for i in range(operations):
+        check_started = time.perf_counter()
+        await limiter.hit(ids[i % clients])
+        timings.append(time.perf_counter() - check_started)
+    elapsed = time.perf_counter() - started
+    timings.sort()
+
+    print(
+        json.dumps(
+            {
+                "benchmark": f"rate_limit_{mode}",
+                "operations": operations,
+                "clients": clients,
+                "ops_per_second": round(operations / elapsed, 1),
+                "p50_us": round(percentile(timings, 0.50) * 1e6, 2),
+                "p99_us": round(percentile(timings, 0.99) * 1e6, 2),
+            }
+        )
+    )
+    await client.delete(*(f"ratelimit:{id_}" for id_ in ids))
+
+
+async def run(redis_url: Optional[str], operations: int, clients: int) -> None:
+    if redis_url:
+        client = redis.Redis.from_url(redis_url)
+    else:
+        from fakeredis import FakeAsyncRedis
+
+        client = FakeAsyncRedis()
+    # Fail here rather than silently measure the local fallback
+    await client.ping()
+    for mode in RATE_LIMIT_MODES:
+        await run_mode(client, mode, operations, clients)
+    await client.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--redis-url", help="Defaults to an in-process fakeredis")
+    parser.add_argument("--operations", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=100)
+    args = parser.parse_args()
+
+    print(json.dumps({"commit": git_commit(), "redis": args.redis_url or "fakeredis"}))
+    asyncio.run(run(args.redis_url, args.operations, args.clients))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Measure per-worker memory of a multi-worker gunicorn deployment.
+
+Starts gunicorn with gunicorn.conf.py, once with the models preloaded in the
+master and once with every worker loading its own copy, waits until all
+workers report ready, sends a few requests so each worker has run inference,
+and reads each worker's memory from /proc/<pid>/smaps_rollup (Linux only).
+
+RSS counts every page a worker maps, including pages shared with the master
+and the other workers, so it looks the same in both modes. PSS divides shared
+pages between the processes sharing them, and private memory is what a worker
+holds alone; these are the numbers that show what each extra worker costs.
+
+Usage:
+    python -m benchmarks.bench_workers --workers 4
+    python -m benchmarks.bench_workers --workers 4 --modes preload
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+import httpx
+from app.core.config import get_settings
+
+settings = get_settings()
+
+CONFIG = Path(__file__).resolve().parent.parent / "gunicorn.conf.py"
+MODES = {"preload": "true", "per-worker": "false"}
+
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    """RSS, PSS and private memory of a process in MB."""
+    fields: Dict[str, float] = {}
+    with open(f"/proc/{pid}/smaps_rollup") as rollup:
+        for line in rollup:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": round(fields["Rss"], 1),
+        "pss_mb": round(fields["Pss"], 1),
+        "private_mb": round(fields["Private_Clean"] + fields["Private_Dirty"], 1),
+    }
+
+
+def child_pids(pid: int) -> List[int]:
+    with open(f"/proc/{pid}/task/{pid}/children") as children:
+        return [int(child) for child in children.read().split()]
+
+
+def wait_ready(base_url: str, workers: int, timeout: float) -> None:
+    # Requests land on whichever worker accepts first, so keep polling until
+    # enough consecutive ones succeed that every worker is likely up
+    deadline = time.monotonic() + timeout
+    successes = 0
+    while successes < workers * 4:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Workers not ready after {timeout:.0f}s")
+        try:
+            response = httpx.get(f"{base_url}/api/v1/ready", timeout=5)
+            successes = successes + 1 if response.status_code == 200 else 0
+        except httpx.HTTPError:
+            successes = 0
+            time.sleep(0.5)
+
+
+def measure(mode: str, workers: int, port: int, timeout: float) -> Dict[str, Any]:
+    env = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(workers),
+        "BIND": f"127.0.0.1:{port}",
+        "PRELOAD_MODELS": MODES[mode],
+        "LOG_SINK": "none",
+    }
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", str(CONFIG), "app.main:app"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(base_url, workers, timeout)
+        ready_seconds = time.perf_counter() - started
+        headers = {settings.API_KEY_NAME: settings.API_KEY}
+        for i in range(workers * 8):
+            httpx.post(
+                f"{base_url}/api/v1/analyze",
+                json={"text": f"Measuring worker memory {i}"},
+                headers=headers,
+                timeout=30,
+            )
+
+        master = memory_mb(server.pid)
+        per_worker = [memory_mb(pid) for pid in child_pids(server.pid)]
+        total_pss = master["pss_mb"] + sum(worker["pss_mb"] for worker in per_worker)
+        return {
+            "mode": mode,
+            "workers": len(per_worker),
+            "ready_seconds": round(ready_seconds, 1),
+            "master": master,
+            "per_worker": per_worker,
+            "total_pss_mb": round(total_pss, 1),
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    for mode in args.modes:
+        print(json.dumps(measure(mode, args.workers, args.port, args.timeout)))
+
+
+if __name__ == "__main__":
+    main()
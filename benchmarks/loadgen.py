@@ -0,0 +1,176 @@
+"""
+Load generator for the analyze endpoint.
+
+Drives the FastAPI app in-process (through httpx's ASGI transport, with the
+application lifespan) or a running server with --url, at a fixed concurrency
+and cache hit-rate mix, and prints a JSON summary with p50/p95/p99 latency and
+requests per second. Save a run with --output and pass it to a later run as
+--baseline to see the change between commits.
+
+Usage:
+    python -m benchmarks.loadgen --requests 2000 --concurrency 32 --hit-rate 0.8
+    python -m benchmarks.loadgen --url http://localhost:8000 --duration 30
+    python -m benchmarks.loadgen --output before.json
+    python -m benchmarks.loadgen --baseline before.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from contextlib import AsyncExitStack
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import httpx
+from app.core.config import get_settings
+from benchmarks.bench_analyzer import DISTRIBUTIONS, make_texts
+from benchmarks.stats import compare, git_commit, latency_summary
+
+settings = get_settings()
+
+ENDPOINT = "/api/v1/analyze"
+
+
+class TextMix:
+    """
+    Texts for each request: a ``hit_rate`` share of requests reuse a small set
+    of hot texts, which are in the cache after warm-up, and the rest are texts
+    never seen before.
+    """
+
+    def __init__(self, hit_rate: float, hot_texts: int, distribution: str, seed: int):
+        self.hit_rate = hit_rate
+        self.rng = random.Random(seed)
+        self.hot = make_texts(distribution, hot_texts, seed)
+        self.cold = make_texts(distribution, 1000, seed + 1)
+        self.sequence = 0
+
+    def next(self) -> str:
+        if self.rng.random() < self.hit_rate:
+            return self.rng.choice(self.hot)
+        # Make every cold text unique so it always misses the cache
+        self.sequence += 1
+        return f"{self.rng.choice(self.cold)} #{self.sequence} {time.time_ns()}"
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    mix: TextMix,
+    concurrency: int,
+    requests: Optional[int],
+    duration: Optional[float],
+) -> Dict[str, Any]:
+    headers = {settings.API_KEY_NAME: settings.API_KEY}
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    deadline = time.perf_counter() + duration if duration else None
+    remaining = requests
+
+    def should_continue() -> bool:
+        nonlocal remaining
+        if deadline is not None:
+            return time.perf_counter() < deadline
+        assert remaining is not None
+        remaining -= 1
+        return remaining >= 0
+
+    async def worker() -> None:
+        while should_continue():
+            started = time.perf_counter()
+            try:
+                response = await client.post(
+                    ENDPOINT, json={"text": mix.next()}, headers=headers
+                )
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {**latency_summary(latencies, elapsed), "statuses": dict(statuses)}
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    mix = TextMix(args.hit_rate, args.hot_texts, args.distribution, args.seed)
+    async with AsyncExitStack() as stack:
+        if args.url:
+            transport: httpx.AsyncBaseTransport = httpx.AsyncHTTPTransport()
+            base_url = args.url
+        else:
+            # All requests share one API key, so measure the service rather
+            # than that key's rate limit unless asked
+            settings.RATE_LIMIT_ENABLED = args.rate_limit
+            from app.main import app
+
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            transport = httpx.ASGITransport(app=app)
+            base_url = "http://loadgen"
+        client = await stack.enter_async_context(
+            httpx.AsyncClient(
+                transport=transport,
+                base_url=base_url,
+                timeout=args.timeout,
+                limits=httpx.Limits(max_connections=args.concurrency),
+            )
+        )
+
+        # Put the hot texts in the cache so they are hits during the run
+        for text in mix.hot:
+            await client.post(
+                ENDPOINT,
+                json={"text": text},
+                headers={settings.API_KEY_NAME: settings.API_KEY},
+            )
+        summary = await run_load(
+            client, mix, args.concurrency, args.requests, args.duration
+        )
+
+    return {
+        "commit": git_commit(),
+        "target": args.url or "in-process",
+        "concurrency": args.concurrency,
+        "hit_rate": args.hit_rate,
+        "distribution": args.distribution,
+        **summary,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", help="Base URL of a running server")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--duration", type=float, help="Seconds; overrides --requests")
+    parser.add_argument(
+        "--hit-rate", type=float, default=0.5, help="Share of cache hits (0-1)"
+    )
+    parser.add_argument("--hot-texts", type=int, default=50)
+    parser.add_argument("--distribution", choices=list(DISTRIBUTIONS), default="mixed")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--rate-limit",
+        action="store_true",
+        help="Keep per-key rate limiting on for in-process runs",
+    )
+    parser.add_argument("--output", type=Path, help="Also write the summary here")
+    parser.add_argument("--baseline", type=Path, help="Summary of an earlier run")
+    args = parser.parse_args()
+
+    result = asyncio.run(main_async(args))
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        result["baseline_commit"] = baseline.get("commit")
+        result["change_percent"] = compare(baseline, result)
+    print(json.dumps(result))
+    if args.output:
+        args.output.write_text(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Helpers shared by the benchmarks for summarizing and comparing runs."""
+
+import math
+import subprocess
+from typing import Any, Dict, List, Sequence
+
+# Metrics compared between runs, by whether a higher value is better
+HIGHER_IS_BETTER = ("requests_per_second", "ops_per_second", "texts_per_second")
+LOWER_IS_BETTER_SUFFIXES = ("_ms", "_us")
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(fraction * len(sorted_values)) - 1
+    return sorted_values[max(0, min(len(sorted_values) - 1, rank))]
+
+
+def latency_summary(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """Summarize per-request latencies in seconds over a run of ``elapsed``."""
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+def git_commit() -> str:
+    """Short hash of the checked out commit, so results can be compared."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Percentage change of every numeric metric from ``baseline`` to
+    ``current``, signed so that positive always means better.
+    """
+    changes = {}
+    for key, value in current.items():
+        higher_is_better = key in HIGHER_IS_BETTER
+        if not higher_is_better and not key.endswith(LOWER_IS_BETTER_SUFFIXES):
+            continue
+        before = baseline.get(key)
+        if isinstance(value, (int, float)) and isinstance(before, (int, float)):
+            if before:
+                change = (value - before) / before * 100
+                changes[key] = round(change if higher_is_better else -change, 1)
+    return changes
@@ -0,0 +1,59 @@
+"""
+Gunicorn configuration for running several uvicorn workers per node.
+
+With PRELOAD_MODELS (default on), the models are loaded once in the master
+process before the workers are forked. The weights are then shared
+copy-on-write by every worker instead of each worker holding its own copy, so
+adding workers costs little extra memory. See the README for measurements.
+
+Usage:
+    WEB_CONCURRENCY=4 gunicorn -c gunicorn.conf.py app.main:app
+"""
+
+import gc
+import logging
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn_worker.UvicornWorker"
+# Import the app in the master so workers inherit it rather than re-importing
+preload_app = True
+timeout = int(os.getenv("WORKER_TIMEOUT", 120))
+
+preload_models = os.getenv("PRELOAD_MODELS", "true").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger("gunicorn.error")
+
+
+def on_starting(server):
+    """Load the models in the master, before any worker is forked."""
+    if not preload_models:
+        return
+    from app.core.config import get_settings
+    from app.services.registry import get_model_registry
+
+    if get_settings().INFERENCE_BACKEND == "onnx":
+        # ONNX Runtime sessions own thread pools that don't survive a fork
+        logger.info("Not preloading models for the onnx backend")
+        return
+
+    # No warmup here: running inference would start torch's thread pool,
+    # which must not be forked. Each worker warms up in its lifespan.
+    get_model_registry().load(warmup=False)
+    # Move everything loaded so far out of the garbage collector's reach, so
+    # collections in the workers don't write to, and so copy, shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Split the CPU cores between workers for torch's intra-op threads."""
+    from app.core.config import get_settings
+
+    settings = get_settings()
+    if settings.INFERENCE_THREADS or settings.INFERENCE_BACKEND == "onnx":
+        return
+    import torch
+
+    torch.set_num_threads(max(1, multiprocessing.cpu_count() // workers))
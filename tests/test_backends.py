@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+from app.services.backends import load_backend
+from app.services.classifier import softmax
+
+
+def test_softmax_rows_sum_to_one():
+    """Test that softmax is computed per row"""
+    scores = softmax(np.array([[1.0, 2.0, 3.0], [1000.0, 0.0, -1000.0]]))
+    assert np.allclose(scores.sum(axis=1), 1.0)
+    assert scores[0].argmax() == 2
+    assert scores[1].argmax() == 0
+
+
+def test_unknown_backend():
+    """Test that an unknown backend name is rejected"""
+    with pytest.raises(ValueError):
+        load_backend("tensorflow", "some/model")
+
+
+def test_onnx_backend_requires_path():
+    """Test that the onnx backend needs an exported model path"""
+    with pytest.raises(ValueError):
+        load_backend("onnx", "some/model", onnx_path="")
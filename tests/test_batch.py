@@ -0,0 +1,79 @@
+import json
+from app import batch
+
+
+class FakeAnalyzer:
+    def analyze_batch(self, texts):
+        return [{"length": len(text)} for text in texts]
+
+
+def write_lines(path, lines):
+    path.write_text("".join(line + "\n" for line in lines))
+
+
+def read_output(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_iter_records_jsonl_and_csv(tmp_path):
+    """Test reading records from JSONL and CSV files"""
+    jsonl = tmp_path / "in.jsonl"
+    write_lines(jsonl, ['{"id": "a", "text": "hi"}', '"bare"', "", "not json"])
+    assert list(batch.iter_records(jsonl, "text", "id")) == [
+        ("a", "hi"),
+        (1, "bare"),
+        (3, None),
+    ]
+
+    csv_path = tmp_path / "in.csv"
+    write_lines(csv_path, ["id,text", "x,hello", "y,world"])
+    assert list(batch.iter_records(csv_path, "text", "id")) == [
+        ("x", "hello"),
+        ("y", "world"),
+    ]
+
+
+def test_run_in_process_writes_in_order(tmp_path, monkeypatch):
+    """Test scoring in-process keeps input order and reports missing text"""
+    monkeypatch.setattr(batch, "SentimentAnalyzer", FakeAnalyzer)
+    source = tmp_path / "in.jsonl"
+    write_lines(source, [json.dumps({"id": i, "text": "x" * i}) for i in range(5)])
+    write_lines(source, source.read_text().splitlines() + ['{"id": 5}'])
+    output = tmp_path / "out.jsonl"
+
+    summary = batch.run(
+        source, output, tmp_path / "ckpt", workers=0, threads=0, chunk_size=2
+    )
+
+    assert summary["records"] == 6
+    assert read_output(output) == [{"id": i, "length": i} for i in range(5)] + [
+        {"id": 5, "error": "missing text"}
+    ]
+
+
+def test_resume_skips_checkpointed_records(tmp_path, monkeypatch):
+    """Test that resuming truncates to the checkpoint and continues"""
+    monkeypatch.setattr(batch, "SentimentAnalyzer", FakeAnalyzer)
+    source = tmp_path / "in.jsonl"
+    write_lines(source, [json.dumps({"id": i, "text": "x" * i}) for i in range(4)])
+    output = tmp_path / "out.jsonl"
+    checkpoint_path = tmp_path / "ckpt"
+
+    # Simulate a run that checkpointed one record, then wrote a partial line
+    first = json.dumps({"id": 0, "length": 0}) + "\n"
+    output.write_text(first + '{"id": 1, "len')
+    batch.Checkpoint(1, len(first)).save(checkpoint_path)
+
+    summary = batch.run(
+        source,
+        output,
+        checkpoint_path,
+        workers=0,
+        threads=0,
+        chunk_size=2,
+        resume=True,
+    )
+
+    assert summary["records"] == 3
+    assert read_output(output) == [{"id": i, "length": i} for i in range(4)]
+    assert batch.Checkpoint.load(checkpoint_path).records_done == 4
@@ -0,0 +1,71 @@
+import asyncio
+import numpy as np
+import pytest
+from app.services.batching import BatchScheduler
+from app.services.executor import OverloadedError
+
+
+class FakeModel:
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, texts):
+        self.batches.append(list(texts))
+        return np.array([[len(text), 0.0, 0.0] for text in texts])
+
+
+@pytest.mark.asyncio
+async def test_concurrent_submits_are_batched():
+    """Test that concurrent texts share one forward pass"""
+    model = FakeModel()
+    scheduler = BatchScheduler(model.predict, max_batch_size=8, max_wait_ms=20)
+
+    texts = ["a", "bb", "ccc", "dddd"]
+    results = await asyncio.gather(*(scheduler.submit(text) for text in texts))
+    await scheduler.close()
+
+    assert len(model.batches) == 1
+    assert [row[0] for row in results] == [1, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_batches_respect_max_size():
+    """Test that batches never exceed the configured size"""
+    model = FakeModel()
+    scheduler = BatchScheduler(model.predict, max_batch_size=2, max_wait_ms=20)
+
+    await asyncio.gather(*(scheduler.submit("x") for _ in range(5)))
+    await scheduler.close()
+
+    assert all(len(batch) <= 2 for batch in model.batches)
+    assert sum(len(batch) for batch in model.batches) == 5
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_callers():
+    """Test that a failing forward pass fails every waiting caller"""
+
+    def predict(texts):
+        raise RuntimeError("model failure")
+
+    scheduler = BatchScheduler(predict, max_batch_size=4, max_wait_ms=1)
+    with pytest.raises(RuntimeError):
+        await scheduler.submit("x")
+    await scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_sheds_submissions():
+    """Test that texts beyond max_queue_size are rejected, not queued"""
+    model = FakeModel()
+    scheduler = BatchScheduler(
+        model.predict, max_batch_size=2, max_wait_ms=20, max_queue_size=2
+    )
+
+    results = await asyncio.gather(
+        *(scheduler.submit("x") for _ in range(5)), return_exceptions=True
+    )
+    await scheduler.close()
+
+    assert any(isinstance(result, OverloadedError) for result in results)
+    assert sum(len(batch) for batch in model.batches) < 5
@@ -0,0 +1,131 @@
+import pytest
+from fakeredis import FakeAsyncRedis
+from redis.exceptions import ConnectionError
+from app.services.cache import CacheService, LRUCache
+from app.services.results import AnalysisResult
+
+
+class BrokenRedis:
+    """Redis client stand-in whose every command fails"""
+
+    def __getattr__(self, name):
+        async def fail(*args, **kwargs):
+            raise ConnectionError("Redis is down")
+
+        return fail
+
+
+@pytest.fixture(autouse=True)
+def reset_availability():
+    CacheService._unavailable_until = 0.0
+    yield
+    CacheService._unavailable_until = 0.0
+
+
+@pytest.fixture
+def cache_service():
+    return CacheService(FakeAsyncRedis(), LRUCache(max_items=100, ttl=60))
+
+
+@pytest.mark.asyncio
+async def test_get_many_and_set_many(cache_service):
+    """Test pipelined multi-set and multi-get keep key order"""
+    await cache_service.set_many({"a": {"value": 1}, "b": {"value": 2}})
+    result = await cache_service.get_many(["b", "missing", "a"])
+    assert result == [{"value": 2}, None, {"value": 1}]
+
+
+@pytest.mark.asyncio
+async def test_get_many_empty(cache_service):
+    """Test multi-get with no keys makes no round trip"""
+    assert await cache_service.get_many([]) == []
+
+
+@pytest.mark.asyncio
+async def test_redis_down_serves_uncached():
+    """Test that Redis failures behave as cache misses"""
+    cache_service = CacheService(BrokenRedis(), LRUCache(max_items=100, ttl=60))
+
+    await cache_service.set("key", "value")
+    cache_service.local_cache.clear()
+    assert await cache_service.get("key") is None
+    assert await cache_service.get_many(["a", "b"]) == [None, None]
+    assert cache_service.available is False
+
+
+@pytest.mark.asyncio
+async def test_redis_skipped_while_unavailable(cache_service):
+    """Test that Redis is not called again right after a failure"""
+    await cache_service.set("key", "value")
+    cache_service.local_cache.clear()
+    CacheService(BrokenRedis())._mark_unavailable("get", ConnectionError())
+
+    assert await cache_service.get("key") is None
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """Test that the L1 cache evicts the oldest entry when full"""
+    local_cache = LRUCache(max_items=2, ttl=60)
+    local_cache.set("a", 1)
+    local_cache.set("b", 2)
+    local_cache.get("a")
+    local_cache.set("c", 3)
+
+    assert local_cache.get("b") is None
+    assert local_cache.get("a") == 1
+    assert local_cache.stats.evictions == 1
+
+
+def test_lru_cache_expires_entries():
+    """Test that the L1 cache drops entries past their TTL"""
+    local_cache = LRUCache(max_items=2, ttl=0)
+    local_cache.set("a", 1)
+    assert local_cache.get("a") is None
+    assert local_cache.stats.misses == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_hit_promoted_to_local_cache():
+    """Test that an L2 hit is decoded once and then served from L1"""
+    redis_client = FakeAsyncRedis()
+    await redis_client.set("key", '{"value": 1}')
+    cache_service = CacheService(redis_client, LRUCache(max_items=10, ttl=60))
+
+    first = await cache_service.get("key", decoder=lambda data: data["value"])
+    second = await cache_service.get("key")
+
+    assert first == second == 1
+    assert cache_service.local_cache.stats.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_result_objects_round_trip_through_redis():
+    """Test that result objects are stored in Redis in their dict form"""
+    data = {
+        "sentiment_score": 0.5,
+        "sentiment": "very_positive",
+        "confidence": 0.7,
+        "dominant_emotion": "joy",
+        "raw_scores": {"negative": 0.2, "neutral": 0.1, "positive": 0.7},
+        "tier": "model",
+    }
+    redis_client = FakeAsyncRedis()
+    await CacheService(redis_client, LRUCache(10, 60)).set(
+        "key", AnalysisResult.from_dict(data)
+    )
+
+    fresh_service = CacheService(redis_client, LRUCache(10, 60))
+    result = await fresh_service.get("key", decoder=AnalysisResult.from_dict)
+    assert result.to_dict() == data
+
+
+@pytest.mark.asyncio
+async def test_lock_is_exclusive(cache_service):
+    """Test that only one holder gets a coalescing lock"""
+    token = await cache_service.acquire_lock("key", ttl_ms=1000)
+    assert token is not None
+    assert await cache_service.acquire_lock("key", ttl_ms=1000) is None
+
+    await cache_service.release_lock("key", token)
+    assert cache_service.available
+    assert await cache_service.acquire_lock("key", ttl_ms=1000) is not None
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from app.services import moderation
+from app.services.cascade import CASCADE_TIER, HashedNGramModel
+from app.services.moderation import ModerationService
+
+POSITIVE = ["i love it", "great service, love it", "what a great day"]
+NEGATIVE = ["i hate it", "awful service, hate it", "what an awful day"]
+
+
+def biased_model(bias):
+    """A model ignoring the text and scoring every text the same."""
+    return HashedNGramModel(np.zeros((16, 3)), np.array(bias))
+
+
+def test_train_and_reload(tmp_path):
+    """Test that a trained model separates its classes and survives a save"""
+    targets = np.eye(3, dtype=np.float32)[[2] * 3 + [0] * 3]
+    model = HashedNGramModel.train(
+        POSITIVE + NEGATIVE, targets, n_features=2**10, epochs=20
+    )
+    path = tmp_path / "cascade.npz"
+    model.save(path)
+    loaded = HashedNGramModel.load(path)
+
+    scores = loaded.predict_proba(["love it", "hate it", ""])
+    assert scores.shape == (3, 3)
+    assert scores[0].argmax() == 2
+    assert scores[1].argmax() == 0
+    np.testing.assert_allclose(scores, model.predict_proba(["love it", "hate it", ""]))
+
+
+@pytest.mark.asyncio
+async def test_confident_texts_skip_full_model(cache_service, monkeypatch):
+    """Test that the small model answers when confident and escalates otherwise"""
+    service = ModerationService(cache_service)
+    await cache_service.clear()
+
+    monkeypatch.setattr(
+        moderation, "get_cascade_model", lambda: biased_model([0, 0, 9])
+    )
+    confident = await service.analyze_text(POSITIVE[0])
+    batch = await service.analyze_batch(NEGATIVE)
+
+    monkeypatch.setattr(
+        moderation, "get_cascade_model", lambda: biased_model([0, 0, 0])
+    )
+    escalated = await service.analyze_text(POSITIVE[0])
+
+    assert confident["tier"] == CASCADE_TIER
+    assert confident["raw_scores"]["positive"] > 0.99
+    assert [result["tier"] for result in batch] == [CASCADE_TIER] * len(NEGATIVE)
+    assert escalated["tier"] == "model"
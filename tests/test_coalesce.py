@@ -0,0 +1,72 @@
+import asyncio
+import pytest
+from app.services.coalesce import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    """Test that concurrent calls for one key run the work once"""
+    single_flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "result"
+
+    results = await asyncio.gather(*(single_flight.do("key", work) for _ in range(10)))
+
+    assert results == ["result"] * 10
+    assert calls == 1
+    assert len(single_flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_different_keys_run_separately():
+    """Test that different keys are not coalesced"""
+    single_flight = SingleFlight()
+
+    async def work(value):
+        await asyncio.sleep(0)
+        return value
+
+    results = await asyncio.gather(
+        single_flight.do("a", lambda: work("a")),
+        single_flight.do("b", lambda: work("b")),
+    )
+    assert results == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter():
+    """Test that a failure is raised to all coalesced callers"""
+    single_flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    results = await asyncio.gather(
+        single_flight.do("key", work),
+        single_flight.do("key", work),
+        return_exceptions=True,
+    )
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_others():
+    """Test that the work survives the first caller going away"""
+    single_flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "result"
+
+    first = asyncio.ensure_future(single_flight.do("key", work))
+    second = asyncio.ensure_future(single_flight.do("key", work))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "result"
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+import pytest
+from app.services.executor import (
+    BULK,
+    DeadlineExceededError,
+    InferenceExecutor,
+    OverloadedError,
+)
+
+
+@pytest.mark.asyncio
+async def test_executor_runs_jobs():
+    """Test that jobs run on the pool and return their result"""
+    executor = InferenceExecutor(workers=1, max_pending=4, timeout=1.0)
+    result = await executor.run(lambda x: (x * 2, threading.current_thread().name), 21)
+    executor.close()
+
+    assert result[0] == 42
+    assert result[1].startswith("inference")
+    assert executor.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_executor_sheds_when_full():
+    """Test that submissions beyond max_pending fail fast"""
+    release = threading.Event()
+    executor = InferenceExecutor(workers=1, max_pending=1, timeout=0)
+    blocked = asyncio.ensure_future(executor.run(release.wait))
+    await asyncio.sleep(0.01)
+    with pytest.raises(OverloadedError):
+        await executor.run(lambda: None)
+    release.set()
+    await blocked
+    executor.close()
+
+
+@pytest.mark.asyncio
+async def test_executor_drops_expired_jobs():
+    """Test that queued jobs past their deadline are not run"""
+    release = threading.Event()
+    ran = []
+    executor = InferenceExecutor(workers=1, max_pending=4, timeout=0.05)
+
+    with pytest.raises(DeadlineExceededError):
+        await executor.run(release.wait, 1.0)
+    with pytest.raises(DeadlineExceededError):
+        await executor.run(ran.append, "late")
+    release.set()
+    executor.close()
+
+    assert ran == []
+
+
+@pytest.mark.asyncio
+async def test_executor_runs_interactive_jobs_first():
+    """Test that queued interactive jobs start before earlier bulk jobs"""
+    release = threading.Event()
+    ran = []
+    executor = InferenceExecutor(workers=1, max_pending=8, timeout=0)
+    blocked = asyncio.ensure_future(executor.run(release.wait))
+    await asyncio.sleep(0.01)
+    jobs = [
+        asyncio.ensure_future(executor.run(ran.append, "bulk", priority=BULK)),
+        asyncio.ensure_future(executor.run(ran.append, "interactive")),
+    ]
+    await asyncio.sleep(0.01)
+    release.set()
+    await asyncio.gather(blocked, *jobs)
+    executor.close()
+
+    assert ran == ["interactive", "bulk"]
+    assert executor.pending == 0
@@ -0,0 +1,168 @@
+import json
+import httpx
+import pytest
+from fakeredis import FakeAsyncRedis
+from app.core.config import get_settings
+from app.services.executor import BULK
+from app.services.jobs import (
+    Job,
+    JobRunner,
+    LocalJobQueue,
+    RedisJobQueue,
+    WebhookURLError,
+    check_webhook_url,
+    sign_webhook,
+)
+from app.services.moderation import ModerationService
+
+settings = get_settings()
+
+
+@pytest.mark.asyncio
+async def test_local_queue_drains_high_lane_first():
+    """Test that higher lanes are taken first and small jobs are combined"""
+    queue = LocalJobQueue()
+    low = Job(tenant_id="t", texts=["a"], priority="low")
+    normal = Job(tenant_id="t", texts=["b", "c"])
+    high = Job(tenant_id="t", texts=["d"], priority="high")
+    for job in (low, normal, high):
+        await queue.submit(job)
+
+    first = await queue.next_jobs(max_texts=3, timeout=0.1)
+    second = await queue.next_jobs(max_texts=3, timeout=0.1)
+
+    assert [job.id for job in first] == [high.id, normal.id]
+    assert [job.id for job in second] == [low.id]
+    assert await queue.next_jobs(max_texts=3, timeout=0.01) == []
+
+
+@pytest.mark.asyncio
+async def test_redis_queue_round_trip():
+    """Test that jobs queued in Redis come back in lane order with their state"""
+    queue = RedisJobQueue(FakeAsyncRedis())
+    normal = Job(tenant_id="t", texts=["a", "b"], heads=["sentiment"])
+    high = Job(tenant_id="t", texts=["c"], priority="high")
+    await queue.submit(normal)
+    await queue.submit(high)
+
+    jobs = await queue.next_jobs(max_texts=10, timeout=0.1)
+    jobs[0].status = "done"
+    await queue.save(jobs[0])
+    stored = await queue.get(high.id)
+
+    assert [job.id for job in jobs] == [high.id, normal.id]
+    assert jobs[1].heads == ["sentiment"]
+    assert stored.status == "done"
+    assert await queue.get("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_runner_stores_results_and_calls_webhook(cache_service, monkeypatch):
+    """Test that a runner analyzes queued jobs and posts signed results"""
+    monkeypatch.setattr(settings, "JOB_WEBHOOK_SECRET", "secret")
+    monkeypatch.setattr(settings, "JOB_WEBHOOK_ALLOWED_HOSTS", ["example.com"])
+    requests = []
+
+    def webhook(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200)
+
+    queue = LocalJobQueue()
+    runner = JobRunner(
+        queue,
+        lambda: ModerationService(cache_service, priority=BULK, inference_timeout=0),
+        batch_size=2,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(webhook)),
+    )
+    job = Job(
+        tenant_id="t",
+        texts=["I love this", "I hate this", "It is fine"],
+        webhook_url="https://example.com/hook",
+    )
+    await queue.submit(job)
+    await runner.process(await queue.next_jobs(runner.batch_size, timeout=0.1))
+    await runner.aclose()
+
+    stored = await queue.get(job.id)
+    assert stored.status == "done"
+    assert len(stored.results) == 3
+    assert all("sentiment" in result for result in stored.results)
+    assert len(requests) == 1
+    body = requests[0].content
+    assert requests[0].headers["X-Signature-256"] == sign_webhook(body, "secret")
+    assert json.loads(body)["job_id"] == job.id
+
+
+@pytest.mark.asyncio
+async def test_runner_submits_small_executor_jobs(cache_service, monkeypatch):
+    """Test that bulk texts reach the executor in chunks of the chunk size"""
+    await cache_service.clear()
+    service = ModerationService(
+        cache_service, priority=BULK, inference_timeout=0, inference_chunk_size=2
+    )
+    chunks = []
+    run = service.executor.run
+
+    async def recording_run(fn, *args, **kwargs):
+        chunks.append(len(args[0]))
+        return await run(fn, *args, **kwargs)
+
+    monkeypatch.setattr(service.executor, "run", recording_run)
+    runner = JobRunner(LocalJobQueue(), lambda: service, batch_size=10)
+    texts = [f"Chunked text number {i}" for i in range(5)]
+    results = await runner._analyze(texts, None)
+    await runner.aclose()
+
+    assert chunks == [2, 2, 1]
+    assert len(results) == 5
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "url",
+    [
+        "http://example.com/hook",
+        "https://localhost/hook",
+        "https://127.0.0.1/hook",
+        "https://10.0.0.1/hook",
+        "https://169.254.169.254/latest/meta-data",
+        "https://[::1]/hook",
+        "https://[::ffff:127.0.0.1]/hook",
+    ],
+)
+async def test_check_webhook_url_refuses_internal_hosts(url):
+    """Test that webhooks must be https and resolve to public addresses"""
+    with pytest.raises(WebhookURLError):
+        await check_webhook_url(url)
+
+
+@pytest.mark.asyncio
+async def test_check_webhook_url_allowlist(monkeypatch):
+    """Test that only allowlisted hosts pass when an allowlist is set"""
+    monkeypatch.setattr(settings, "JOB_WEBHOOK_ALLOWED_HOSTS", ["hooks.internal"])
+    await check_webhook_url("https://hooks.internal/done")
+    with pytest.raises(WebhookURLError):
+        await check_webhook_url("https://example.com/hook")
+    with pytest.raises(WebhookURLError):
+        await check_webhook_url("http://hooks.internal/done")
+
+
+@pytest.mark.asyncio
+async def test_runner_skips_refused_webhook(cache_service):
+    """Test that a webhook is checked again before the job is posted"""
+    requests = []
+
+    def webhook(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200)
+
+    runner = JobRunner(
+        LocalJobQueue(),
+        lambda: ModerationService(cache_service, priority=BULK, inference_timeout=0),
+        batch_size=2,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(webhook)),
+    )
+    job = Job(tenant_id="t", texts=[], webhook_url="https://127.0.0.1/hook")
+    assert not await runner.notify(job)
+    await runner.aclose()
+    assert not requests
@@ -0,0 +1,96 @@
+import pytest
+from fakeredis import FakeAsyncRedis
+from app.compact_cache import compact
+from app.core.config import get_settings
+from app.services.backends import backend_identity
+from app.services.keys import key_namespace, make_cache_key, normalize_text
+
+settings = get_settings()
+MODEL = "finiteautomata/bertweet-base-sentiment-analysis"
+
+
+def test_normalize_text():
+    """Test that whitespace and case differences are normalized away"""
+    assert normalize_text("  I  LOVE\tthis\n") == "i love this"
+
+
+def test_normalize_text_canonicalizes_tweets():
+    """Test that mentions and URLs map to bertweet's placeholders"""
+    assert normalize_text("@bob see https://t.co/x1 … www.a.io") == (
+        "@user see httpurl ... httpurl"
+    )
+    assert normalize_text("mail me@example.com") == "mail me@example.com"
+
+
+def test_cache_key_is_fixed_size():
+    """Test that cache keys do not grow with the text"""
+    short_key = make_cache_key("hi", MODEL)
+    long_key = make_cache_key("hi " * 10000, MODEL)
+    assert len(short_key) == len(long_key)
+
+
+def test_cache_key_shared_by_equivalent_texts():
+    """Test that equivalent texts share a cache key"""
+    assert make_cache_key("I love this", MODEL) == make_cache_key(
+        " i  LOVE this ", MODEL
+    )
+    assert make_cache_key("I love this", MODEL) != make_cache_key("I hate this", MODEL)
+    assert make_cache_key("@ann read https://a.io/1", MODEL) == make_cache_key(
+        "@bob read https://b.io/2", MODEL
+    )
+
+
+def test_cache_key_depends_on_model_version():
+    """Test that a new model or revision gets new keys"""
+    key = make_cache_key("I love this", MODEL)
+    assert key != make_cache_key("I love this", "other/model")
+    assert key != make_cache_key("I love this", MODEL, "v2")
+
+
+def test_cache_key_depends_on_backend():
+    """Test that backends and exported graphs don't share results"""
+    torch_key = make_cache_key("I love this", MODEL)
+    int8_key = make_cache_key("I love this", MODEL, backend="torch-int8")
+    onnx_key = make_cache_key(
+        "I love this", MODEL, backend=backend_identity("onnx", "sentiment.onnx")
+    )
+    onnx_int8_key = make_cache_key(
+        "I love this", MODEL, backend=backend_identity("onnx", "sentiment.int8.onnx")
+    )
+    assert len({torch_key, int8_key, onnx_key, onnx_int8_key}) == 4
+
+
+def test_cache_key_depends_on_long_text_policy(monkeypatch):
+    """Test that changing how long texts are scored moves the namespace"""
+    key_namespace.cache_clear()
+    mean = key_namespace(MODEL)
+    monkeypatch.setattr(settings, "LONG_TEXT_POLICY", "max_negative")
+    key_namespace.cache_clear()
+    max_negative = key_namespace(MODEL)
+    monkeypatch.setattr(settings, "MAX_SEQUENCE_LENGTH", 128)
+    key_namespace.cache_clear()
+    shorter_windows = key_namespace(MODEL)
+    key_namespace.cache_clear()
+
+    assert len({mean, max_negative, shorter_windows}) == 3
+
+
+@pytest.mark.asyncio
+async def test_compact_removes_stale_keys():
+    """Test that compaction drops old-style and stale-version keys only"""
+    redis_client = FakeAsyncRedis()
+    current = make_cache_key(
+        "I love this", settings.SENTIMENT_MODEL_NAME, settings.SENTIMENT_MODEL_REVISION
+    )
+    stale = f"{key_namespace('other/model')}:abc"
+    await redis_client.set(current, "{}")
+    await redis_client.set(stale, "{}")
+    await redis_client.set("analysis:I love this", "{}")
+    await redis_client.set("unrelated", "{}")
+
+    assert await compact(redis_client, dry_run=True) == 2
+    assert await redis_client.exists(stale) == 1
+
+    assert await compact(redis_client) == 2
+    assert await redis_client.exists(current, "unrelated") == 2
+    assert await redis_client.exists(stale, "analysis:I love this") == 0
@@ -0,0 +1,39 @@
+import pytest
+from app.services.lexicon import LexiconMatcher
+
+
+@pytest.fixture
+def matcher():
+    return LexiconMatcher(["good", "love"], ["bad", "hate"], ["bad", "stupid", "idiot"])
+
+
+def test_counts_hits_per_list(matcher):
+    """Test that each match counts towards every list it belongs to"""
+    score = matcher.score("Good, but bad and STUPID")
+    assert (score.positive, score.negative, score.toxic) == (1, 1, 2)
+    assert score.score == 0.0
+
+
+def test_matches_whole_words_only(matcher):
+    """Test that words inside longer words do not match"""
+    assert not matcher.score("badge goodness lovely").matched
+
+
+def test_normalizes_unicode(matcher):
+    """Test that compatibility characters are normalized before matching"""
+    assert matcher.score("ｌｏｖｅ it").positive == 1
+
+
+def test_short_circuit_needs_enough_toxic_hits(matcher):
+    """Test that only clearly toxic texts skip the model"""
+    assert matcher.short_circuit_scores("that was bad") is None
+
+    scores = matcher.short_circuit_scores("you stupid idiot")
+    assert scores is not None
+    assert scores.argmax() == 0
+    assert scores.sum() == pytest.approx(1.0)
+
+
+def test_empty_word_lists():
+    """Test that a matcher without words never matches"""
+    assert not LexiconMatcher([], [], []).score("anything").matched
@@ -0,0 +1,46 @@
+import json
+import logging
+import sys
+from app.core.logging import JsonFormatter, SAMPLED, SamplingFilter, _QueueHandler
+
+
+def make_record(level=logging.INFO, msg="hello %s", args=("world",), **extra):
+    record = logging.LogRecord("test", level, __file__, 1, msg, args, None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+def test_json_formatter_includes_extra_fields():
+    """Test that records are formatted as JSON with extra fields"""
+    entry = json.loads(JsonFormatter().format(make_record(tenant="acme")))
+    assert entry["message"] == "hello world"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "test"
+    assert entry["tenant"] == "acme"
+    assert "sampled" not in entry
+
+
+def test_sampling_filter_only_drops_sampled_records():
+    """Test that sampling never drops unsampled records or warnings"""
+    sampler = SamplingFilter(0.0)
+    assert not sampler.filter(make_record(**SAMPLED))
+    assert sampler.filter(make_record())
+    assert sampler.filter(make_record(logging.WARNING, **SAMPLED))
+    assert SamplingFilter(1.0).filter(make_record(**SAMPLED))
+
+
+def test_queue_handler_merges_args_and_exception():
+    """Test that queued records carry their final message and traceback"""
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = make_record()
+        record.exc_info = sys.exc_info()
+    prepared = _QueueHandler(None).prepare(record)
+    assert prepared.msg == "hello world"
+    assert prepared.args is None
+    assert prepared.exc_info is None
+    assert "ValueError: boom" in prepared.exc_text
+    entry = json.loads(JsonFormatter().format(prepared))
+    assert "ValueError: boom" in entry["exc_info"]
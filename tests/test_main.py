@@ -1,8 +1,16 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
+from app import main
 from app.main import app
 from app.core.config import get_settings
-
+from app.services.executor import OverloadedError
+from app.services import jobs, moderation
+from app.services.jobs import LocalJobQueue
+from app.services.moderation import ModerationService
+from app.services.rate_limit import RateLimiter
+from app.services.registry import ModelRegistry
+from app.api import routes
 
 settings = get_settings()
 
@@ -25,6 +33,17 @@ def test_health_check():
     assert response.json() == {"status": "healthy"}
 
 
+def test_metrics_endpoint():
+    """Test the metrics endpoint exposes request and service metrics"""
+    client.get("/api/v1/health")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "text/plain" in response.headers["content-type"]
+    assert 'endpoint="health_check"' in response.text
+    assert "moderator_batch_queue_depth" in response.text
+    assert 'moderator_cache{stat="hit_ratio",tier="redis"}' in response.text
+
+
 def test_analyze_endpoint_no_api_key():
     """Test analyze endpoint without API key"""
     response = client.post("/api/v1/analyze", json={"text": "This is a test"})
@@ -67,3 +86,196 @@ def test_analyze_endpoint_valid_request():
     assert "confidence" in result
     assert "dominant_emotion" in result
     assert "raw_scores" in result
+
+
+def test_analyze_batch_endpoint():
+    """Test batch analyze endpoint with valid request"""
+    response = client.post(
+        "/api/v1/analyze/batch",
+        json={"texts": ["I love this product!", "Today is Sunday"]},
+        headers={"X-API-Key": API_KEY},
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == 2
+    assert all("sentiment" in result for result in results)
+
+
+def test_analyze_batch_endpoint_empty_list():
+    """Test batch analyze endpoint rejects an empty list"""
+    response = client.post(
+        "/api/v1/analyze/batch", json={"texts": []}, headers={"X-API-Key": API_KEY}
+    )
+    assert response.status_code == 422
+
+
+def test_analyze_stream_endpoint():
+    """Test streaming NDJSON analysis returns one line per input line"""
+    body = '{"text": "I love this product!", "id": "a"}\n"Today is Sunday"\n'
+    response = client.post(
+        "/api/v1/analyze/stream", content=body, headers={"X-API-Key": API_KEY}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["index"] for line in lines] == [0, 1]
+    assert lines[0]["id"] == "a"
+    assert all("sentiment" in line for line in lines)
+
+
+def test_profile_requires_admin_key():
+    """Test the profile endpoint rejects requests without a valid admin key"""
+    response = client.post("/api/v1/admin/profile", headers={"X-Admin-Key": "wrong"})
+    assert response.status_code == 403
+
+
+def test_profile_returns_folded_stacks(monkeypatch):
+    """Test the profile endpoint returns folded stack samples"""
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "admin")
+    response = client.post(
+        "/api/v1/admin/profile?seconds=0.05",
+        headers={"X-Admin-Key": "admin"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.text.strip()
+
+
+def test_analyze_endpoint_overloaded(monkeypatch):
+    """Test that shed requests get a 503 with Retry-After"""
+
+    async def overloaded(self, text, heads=None):
+        raise OverloadedError("Inference queue is full")
+
+    monkeypatch.setattr(ModerationService, "analyze_text", overloaded)
+    response = client.post(
+        "/api/v1/analyze", json={"text": "hello"}, headers={"X-API-Key": API_KEY}
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(settings.OVERLOAD_RETRY_AFTER_SECONDS)
+
+
+def test_analyze_endpoint_rate_limited(monkeypatch):
+    """Test that requests beyond the rate limit get a 429 with quota headers"""
+    limiter = RateLimiter(per_minute=60, capacity=1, mode="local", sync_interval=3600)
+    monkeypatch.setattr(routes, "get_rate_limiter", lambda: limiter)
+    headers = {"X-API-Key": API_KEY}
+
+    first = client.post("/api/v1/analyze", json={"text": "hi"}, headers=headers)
+    second = client.post("/api/v1/analyze", json={"text": "hi"}, headers=headers)
+
+    assert first.status_code == 200
+    assert first.headers["X-RateLimit-Limit"] == "1"
+    assert second.status_code == 429
+    assert second.headers["Retry-After"] == "1"
+
+
+def test_batch_endpoint_charges_per_text(monkeypatch):
+    """Test that a batch takes one rate limit token per text"""
+    limiter = RateLimiter(per_minute=1, capacity=5, mode="local", sync_interval=3600)
+    monkeypatch.setattr(routes, "get_rate_limiter", lambda: limiter)
+    headers = {"X-API-Key": API_KEY}
+    body = {"texts": ["I love this", "I hate this", "It is fine"]}
+
+    first = client.post("/api/v1/analyze/batch", json=body, headers=headers)
+    second = client.post("/api/v1/analyze/batch", json=body, headers=headers)
+
+    assert first.status_code == 200
+    assert first.headers["X-RateLimit-Remaining"] == "2"
+    assert second.status_code == 429
+
+
+def test_rejected_requests_do_not_build_the_service(monkeypatch):
+    """Test that auth and rate limiting run before the models are needed"""
+    limiter = RateLimiter(per_minute=1, capacity=1, mode="local", sync_interval=3600)
+    monkeypatch.setattr(routes, "get_rate_limiter", lambda: limiter)
+    built = []
+
+    monkeypatch.setattr(routes, "get_model_registry", lambda: built.append(1))
+    # Use up the bucket
+    client.get("/api/v1/jobs/missing", headers={"X-API-Key": API_KEY})
+
+    missing_key = client.post("/api/v1/analyze", json={"text": "hi"})
+    invalid_key = client.post(
+        "/api/v1/analyze", json={"text": "hi"}, headers={"X-API-Key": "wrong"}
+    )
+    throttled = client.post(
+        "/api/v1/analyze", json={"text": "hi"}, headers={"X-API-Key": API_KEY}
+    )
+
+    assert missing_key.status_code == 422
+    assert invalid_key.status_code == 401
+    assert throttled.status_code == 429
+    assert not built
+
+
+def test_analyze_endpoint_unavailable_head():
+    """Test that asking for a head without a configured model is a 400"""
+    response = client.post(
+        "/api/v1/analyze",
+        json={"text": "hello", "heads": ["toxicity"]},
+        headers={"X-API-Key": API_KEY},
+    )
+    assert response.status_code == 400
+    assert "toxicity" in response.json()["detail"]
+
+
+def test_job_endpoints(monkeypatch):
+    """Test that jobs can be submitted and polled only by their tenant"""
+    queue = LocalJobQueue()
+    monkeypatch.setattr(routes, "get_job_queue", lambda: queue)
+    response = client.post(
+        "/api/v1/jobs",
+        json={"texts": ["I love this", "I hate this"], "priority": "high"},
+        headers={"x-api-key": API_KEY},
+    )
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "queued"
+    assert job["texts"] == 2
+
+    response = client.get(
+        f"/api/v1/jobs/{job['job_id']}", headers={"x-api-key": API_KEY}
+    )
+    assert response.status_code == 200
+    assert response.json()["job_id"] == job["job_id"]
+
+    queue._jobs[job["job_id"]].tenant_id = "other"
+    response = client.get(
+        f"/api/v1/jobs/{job['job_id']}", headers={"x-api-key": API_KEY}
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize(
+    "webhook_url",
+    ["http://example.com/hook", "https://127.0.0.1/hook", "https://169.254.169.254/"],
+)
+def test_job_refuses_internal_webhooks(monkeypatch, webhook_url):
+    """Test that jobs with a non-https or internal webhook are refused"""
+    queue = LocalJobQueue()
+    monkeypatch.setattr(routes, "get_job_queue", lambda: queue)
+    response = client.post(
+        "/api/v1/jobs",
+        json={"texts": ["I love this"], "webhook_url": webhook_url},
+        headers={"x-api-key": API_KEY},
+    )
+    assert response.status_code == 400
+    assert not queue._jobs
+
+
+def test_local_jobs_do_not_load_models_at_startup(monkeypatch):
+    """Test that local job mode leaves loading to the first job without preload"""
+    registry = ModelRegistry()
+    loads = []
+    monkeypatch.setattr(registry, "load", lambda *args, **kwargs: loads.append(1))
+    for module in (main, jobs, moderation):
+        monkeypatch.setattr(module, "get_model_registry", lambda: registry)
+    monkeypatch.setattr(main, "get_job_queue", LocalJobQueue)
+    monkeypatch.setattr(settings, "JOB_QUEUE_MODE", "local")
+    monkeypatch.setattr(settings, "MODEL_PRELOAD", False)
+
+    with TestClient(app) as lifespan_client:
+        assert lifespan_client.get("/api/v1/health").status_code == 200
+
+    assert not loads
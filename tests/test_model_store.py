@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+from app.services import model_store
+from app.services.model_store import resolve_model_source, write_model_info
+
+
+def test_model_dir_keeps_hub_identity(tmp_path, monkeypatch):
+    """Test that a snapshot loads locally under its original name and revision"""
+    write_model_info(str(tmp_path), "org/model", "abc123")
+    monkeypatch.setattr(model_store.settings, "MODEL_DIR", str(tmp_path))
+
+    source = resolve_model_source()
+    assert source.path == str(tmp_path)
+    assert (source.model_name, source.revision) == ("org/model", "abc123")
+    assert source.pretrained_kwargs() == {"local_files_only": True}
+
+
+def test_explicit_model_name_wins_over_model_dir(tmp_path, monkeypatch):
+    """Test that an explicit model name ignores MODEL_DIR"""
+    monkeypatch.setattr(model_store.settings, "MODEL_DIR", str(tmp_path))
+    monkeypatch.setattr(model_store.settings, "MODEL_LOCAL_FILES_ONLY", True)
+
+    source = resolve_model_source("org/other", "v1")
+    assert source.path == "org/other"
+    assert source.pretrained_kwargs() == {"revision": "v1", "local_files_only": True}
+
+
+def test_app_import_defers_heavy_libraries():
+    """Test that importing the app does not import torch or transformers"""
+    code = (
+        "import sys, app.main; "
+        "print(sorted({'torch', 'transformers', 'onnxruntime'} & set(sys.modules)))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "LOG_SINK": "none"},
+    ).stdout
+    assert output.strip() == "[]"
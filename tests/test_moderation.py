@@ -173,3 +173,17 @@ async def test_cache_service(cache_service):
     await cache_service.clear()
     assert await cache_service.get("key1") is None
     assert await cache_service.get("key2") is None
+
+
+@pytest.mark.asyncio
+async def test_analyze_batch(moderation_service):
+    """Test batch analysis returns one result per text in input order"""
+    texts = ["I love this product!", "I hate this product!", "I love this product!"]
+    results = await moderation_service.analyze_batch(texts)
+
+    assert len(results) == 3
+    assert results[0] == results[2]
+    assert results[0]["sentiment_score"] > results[1]["sentiment_score"]
+    for result in results:
+        assert "sentiment" in result
+        assert "dominant_emotion" in result
@@ -0,0 +1,49 @@
+import pytest
+from app.services import moderation
+from app.services.moderation import ModerationService
+from app.services.near_duplicates import NearDuplicateIndex, fingerprint
+
+TEXT = "Check out our new spring sale at the downtown store, half price until Sunday"
+
+
+def test_fingerprint_tolerates_small_edits():
+    """Test that light edits stay within a few bits and other texts do not"""
+    base = fingerprint(TEXT)
+    edited = fingerprint(TEXT + "!")
+    other = fingerprint("The weather in the park was lovely all afternoon long today")
+
+    assert bin(base ^ edited).count("1") <= 3
+    assert bin(base ^ other).count("1") > 3
+    assert fingerprint("too short") is None
+
+
+def test_index_finds_within_distance_and_evicts():
+    """Test lookups within the distance and least-recently-used eviction"""
+    index = NearDuplicateIndex(max_items=2, max_distance=3)
+    index.add(0b1111, "a")
+    index.add(1 << 63, "b")
+
+    assert index.find(0b0111) == (0b1111, "a")
+    assert index.find(0b11110000) is None
+
+    index.add(0xFFFF << 40, "c")
+    assert len(index) == 2
+    assert index.find(1 << 63) is None
+    assert index.find(0b1111) == (0b1111, "a")
+
+
+@pytest.mark.asyncio
+async def test_near_duplicate_reuses_cached_result(cache_service, monkeypatch):
+    """Test that a near-duplicate text is answered with the cached result"""
+    index = NearDuplicateIndex(max_items=100, max_distance=3)
+    monkeypatch.setattr(moderation, "get_near_duplicate_index", lambda: index)
+    service = ModerationService(cache_service)
+    await cache_service.clear()
+
+    first = await service.analyze_text(TEXT)
+    near = await service.analyze_text(TEXT + "!")
+    batch = await service.analyze_batch([TEXT + "!", TEXT])
+
+    assert len(index) == 1
+    assert near == first
+    assert batch == [first, first]
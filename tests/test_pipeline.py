@@ -0,0 +1,156 @@
+import numpy as np
+import pytest
+from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
+from app.core.config import get_settings
+from app.services.keys import make_cache_key
+from app.services.moderation import ModerationService
+from app.services.pipeline import (
+    ClassifierHead,
+    HeadUnavailableError,
+    ModerationPipeline,
+)
+from app.services.sentiment import SentimentAnalyzer
+from app.services.tokenization import tokenizer_fingerprint
+
+settings = get_settings()
+
+TEXTS = ["I love this!", "This is awful.", "It is a table."]
+EMOTIONS = ("anger", "joy", "sadness", "neutral")
+
+
+@pytest.fixture(scope="module")
+def emotion_model(tmp_path_factory):
+    """A different, one-layer model saved elsewhere with the sentiment tokenizer."""
+    path = tmp_path_factory.mktemp("emotion")
+    AutoTokenizer.from_pretrained(settings.SENTIMENT_MODEL_NAME).save_pretrained(path)
+    config = AutoConfig.from_pretrained(
+        settings.SENTIMENT_MODEL_NAME,
+        num_hidden_layers=1,
+        id2label=dict(enumerate(EMOTIONS)),
+        label2id={label: i for i, label in enumerate(EMOTIONS)},
+    )
+    AutoModelForSequenceClassification.from_config(config).save_pretrained(path)
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def pipeline(emotion_model):
+    return ModerationPipeline(
+        {
+            "toxicity": ClassifierHead("toxicity", settings.SENTIMENT_MODEL_NAME),
+            "emotion": ClassifierHead("emotion", emotion_model),
+        }
+    )
+
+
+def test_pipeline_shares_tokenization(pipeline, monkeypatch):
+    """Test that models with the same tokenizer, sentiment included, tokenize once"""
+    sentiment = SentimentAnalyzer()
+    classifiers = [*pipeline.heads.values(), sentiment]
+    calls = []
+    for classifier in classifiers:
+        original = classifier.tokenize
+        monkeypatch.setattr(
+            classifier,
+            "tokenize",
+            lambda texts, f=original: calls.append(texts) or f(texts),
+        )
+
+    scores = pipeline.predict(TEXTS, ["toxicity", "emotion"], sentiment=sentiment)
+
+    assert len({classifier.tokenizer_key for classifier in classifiers}) == 1
+    assert calls == [TEXTS]
+    assert set(scores) == {"toxicity", "emotion", "sentiment"}
+    assert scores["emotion"].shape == (len(TEXTS), len(EMOTIONS))
+    np.testing.assert_allclose(
+        scores["sentiment"], sentiment.predict_scores(TEXTS), rtol=1e-5
+    )
+
+
+def record_tokenizer_input(classifier, monkeypatch):
+    """Texts passed to the classifier's tokenizer, one list per call."""
+    calls = []
+    original = classifier.tokenizer
+
+    def tokenizer(texts, **kwargs):
+        calls.append(texts)
+        return original(texts, **kwargs)
+
+    monkeypatch.setattr(classifier, "tokenizer", tokenizer)
+    return calls
+
+
+def test_only_sentiment_input_is_tweet_normalized(pipeline, monkeypatch):
+    """Test that heads tokenize the raw text and sentiment the normalized one"""
+    text, templated = "@bob look https://t.co/x1", "@ann look https://a.io"
+    head = pipeline.heads["toxicity"]
+    sentiment = SentimentAnalyzer(tweet_normalization=True)
+    head_calls = record_tokenizer_input(head, monkeypatch)
+    sentiment_calls = record_tokenizer_input(sentiment, monkeypatch)
+
+    head.tokenize([text])
+    sentiment.tokenize([text])
+
+    assert head_calls == [[text]]
+    assert sentiment_calls == [["@USER look HTTPURL"]]
+    assert head.cache_key(text) != head.cache_key(templated)
+    sentiment_keys = {
+        make_cache_key(
+            t,
+            sentiment.model_name,
+            sentiment.model_revision,
+            sentiment.backend.identity,
+            sentiment.tweet_normalization,
+        )
+        for t in (text, templated)
+    }
+    assert len(sentiment_keys) == 1
+
+
+def test_tokenizer_fingerprint_tracks_vocabulary():
+    """Test that tokenizers with different vocabularies don't share output"""
+    tokenizer = AutoTokenizer.from_pretrained(settings.SENTIMENT_MODEL_NAME)
+    original = tokenizer_fingerprint(tokenizer)
+    tokenizer.add_tokens(["<brand-new-token>"])
+
+    assert tokenizer_fingerprint(tokenizer) != original
+
+
+def test_head_flags_multi_label(pipeline, monkeypatch):
+    """Test that multi-label heads list the labels over the flag threshold"""
+    head = pipeline.heads["toxicity"]
+    monkeypatch.setattr(head, "multi_label", True)
+    monkeypatch.setattr(head, "labels", ("toxic", "insult", "threat"))
+
+    (result,) = head.build_results(np.array([[0.9, 0.2, 0.7]], dtype=np.float32))
+
+    assert result["label"] == "toxic"
+    assert result["flagged"] == ["toxic", "threat"]
+    assert set(result["scores"]) == {"toxic", "insult", "threat"}
+
+
+@pytest.mark.asyncio
+async def test_analyze_text_with_heads(cache_service, pipeline):
+    """Test that requested heads are added to the sentiment result"""
+    service = ModerationService(cache_service, pipeline=pipeline)
+    await cache_service.clear()
+
+    result = await service.analyze_text(TEXTS[0], ["sentiment", "emotion"])
+    cached = await service.analyze_text(TEXTS[0], ["sentiment", "emotion"])
+    heads_only = await service.analyze_batch(TEXTS, ["toxicity"])
+
+    assert "sentiment" in result
+    assert set(result["heads"]) == {"emotion"}
+    assert result["dominant_emotion"] == result["heads"]["emotion"]["label"]
+    assert cached == result
+    assert [list(r) for r in heads_only] == [["heads"]] * len(TEXTS)
+    assert "flagged" not in heads_only[0]["heads"]["toxicity"]
+
+
+@pytest.mark.asyncio
+async def test_unconfigured_head_rejected(cache_service):
+    """Test that asking for a head without a model raises HeadUnavailableError"""
+    service = ModerationService(cache_service, pipeline=ModerationPipeline({}))
+
+    with pytest.raises(HeadUnavailableError):
+        await service.analyze_text("hello", ["toxicity"])
@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+from fakeredis import FakeAsyncRedis, FakeServer
+from app.services.rate_limit import RateLimiter
+
+
+@pytest.mark.asyncio
+async def test_redis_bucket_rejects_when_empty():
+    """Test that a client gets its burst and is then rejected with Retry-After"""
+    limiter = RateLimiter(per_minute=60, capacity=3, redis_client=FakeAsyncRedis())
+
+    results = [await limiter.hit("client") for _ in range(4)]
+
+    assert [result.allowed for result in results] == [True, True, True, False]
+    assert results[2].headers()["X-RateLimit-Remaining"] == "0"
+    assert results[3].headers()["Retry-After"] == "1"
+    assert (await limiter.hit("other")).allowed is True
+    # The script is registered once, not per request
+    assert limiter.script is limiter.script
+
+
+@pytest.mark.asyncio
+async def test_local_mode_syncs_usage():
+    """Test that local usage is reported to Redis and seen by other replicas"""
+    client = FakeAsyncRedis()
+    first = RateLimiter(
+        per_minute=60, capacity=10, mode="local", sync_interval=0, redis_client=client
+    )
+    second = RateLimiter(
+        per_minute=60, capacity=10, mode="local", sync_interval=0, redis_client=client
+    )
+
+    for _ in range(6):
+        await first.hit("client")
+        await asyncio.gather(*first._sync_tasks)
+    await second.hit("client")
+    await asyncio.gather(*second._sync_tasks)
+
+    assert (await second.hit("client")).remaining < 5
+
+
+@pytest.mark.asyncio
+async def test_redis_failure_limits_locally(monkeypatch):
+    """Test that the limiter keeps limiting per process when Redis is down"""
+    monkeypatch.setattr(RateLimiter, "_unavailable_until", 0.0)
+    server = FakeServer()
+    server.connected = False
+    limiter = RateLimiter(
+        per_minute=60, capacity=2, redis_client=FakeAsyncRedis(server=server)
+    )
+
+    results = [await limiter.hit("client") for _ in range(3)]
+
+    assert [result.allowed for result in results] == [True, True, False]
+    assert limiter.available is False
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["redis", "local"])
+async def test_costly_hits_need_a_full_bucket_and_leave_debt(mode):
+    """Test that a hit costing more than the bucket passes once and leaves debt"""
+    limiter = RateLimiter(
+        per_minute=60,
+        capacity=3,
+        mode=mode,
+        sync_interval=3600,
+        redis_client=FakeAsyncRedis(),
+    )
+
+    costly = await limiter.hit("client", 5)
+    after = await limiter.hit("client")
+
+    assert costly.allowed is True
+    assert costly.headers()["X-RateLimit-Remaining"] == "0"
+    assert after.allowed is False
+    assert after.headers()["Retry-After"] == "3"
@@ -0,0 +1,87 @@
+import threading
+import pytest
+from app.api import routes
+from app.services import moderation
+from app.services import registry as registry_module
+from app.services.registry import ModelRegistry
+
+
+class FakeAnalyzer:
+    instances = 0
+
+    def __init__(self, tweet_normalization=True):
+        FakeAnalyzer.instances += 1
+        self.warmed_up = False
+
+    def analyze_sentiment(self, text):
+        self.warmed_up = True
+        return {}
+
+    def predict_scores(self, texts):
+        return []
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    FakeAnalyzer.instances = 0
+    monkeypatch.setattr(registry_module, "SentimentAnalyzer", FakeAnalyzer)
+    return ModelRegistry()
+
+
+def test_registry_starts_not_ready(registry):
+    """Test that nothing is loaded before first use"""
+    assert registry.ready is False
+    assert FakeAnalyzer.instances == 0
+
+
+def test_registry_loads_once(registry):
+    """Test that the analyzer is loaded once and shared"""
+    first = registry.get_sentiment_analyzer()
+    second = registry.get_sentiment_analyzer()
+
+    assert first is second
+    assert FakeAnalyzer.instances == 1
+    assert registry.ready is True
+
+
+def test_registry_warmup(registry):
+    """Test that warmup runs an inference on load"""
+    analyzer = registry.load(warmup=True)
+    assert analyzer.warmed_up is True
+    assert registry.load_seconds is not None
+
+
+def test_registry_unload(registry):
+    """Test that unloading resets readiness"""
+    registry.load()
+    registry.unload()
+    assert registry.ready is False
+
+
+def test_registry_warmup_after_load(registry):
+    """Test that models loaded without warmup are warmed up once later"""
+    registry.load()
+    analyzer = registry.load(warmup=True)
+    registry.load(warmup=True)
+
+    assert analyzer.warmed_up is True
+    assert FakeAnalyzer.instances == 1
+
+
+@pytest.mark.asyncio
+async def test_lazy_load_runs_off_event_loop(registry, monkeypatch):
+    """Test that the first request loads models on a worker thread"""
+    loaded_on = []
+    load = registry.load
+
+    def recording_load(warmup=False):
+        loaded_on.append(threading.current_thread())
+        return load(warmup)
+
+    monkeypatch.setattr(registry, "load", recording_load)
+    monkeypatch.setattr(routes, "get_model_registry", lambda: registry)
+    monkeypatch.setattr(moderation, "get_model_registry", lambda: registry)
+    await routes.get_moderation_service()
+
+    assert registry.ready is True
+    assert loaded_on[0] is not threading.main_thread()
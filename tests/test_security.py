@@ -1,6 +1,7 @@
 import pytest
+from fakeredis import FakeAsyncRedis, FakeServer
 from fastapi import HTTPException
-from app.core.security import get_api_key
+from app.core.security import DEFAULT_TENANT, ApiKeyIndex, get_api_key, hash_api_key
 from app.core.config import get_settings
 
 settings = get_settings()
@@ -42,3 +43,36 @@ async def test_get_api_key_none():
 
     assert exc_info.value.status_code == 403
     assert exc_info.value.detail == "Could not validate API key"
+
+
+@pytest.mark.asyncio
+async def test_api_key_index_loads_tenant_keys():
+    """Test that keys stored in Redis resolve to their tenant"""
+    client = FakeAsyncRedis()
+    await client.hset("api_keys", hash_api_key("acme-key"), "acme")
+    index = ApiKeyIndex(
+        {"static-key": DEFAULT_TENANT}, redis_hash="api_keys", redis_client=client
+    )
+
+    principal = await index.authenticate("acme-key")
+
+    assert principal is not None
+    assert principal.tenant_id == "acme"
+    assert principal.key_id == hash_api_key("acme-key")[:8]
+    assert index.lookup("static-key").tenant_id == DEFAULT_TENANT
+    assert index.lookup("unknown-key") is None
+
+
+@pytest.mark.asyncio
+async def test_api_key_index_keeps_keys_when_redis_fails():
+    """Test that a failed refresh keeps the keys loaded before"""
+    server = FakeServer()
+    client = FakeAsyncRedis(server=server)
+    await client.hset("api_keys", hash_api_key("acme-key"), "acme")
+    index = ApiKeyIndex({}, redis_hash="api_keys", ttl=0, redis_client=client)
+    await index.refresh()
+
+    server.connected = False
+    await index.refresh()
+
+    assert index.lookup("acme-key").tenant_id == "acme"
@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 from app.services.sentiment import SentimentAnalyzer
 
@@ -83,3 +84,40 @@ def test_get_sentiment_label(sentiment_analyzer):
     assert sentiment_analyzer.get_sentiment_label(-0.8) in ["negative", "very_negative"]
     assert sentiment_analyzer.get_sentiment_label(0.1) == "neutral"
     assert sentiment_analyzer.get_sentiment_label(-0.1) == "neutral"
+
+
+def test_build_results_vectorized(sentiment_analyzer):
+    """Test that batch scoring matches the per-score label mapping"""
+    scores = np.array(
+        [
+            [0.9, 0.05, 0.05],
+            [0.4, 0.4, 0.2],
+            [0.1, 0.8, 0.1],
+            [0.05, 0.05, 0.9],
+        ]
+    )
+    results = sentiment_analyzer.build_results(scores)
+
+    assert [result["dominant_emotion"] for result in results] == [
+        "anger",
+        "disappointment",
+        "neutral",
+        "joy",
+    ]
+    for result in results:
+        assert result["sentiment"] == sentiment_analyzer.get_sentiment_label(
+            result["sentiment_score"]
+        )
+
+
+def test_analyze_batch_order(sentiment_analyzer):
+    """Test that batch analysis keeps input order"""
+    texts = [
+        "I love this product! It's amazing!",
+        "I hate this product! It's terrible!",
+    ]
+    results = sentiment_analyzer.analyze_batch(texts)
+
+    assert len(results) == 2
+    assert results[0]["sentiment_score"] > 0
+    assert results[1]["sentiment_score"] < 0
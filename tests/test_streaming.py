@@ -0,0 +1,97 @@
+import asyncio
+import json
+import pytest
+from app.services.streaming import analyze_ndjson_stream, iter_lines
+
+
+class FakeModerationService:
+    def __init__(self):
+        self.batches = []
+
+    async def analyze_batch(self, texts):
+        self.batches.append(list(texts))
+        return [{"length": len(text)} for text in texts]
+
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_handles_split_chunks():
+    """Test that lines split across chunks are reassembled"""
+    lines = await collect(iter_lines(stream(b'"a"\n"b', b'c"\n\n', b'"d"'), 100))
+    assert lines == [b'"a"', b'"bc"', b'"d"']
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_drops_long_lines():
+    """Test that over-long lines are reported as None"""
+    lines = await collect(iter_lines(stream(b"x" * 20, b"x" * 20 + b"\nok\n"), 10))
+    assert lines == [None, b"ok"]
+
+
+@pytest.mark.asyncio
+async def test_results_in_input_order_with_errors():
+    """Test that every input line gets a result line in order"""
+    service = FakeModerationService()
+    body = b'{"text": "hello", "id": 7}\nnot json\n"hi"\n{"nope": 1}\n'
+    lines = await collect(analyze_ndjson_stream(stream(body), service, batch_size=2))
+    outputs = [json.loads(line) for line in lines]
+
+    assert outputs[0] == {"index": 0, "id": 7, "length": 5}
+    assert outputs[1]["index"] == 1 and "error" in outputs[1]
+    assert outputs[2] == {"index": 2, "length": 2}
+    assert "error" in outputs[3]
+    assert service.batches == [["hello"], ["hi"]]
+
+
+@pytest.mark.asyncio
+async def test_reading_is_bounded_by_pending_batches():
+    """Test that the body is not read far ahead of analysis"""
+    service = FakeModerationService()
+    read = 0
+
+    async def body():
+        nonlocal read
+        for i in range(100):
+            read += 1
+            yield b'"text"\n'
+
+    results = analyze_ndjson_stream(
+        body(), service, batch_size=1, max_pending_batches=2
+    )
+    await results.__anext__()
+    await asyncio.sleep(0.01)
+    # One batch analyzed, two queued and one waiting to be queued
+    assert read <= 5
+    await results.aclose()
+
+
+@pytest.mark.asyncio
+async def test_refused_charge_ends_the_stream():
+    """Test that lines are charged per batch and reading stops once refused"""
+    service = FakeModerationService()
+    charged = []
+
+    async def charge(lines):
+        charged.append(lines)
+        return sum(charged) <= 3
+
+    body = b'"a"\n"b"\n"c"\n"d"\n"e"\n"f"\n"g"\n'
+    lines = await collect(
+        analyze_ndjson_stream(stream(body), service, batch_size=2, charge=charge)
+    )
+    outputs = [json.loads(line) for line in lines]
+
+    assert charged == [2, 2]
+    assert service.batches == [["a", "b"]]
+    assert outputs[2:] == [
+        {"index": 2, "error": "rate limit exceeded"},
+        {"index": 3, "error": "rate limit exceeded"},
+    ]
@@ -0,0 +1,60 @@
+import asyncio
+import threading
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.profiler import format_folded, sample_stacks
+from app.core.timing import ServerTimingMiddleware, record_stage, stage_timer
+
+app = FastAPI()
+app.add_middleware(ServerTimingMiddleware)
+
+
+@app.get("/work")
+async def work():
+    with stage_timer("cache_get"):
+        pass
+    await asyncio.to_thread(record_stage, "forward", 0.0125)
+    return {}
+
+
+def server_timings(response):
+    return dict(
+        entry.split(";dur=") for entry in response.headers["server-timing"].split(", ")
+    )
+
+
+def test_server_timing_header():
+    """Test that stages timed during a request are reported in Server-Timing"""
+    entries = server_timings(TestClient(app).get("/work"))
+    assert set(entries) == {"cache_get", "forward", "total"}
+    assert entries["forward"] == "12.50"
+
+
+def test_stages_outside_requests_are_not_collected():
+    """Test that stages timed outside a request are not attributed to one"""
+    record_stage("forward", 1.0)
+    assert server_timings(TestClient(app).get("/work"))["forward"] == "12.50"
+
+
+def busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        time.sleep(0.001)
+
+
+def test_sample_stacks_sees_other_threads():
+    """Test that the sampling profiler records folded stacks of other threads"""
+    stop = threading.Event()
+    thread = threading.Thread(target=busy_loop, args=(stop,), name="busy")
+    thread.start()
+    try:
+        counts = sample_stacks(0.05, interval=0.005)
+    finally:
+        stop.set()
+        thread.join()
+
+    busy = [stack for stack in counts if stack.startswith("busy;")]
+    assert busy and all("busy_loop" in stack for stack in busy)
+    assert not any("sample_stacks" in stack for stack in counts)
+    first_line = format_folded(counts).splitlines()[0]
+    assert first_line.rsplit(" ", 1)[1].isdigit()
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from app.services.tokenization import (
+    aggregate_windows,
+    bucket_by_length,
+    chunk_token_ids,
+    special_token_affixes,
+    windows_for_texts,
+)
+
+
+class FakeTokenizer:
+    def __call__(self, text, add_special_tokens=True):
+        ids = [ord(char) for char in text]
+        return {"input_ids": [0] + ids + [2] if add_special_tokens else ids}
+
+
+def test_special_token_affixes():
+    """Test that the single-sequence template is detected"""
+    assert special_token_affixes(FakeTokenizer()) == ([0], [2])
+
+
+def test_short_sequence_is_one_window():
+    """Test that sequences within the limit are not split"""
+    assert chunk_token_ids([1, 2, 3], window=5, overlap=2) == [[1, 2, 3]]
+    assert chunk_token_ids([], window=5, overlap=2) == [[]]
+
+
+def test_long_sequence_windows_overlap():
+    """Test that long sequences are split into overlapping windows"""
+    windows = chunk_token_ids(list(range(10)), window=4, overlap=1)
+    assert windows == [[0, 1, 2, 3], [3, 4, 5, 6], [6, 7, 8, 9]]
+
+
+def test_first_policy_truncates():
+    """Test that the first policy keeps only the first window"""
+    windows, owners = windows_for_texts([list(range(10)), [1]], 4, 1, "first")
+    assert windows == [[0, 1, 2, 3], [1]]
+    assert owners == [0, 1]
+
+
+def test_bucket_by_length_groups_similar_lengths():
+    """Test that short sequences are not batched with long ones"""
+    lengths = [100, 5, 6, 98, 7]
+    batches = bucket_by_length(lengths, max_batch_size=8, max_batch_tokens=250)
+    assert batches == [[1, 2, 4], [3, 0]]
+
+
+def test_bucket_by_length_respects_batch_size():
+    """Test that no bucket exceeds the batch size"""
+    batches = bucket_by_length([1] * 5, max_batch_size=2, max_batch_tokens=1000)
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+
+
+def test_aggregate_mean_and_max_negative():
+    """Test that window scores are combined per text"""
+    scores = np.array([[0.2, 0.3, 0.5], [0.8, 0.1, 0.1], [0.1, 0.1, 0.8]])
+    owners = [0, 0, 1]
+
+    mean = aggregate_windows(scores, owners, 2, "mean")
+    assert np.allclose(mean[0], [0.5, 0.2, 0.3])
+    assert np.allclose(mean[1], scores[2])
+
+    worst = aggregate_windows(scores, owners, 2, "max_negative")
+    assert np.allclose(worst[0], scores[1])
+
+
+def test_aggregate_unknown_policy():
+    """Test that an unknown policy is rejected"""
+    with pytest.raises(ValueError):
+        aggregate_windows(np.zeros((1, 3)), [0], 1, "median")